@@ -10,9 +10,13 @@ import pandas as pd
 sys.path.insert(0, str(Path(__file__).parent.parent / "core"))
 
 from database import Database
+from single_flight import SingleFlight
 
 router = APIRouter()
 
+# Concurrent downloads of the same report share one build
+excel_flight = SingleFlight("excel_report")
+
 
 def generate_comprehensive_report(user_id: int = 1):
     """Generate comprehensive medical report with all patient data"""
@@ -42,6 +46,79 @@ def generate_comprehensive_report(user_id: int = 1):
     }
 
 
+def build_excel_report(user_id: int = 1):
+    """
+    Build the Excel medical report
+
+    Returns:
+        (xlsx bytes, filename)
+    """
+    data = generate_comprehensive_report(user_id)
+    user = data['user']
+
+    # Create Excel writer in memory
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+
+        # Sheet 1: Patient Summary
+        summary_data = {
+            'Patient Name': [user['name']],
+            'Cancer Type': [user['cancer_type']],
+            'Current Weight (lbs)': [user['current_weight_lbs']],
+            'Target Weight (lbs)': [user.get('target_weight_lbs', 'N/A')],
+            'Report Generated': [datetime.now().strftime('%Y-%m-%d %H:%M')],
+            'Days on Protocol': [len(data['compliance_history'])],
+        }
+        df_summary = pd.DataFrame(summary_data)
+        df_summary.to_excel(writer, sheet_name='Patient Summary', index=False)
+
+        # Sheet 2: Weight History
+        if data['weight_history']:
+            weight_data = []
+            for record in data['weight_history']:
+                weight_data.append({
+                    'Date': record['date'].split('T')[0] if 'T' in record['date'] else record['date'],
+                    'Weight (lbs)': record['weight_lbs'],
+                    'Followed Protocol': 'Yes' if record.get('followed_protocol') else 'No',
+                    'Notes': record.get('notes', '')
+                })
+            df_weight = pd.DataFrame(weight_data)
+            df_weight.to_excel(writer, sheet_name='Weight History', index=False)
+
+        # Sheet 3: Compliance History
+        if data['compliance_history']:
+            compliance_data = []
+            for record in data['compliance_history']:
+                compliance_data.append({
+                    'Date': record['date'].split('T')[0] if 'T' in record['date'] else record['date'],
+                    'Adherence %': record['adherence_percentage'],
+                    'Foods Consumed': len(record.get('foods_consumed', [])),
+                    'Missed Foods': ', '.join(record.get('missed_foods', [])),
+                    'Notes': record.get('notes', '')
+                })
+            df_compliance = pd.DataFrame(compliance_data)
+            df_compliance.to_excel(writer, sheet_name='Compliance History', index=False)
+
+        # Sheet 4: Protocol Foods
+        if data['foods']:
+            foods_data = []
+            for food in data['foods']:
+                foods_data.append({
+                    'Food Name': food['name'],
+                    'Preparation': food.get('best_preparation', 'N/A'),
+                    'Max Daily Amount (g)': food.get('max_daily_amount_grams', 'N/A'),
+                    'Net Carbs/100g': food.get('net_carbs_per_100g', 'N/A'),
+                    'Cancer Types': ', '.join(food.get('cancer_types', [])) if food.get('cancer_types') else 'N/A',
+                    'Key Mechanisms': ', '.join(food.get('mechanisms', [])[:3]) if food.get('mechanisms') else 'N/A'
+                })
+            df_foods = pd.DataFrame(foods_data)
+            df_foods.to_excel(writer, sheet_name='Protocol Foods', index=False)
+
+    filename = f"medical_report_{user['name'].replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.xlsx"
+
+    return output.getvalue(), filename
+
+
 @router.get("/medical-report/excel")
 def export_excel_report(user_id: int = 1):
     """
@@ -54,73 +131,10 @@ def export_excel_report(user_id: int = 1):
     - Protocol foods with dosing
     """
     try:
-        data = generate_comprehensive_report(user_id)
-        user = data['user']
-
-        # Create Excel writer in memory
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-
-            # Sheet 1: Patient Summary
-            summary_data = {
-                'Patient Name': [user['name']],
-                'Cancer Type': [user['cancer_type']],
-                'Current Weight (lbs)': [user['current_weight_lbs']],
-                'Target Weight (lbs)': [user.get('target_weight_lbs', 'N/A')],
-                'Report Generated': [datetime.now().strftime('%Y-%m-%d %H:%M')],
-                'Days on Protocol': [len(data['compliance_history'])],
-            }
-            df_summary = pd.DataFrame(summary_data)
-            df_summary.to_excel(writer, sheet_name='Patient Summary', index=False)
-
-            # Sheet 2: Weight History
-            if data['weight_history']:
-                weight_data = []
-                for record in data['weight_history']:
-                    weight_data.append({
-                        'Date': record['date'].split('T')[0] if 'T' in record['date'] else record['date'],
-                        'Weight (lbs)': record['weight_lbs'],
-                        'Followed Protocol': 'Yes' if record.get('followed_protocol') else 'No',
-                        'Notes': record.get('notes', '')
-                    })
-                df_weight = pd.DataFrame(weight_data)
-                df_weight.to_excel(writer, sheet_name='Weight History', index=False)
-
-            # Sheet 3: Compliance History
-            if data['compliance_history']:
-                compliance_data = []
-                for record in data['compliance_history']:
-                    compliance_data.append({
-                        'Date': record['date'].split('T')[0] if 'T' in record['date'] else record['date'],
-                        'Adherence %': record['adherence_percentage'],
-                        'Foods Consumed': len(record.get('foods_consumed', [])),
-                        'Missed Foods': ', '.join(record.get('missed_foods', [])),
-                        'Notes': record.get('notes', '')
-                    })
-                df_compliance = pd.DataFrame(compliance_data)
-                df_compliance.to_excel(writer, sheet_name='Compliance History', index=False)
-
-            # Sheet 4: Protocol Foods
-            if data['foods']:
-                foods_data = []
-                for food in data['foods']:
-                    foods_data.append({
-                        'Food Name': food['name'],
-                        'Preparation': food.get('best_preparation', 'N/A'),
-                        'Max Daily Amount (g)': food.get('max_daily_amount_grams', 'N/A'),
-                        'Net Carbs/100g': food.get('net_carbs_per_100g', 'N/A'),
-                        'Cancer Types': ', '.join(food.get('cancer_types', [])) if food.get('cancer_types') else 'N/A',
-                        'Key Mechanisms': ', '.join(food.get('mechanisms', [])[:3]) if food.get('mechanisms') else 'N/A'
-                    })
-                df_foods = pd.DataFrame(foods_data)
-                df_foods.to_excel(writer, sheet_name='Protocol Foods', index=False)
-
-        output.seek(0)
-
-        filename = f"medical_report_{user['name'].replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.xlsx"
+        content, filename = excel_flight.do(("excel", user_id), build_excel_report, user_id)
 
         return StreamingResponse(
-            output,
+            io.BytesIO(content),
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
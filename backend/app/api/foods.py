@@ -6,7 +6,10 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent / "core"))
 
 from database import Database
-from app.schemas.foods import FoodResponse, ActiveCompound, FoodListResponse
+from protocol_service import get_protocol_service
+from app.schemas.foods import (
+    FoodResponse, ActiveCompound, FoodListResponse, FoodCreateRequest, FoodUpdateRequest
+)
 
 router = APIRouter()
 
@@ -90,3 +93,51 @@ def get_food_by_name(food_name: str):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/")
+def add_food(request: FoodCreateRequest):
+    """
+    Add a food to the database
+
+    Saved protocols for today and tomorrow gain the food (if it applies to
+    the user) without being regenerated.
+    """
+    try:
+        db = Database()
+        exists = db.get_food_by_name(request.name) is not None
+        food_id = None if exists else db.add_food(request.dict())
+        db.close()
+
+        if exists:
+            raise HTTPException(status_code=409, detail=f"Food '{request.name}' already exists")
+
+        updated = get_protocol_service().apply_food_change(request.name)
+        return {"message": "Food added", "food_id": food_id, "protocols_updated": updated}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.put("/{food_name}")
+def update_food(food_name: str, request: FoodUpdateRequest):
+    """
+    Update a food's details
+
+    Saved protocols for today and tomorrow are updated for this food only.
+    """
+    try:
+        db = Database()
+        found = db.update_food(food_name, request.dict(exclude_none=True))
+        db.close()
+
+        if not found:
+            raise HTTPException(status_code=404, detail=f"Food '{food_name}' not found")
+
+        updated = get_protocol_service().apply_food_change(food_name)
+        return {"message": "Food updated", "protocols_updated": updated}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
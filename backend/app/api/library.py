@@ -1,15 +1,31 @@
 """Research library API endpoints"""
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import APIRouter, HTTPException
 from typing import List, Optional
 import sys
+import numpy as np
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent / "core"))
 
 from database import Database
-from pubmed_client import PubMedClient
+from pubmed_client import PubMedClient, PubMedUnavailableError
+from circuit_breaker import get_ncbi_circuit_breaker
+from rate_limiter import get_ncbi_rate_limiter
+from eutils_cache import get_eutils_cache
+from single_flight import SingleFlight
+from config import MAX_BATCH_DOSES
 from dose_calculator import DoseCalculator, StudyType
+from food_evidence import rescore_library_doses
+from citation_graph import get_citations, most_cited, refresh_citations
+from near_duplicates import get_duplicates
+from related_studies import get_related
+from research_indexing import on_studies_added, on_studies_removed, schedule_refresh
+from research_ranking import ranking_cancer_type
 from app.schemas.library import (
+    BatchDoseCalculatorRequest,
+    BatchDoseCalculatorResponse,
+    LibraryDosesResponse,
     ResearchStudyResponse,
     SearchRequest,
     SaveStudyRequest
@@ -18,6 +34,39 @@ from pydantic import BaseModel
 
 router = APIRouter()
 
+# Identical searches that overlap share one round of PubMed calls
+search_flight = SingleFlight("library_search")
+
+# Runs library lookups alongside the PubMed calls they annotate
+_lookup_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="library-lookup")
+
+
+def _saved_pubmed_ids(pubmed_ids: List[str]) -> set:
+    """PubMed IDs from the list that are already in the library (one IN query)"""
+    db = Database(create_tables=False)
+    try:
+        return db.get_existing_pubmed_ids(pubmed_ids)
+    finally:
+        db.close()
+
+
+def _search_with_saved_flags(query: str, max_results: int) -> List[dict]:
+    """Search PubMed and mark which results are already in the library"""
+    client = PubMedClient()
+    pubmed_ids = client.search_studies(query, max_results)
+    if not pubmed_ids:
+        return []
+
+    # Look up saved status while efetch is in flight
+    saved_lookup = _lookup_executor.submit(_saved_pubmed_ids, pubmed_ids)
+    studies = client.fetch_study_details(pubmed_ids)
+    saved_ids = saved_lookup.result()
+
+    for study in studies:
+        study['saved'] = study.get('pubmed_id') in saved_ids
+
+    return studies
+
 
 @router.get("/search", response_model=List[ResearchStudyResponse])
 def search_pubmed(
@@ -33,20 +82,13 @@ def search_pubmed(
     - "green tea EGCG AND cancer"
     """
     try:
-        client = PubMedClient()
-        studies = client.search_and_fetch(query, max_results)
-
-        # Add a 'saved' field to indicate if study is already in database
-        db = Database()
-        for study in studies:
-            existing = db.conn.cursor().execute(
-                "SELECT id FROM research_studies WHERE pubmed_id = ?",
-                (study.get('pubmed_id'),)
-            ).fetchone()
-            study['saved'] = existing is not None
-        db.close()
-
-        return studies
+        return search_flight.do(
+            ("search", query, max_results),
+            _search_with_saved_flags, query, max_results
+        )
+    except PubMedUnavailableError as e:
+        headers = {"Retry-After": str(int(e.retry_after) + 1)} if e.retry_after else None
+        raise HTTPException(status_code=503, detail=f"PubMed is unavailable: {e}", headers=headers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -72,6 +114,9 @@ def save_study(request: SaveStudyRequest):
             'url': request.url or f"https://pubmed.ncbi.nlm.nih.gov/{request.pubmed_id}/"
         })
 
+        if study_id != -1:
+            on_studies_added(db)
+            schedule_refresh(db)
         db.close()
 
         if study_id == -1:
@@ -116,15 +161,40 @@ def get_saved_studies(food_name: Optional[str] = None):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/ranked", response_model=List[ResearchStudyResponse])
+def get_ranked_studies(food_name: str, cancer_type: Optional[str] = None, limit: int = 20):
+    """
+    Saved studies about a food, most relevant first
+
+    Relevance is BM25 over the food, its compounds and the cancer type,
+    weighted by study type (meta-analyses and trials first). Scores are
+    precomputed as studies are added, so this is an indexed lookup.
+    """
+    try:
+        db = Database()
+        studies = db.get_top_research_for_food(food_name, ranking_cancer_type(cancer_type),
+                                               limit=max(1, min(limit, 200)))
+        db.close()
+
+        for study in studies:
+            study['saved'] = True
+        return studies
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.delete("/{pubmed_id}")
 def delete_study(pubmed_id: str):
     """Remove a study from the library"""
     try:
         db = Database()
+        study_ids = db.get_research_study_ids([pubmed_id])
         cursor = db.conn.cursor()
         cursor.execute("DELETE FROM research_studies WHERE pubmed_id = ?", (pubmed_id,))
         db.conn.commit()
         deleted_count = cursor.rowcount
+        on_studies_removed(db, study_ids.values())
+        schedule_refresh(db)
         db.close()
 
         if deleted_count == 0:
@@ -137,6 +207,78 @@ def delete_study(pubmed_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/{pubmed_id}/duplicates")
+def get_study_duplicates(pubmed_id: str):
+    """Saved studies that near-duplicate this one (same cluster)"""
+    try:
+        db = Database()
+        study_ids = db.get_research_study_ids([pubmed_id])
+        duplicates = get_duplicates(db, study_ids[pubmed_id]) if study_ids else None
+        db.close()
+
+        if duplicates is None:
+            raise HTTPException(status_code=404, detail="Study not found")
+
+        return {"pubmed_id": pubmed_id, "duplicates": duplicates}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{pubmed_id}/related")
+def get_related_studies(pubmed_id: str, limit: int = 10):
+    """Most similar saved studies by abstract text (precomputed TF-IDF neighbors)"""
+    try:
+        db = Database()
+        study_ids = db.get_research_study_ids([pubmed_id])
+        related = get_related(db, study_ids[pubmed_id], limit) if study_ids else None
+        db.close()
+
+        if related is None:
+            raise HTTPException(status_code=404, detail="Study not found")
+
+        return {"pubmed_id": pubmed_id, "related": related}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{pubmed_id}/citations")
+def get_study_citations(pubmed_id: str, refresh: bool = True):
+    """
+    References and citing papers of a PMID, from the local citation graph
+
+    Links missing or older than the refresh window are fetched from elink
+    first; if PubMed is unavailable the stored links are returned.
+    """
+    try:
+        db = Database()
+        if refresh:
+            try:
+                refresh_citations(db, [pubmed_id])
+            except PubMedUnavailableError:
+                pass
+        citations = get_citations(db, pubmed_id)
+        db.close()
+        return citations
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/most-cited")
+def get_most_cited(limit: int = 20, within_library: bool = True):
+    """Saved studies with the most citations (from other saved studies by default)"""
+    try:
+        db = Database()
+        studies = most_cited(db, limit, within_library)
+        db.close()
+        return {"within_library": within_library, "studies": studies}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/stats")
 def get_library_stats():
     """Get statistics about the research library"""
@@ -144,15 +286,18 @@ def get_library_stats():
         db = Database()
         cursor = db.conn.cursor()
 
-        # Total studies
-        cursor.execute("SELECT COUNT(*) FROM research_studies")
+        # Total studies, near-duplicates counted once
+        cursor.execute("SELECT COUNT(*) FROM research_studies WHERE duplicate_of IS NULL")
         total_studies = cursor.fetchone()[0]
 
+        cursor.execute("SELECT COUNT(*) FROM research_studies WHERE duplicate_of IS NOT NULL")
+        near_duplicates = cursor.fetchone()[0]
+
         # Studies by food
         cursor.execute("""
             SELECT food_studied, COUNT(*) as count
             FROM research_studies
-            WHERE food_studied != ''
+            WHERE food_studied != '' AND duplicate_of IS NULL
             GROUP BY food_studied
             ORDER BY count DESC
             LIMIT 10
@@ -162,7 +307,7 @@ def get_library_stats():
         # Recent studies
         cursor.execute("""
             SELECT COUNT(*) FROM research_studies
-            WHERE year >= 2020
+            WHERE year >= 2020 AND duplicate_of IS NULL
         """)
         recent_studies = cursor.fetchone()[0]
 
@@ -170,6 +315,7 @@ def get_library_stats():
 
         return {
             "total_studies": total_studies,
+            "near_duplicates": near_duplicates,
             "by_food": by_food,
             "recent_studies": recent_studies
         }
@@ -177,6 +323,24 @@ def get_library_stats():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/cache-stats")
+def get_pubmed_cache_stats():
+    """PubMed response cache metrics (hits, misses, stale hits, size)"""
+    cache = get_eutils_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+
+@router.get("/pubmed-status")
+def get_pubmed_status():
+    """NCBI connection health: circuit breaker state and rate limiter usage"""
+    return {
+        "circuit_breaker": get_ncbi_circuit_breaker().stats(),
+        "rate_limiter": get_ncbi_rate_limiter().stats(),
+    }
+
+
 class DoseCalculatorRequest(BaseModel):
     study_dose_mg_kg: float
     study_type: str  # "mouse", "rat", "rabbit", "dog", "monkey", "petri_dish"
@@ -225,3 +389,74 @@ def calculate_human_dose(request: DoseCalculatorRequest):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+def _columns(values: dict) -> dict:
+    """numpy result columns as JSON lists, NaN as null"""
+    return {
+        name: [None if isinstance(v, float) and np.isnan(v) else v for v in column.tolist()]
+        for name, column in values.items()
+    }
+
+
+@router.post("/dose-calculator/batch", response_model=BatchDoseCalculatorResponse)
+def calculate_human_doses(request: BatchDoseCalculatorRequest):
+    """
+    Calculate human equivalent doses for many studies in one call
+
+    Same conversion as /dose-calculator, vectorized over columns. A column
+    with a single value applies to every study (e.g. one body weight).
+    """
+    try:
+        columns = [
+            request.study_dose_mg_kg, request.study_type,
+            request.compound_per_100g_food, request.human_weight_kg
+        ]
+        count = max(len(column) for column in columns)
+        if any(len(column) not in (1, count) for column in columns):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Each column must have {count} values or a single shared value"
+            )
+        if count > MAX_BATCH_DOSES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Batch has {count} studies; the limit is {MAX_BATCH_DOSES}"
+            )
+
+        result = DoseCalculator.calculate_batch(
+            request.study_dose_mg_kg,
+            request.study_type,
+            request.compound_per_100g_food,
+            request.human_weight_kg
+        )
+        return BatchDoseCalculatorResponse(**_columns(result))
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/doses", response_model=LibraryDosesResponse)
+def get_library_doses(human_weight_kg: float = 70, food_name: Optional[str] = None):
+    """
+    Re-score every dosed study in the library for one body weight
+
+    Converts each study's extracted mg/kg dose to a human dose and daily
+    grams of its food, using the food's listed compound concentration.
+    """
+    try:
+        if human_weight_kg <= 0:
+            raise HTTPException(status_code=400, detail="human_weight_kg must be greater than 0")
+
+        db = Database()
+        result = rescore_library_doses(db, human_weight_kg, food_name)
+        db.close()
+
+        return LibraryDosesResponse(human_weight_kg=human_weight_kg, **_columns(result))
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
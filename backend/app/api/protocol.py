@@ -1,43 +1,47 @@
 """Protocol API endpoints"""
 from fastapi import APIRouter, HTTPException
 from datetime import date as date_module
+import math
 import sys
+import numpy as np
 from pathlib import Path
 
 # Add core modules to path
 sys.path.insert(0, str(Path(__file__).parent.parent / "core"))
 
-from database import Database
-from protocol_generator import ProtocolGenerator
+from config import MAX_SIMULATION_WEIGHTS
+from protocol_service import get_protocol_service
+from single_flight import SingleFlight
 from app.schemas.protocol import (
     DailyProtocolResponse,
     ProtocolFoodResponse,
-    GenerateProtocolRequest
+    GenerateProtocolRequest,
+    SimulateProtocolRequest,
+    SimulateProtocolResponse
 )
 
 router = APIRouter()
 
+# Double-clicks and duplicate tabs share one generation per (user, date)
+generate_flight = SingleFlight("protocol_generate")
+
 @router.post("/generate", response_model=DailyProtocolResponse)
 def generate_protocol(request: GenerateProtocolRequest):
     """Generate a new daily protocol"""
     try:
-        generator = ProtocolGenerator()
-
-        # Get user
-        user = generator.db.get_user(user_id=request.user_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-
-        # Use provided weight or stored weight
-        weight = request.weight_lbs if request.weight_lbs else user['current_weight_lbs']
         target_date = request.target_date if request.target_date else date_module.today().isoformat()
 
-        # Generate protocol
-        protocol = generator.generate_daily_protocol(
-            user_name=user['name'],
-            weight_lbs=weight,
-            target_date=target_date
-        )
+        # Generate protocol with the shared service (uses stored weight if none given)
+        try:
+            protocol = generate_flight.do(
+                ("protocol", request.user_id, target_date, request.weight_lbs),
+                get_protocol_service().generate_for_user,
+                request.user_id,
+                weight_lbs=request.weight_lbs,
+                target_date=target_date
+            )
+        except LookupError:
+            raise HTTPException(status_code=404, detail="User not found")
 
         # Convert to response format
         protocol_foods = [
@@ -73,98 +77,120 @@ def generate_protocol(request: GenerateProtocolRequest):
             keto_score=protocol['keto_score']
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/today", response_model=DailyProtocolResponse)
-def get_today_protocol(user_id: int = 1):
-    """Get today's protocol"""
-    try:
-        db = Database()
-        user = db.get_user(user_id=user_id)
+def _weight_count(min_weight_lbs: float, max_weight_lbs: float, step_lbs: float) -> int:
+    """Steps from min_weight_lbs that stay at or below max_weight_lbs (float error tolerated)"""
+    return math.floor((max_weight_lbs - min_weight_lbs) / step_lbs + 1e-9) + 1
 
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
+@router.post("/simulate", response_model=SimulateProtocolResponse)
+def simulate_protocol(request: SimulateProtocolRequest):
+    """
+    Simulate protocols across a weight range (read-only)
 
-        today = date_module.today().isoformat()
-        protocol = db.get_protocol_for_date(user_id, today)
+    Evaluates dosing, schedules and keto checks for every weight from
+    min_weight_lbs to max_weight_lbs in one pass. Nothing is saved.
+    """
+    try:
+        if request.max_weight_lbs < request.min_weight_lbs:
+            raise HTTPException(status_code=400, detail="max_weight_lbs must be >= min_weight_lbs")
 
-        if not protocol:
+        count = _weight_count(request.min_weight_lbs, request.max_weight_lbs, request.step_lbs)
+        if count > MAX_SIMULATION_WEIGHTS:
             raise HTTPException(
-                status_code=404,
-                detail=f"No protocol found for {today}. Generate one first."
+                status_code=400,
+                detail=f"Range produces {count} weights; the limit is {MAX_SIMULATION_WEIGHTS}"
             )
 
-        # Convert foods from JSON
-        import json
-        foods_data = json.loads(protocol['foods']) if isinstance(protocol['foods'], str) else protocol['foods']
+        weights = np.round(request.min_weight_lbs + np.arange(count) * request.step_lbs, 2)
 
-        protocol_foods = [
-            ProtocolFoodResponse(**food)
-            for food in foods_data
-        ]
+        try:
+            result = get_protocol_service().simulate_weights(request.user_id, weights.tolist())
+        except LookupError:
+            raise HTTPException(status_code=404, detail="User not found")
 
-        db.close()
-
-        return DailyProtocolResponse(
-            date=protocol['date'],
-            user_id=protocol['user_id'],
-            weight_lbs=protocol['weight_lbs'],
-            foods=protocol_foods,
-            total_net_carbs=protocol['total_net_carbs'],
-            total_protein=protocol['total_protein'],
-            total_fat=protocol['total_fat'],
-            total_calories=protocol['total_calories'],
-            keto_compatible=True,
-            keto_score=100.0
-        )
+        return SimulateProtocolResponse(**result)
 
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/date/{date}", response_model=DailyProtocolResponse)
-def get_protocol_by_date(date: str, user_id: int = 1):
-    """Get protocol for a specific date"""
-    try:
-        db = Database()
-        user = db.get_user(user_id=user_id)
+@router.get("/metrics")
+def get_protocol_metrics():
+    """Protocol generation metrics (template hit rate, coalesced requests)"""
+    return {
+        **get_protocol_service().metrics(),
+        "generate_coalescing": generate_flight.stats(),
+    }
+
+def _protocol_response(protocol: dict) -> DailyProtocolResponse:
+    """Build the API response for a saved or freshly generated protocol"""
+    return DailyProtocolResponse(
+        date=protocol['date'],
+        user_id=protocol['user_id'],
+        weight_lbs=protocol['weight_lbs'],
+        foods=[ProtocolFoodResponse(**food) for food in protocol['foods']],
+        total_net_carbs=protocol['total_net_carbs'],
+        total_protein=protocol['total_protein'],
+        total_fat=protocol['total_fat'],
+        total_calories=protocol['total_calories'],
+        keto_compatible=protocol.get('keto_compatible', True),
+        keto_score=protocol.get('keto_score', 100.0)
+    )
 
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
+@router.get("/today", response_model=DailyProtocolResponse)
+def get_today_protocol(user_id: int = 1):
+    """
+    Get today's protocol
 
-        protocol = db.get_protocol_for_date(user_id, date)
+    A single indexed read: protocols are pre-generated in the background.
+    If today's has not been generated yet, responds 404 and queues its
+    generation (or POST /generate creates it right away).
+    """
+    try:
+        service = get_protocol_service()
+        today = date_module.today()
 
-        if not protocol:
-            raise HTTPException(
-                status_code=404,
-                detail=f"No protocol found for {date}"
-            )
+        with service.pool.connection() as db:
+            protocol = db.get_protocol_for_date(user_id, today.isoformat())
+            if not protocol and not db.get_user(user_id=user_id):
+                raise HTTPException(status_code=404, detail="User not found")
 
-        # Convert foods from JSON
-        import json
-        foods_data = json.loads(protocol['foods']) if isinstance(protocol['foods'], str) else protocol['foods']
+        if not protocol:
+            if service.pregenerator.running:
+                service.pregenerator.request_generation(user_id, today)
+                detail = "Today's protocol is being generated; try again shortly"
+            else:
+                detail = "No protocol for today yet; generate one with POST /api/protocol/generate"
+            raise HTTPException(status_code=404, detail=detail)
 
-        protocol_foods = [
-            ProtocolFoodResponse(**food)
-            for food in foods_data
-        ]
+        return _protocol_response(protocol)
 
-        db.close()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        return DailyProtocolResponse(
-            date=protocol['date'],
-            user_id=protocol['user_id'],
-            weight_lbs=protocol['weight_lbs'],
-            foods=protocol_foods,
-            total_net_carbs=protocol['total_net_carbs'],
-            total_protein=protocol['total_protein'],
-            total_fat=protocol['total_fat'],
-            total_calories=protocol['total_calories'],
-            keto_compatible=True,
-            keto_score=100.0
-        )
+@router.get("/date/{date}", response_model=DailyProtocolResponse)
+def get_protocol_by_date(date: str, user_id: int = 1):
+    """Get protocol for a specific date"""
+    try:
+        with get_protocol_service().pool.connection() as db:
+            protocol = db.get_protocol_for_date(user_id, date)
+
+            if not protocol:
+                if not db.get_user(user_id=user_id):
+                    raise HTTPException(status_code=404, detail="User not found")
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"No protocol found for {date}"
+                )
+
+        return _protocol_response(protocol)
 
     except HTTPException:
         raise
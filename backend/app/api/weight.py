@@ -2,11 +2,13 @@
 from fastapi import APIRouter, HTTPException
 from typing import List
 import sys
+import logging
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent / "core"))
 
 from database import Database
+from protocol_service import get_protocol_service
 from app.schemas.weight import (
     WeightRecordRequest,
     WeightRecordResponse,
@@ -14,6 +16,7 @@ from app.schemas.weight import (
 )
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 @router.post("/", response_model=WeightRecordResponse)
 def record_weight(request: WeightRecordRequest):
@@ -38,6 +41,15 @@ def record_weight(request: WeightRecordRequest):
 
         record = history[0]
 
+        # Bring today's protocol in line with the new weight (if one exists)
+        # and have tomorrow's regenerated in the background
+        service = get_protocol_service()
+        try:
+            service.apply_weight_change(request.user_id, request.weight_lbs)
+        except Exception as e:
+            logger.warning(f"Could not update protocol for new weight: {e}")
+        service.pregenerator.notify_weight_recorded(request.user_id)
+
         return WeightRecordResponse(
             id=record['id'],
             user_id=record['user_id'],
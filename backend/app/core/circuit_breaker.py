@@ -0,0 +1,130 @@
+"""
+Circuit breaker for No Colon, Still Rollin'
+Fails fast while NCBI is down instead of tying up worker threads on timeouts
+"""
+from typing import Optional
+import threading
+import time
+
+from config import NCBI_HTTP_CONFIG
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the circuit is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} circuit open; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+
+    - closed: calls go through; `failure_threshold` failures in a row open it
+    - open: calls are refused with CircuitOpenError for `reset_seconds`
+    - half-open: one trial call is let through; success closes the
+      circuit, failure opens it again
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        """
+        Args:
+            name: Label for errors and stats
+            failure_threshold: Consecutive failures that open the circuit
+            reset_seconds: How long to stay open before a trial call
+        """
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now: float) -> str:
+        """State with the open timeout applied (lock held)"""
+        if self._state == self.OPEN and now - self._opened_at >= self.reset_seconds:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may proceed now"""
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+
+            self.rejected += 1
+            retry_after = max(0.0, self.reset_seconds - (now - self._opened_at))
+            raise CircuitOpenError(self.name, retry_after)
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opened += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def retry_after(self) -> float:
+        """Seconds until a trial call will be allowed (0 unless open)"""
+        with self._lock:
+            now = time.monotonic()
+            if self._current_state(now) != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_seconds - (now - self._opened_at))
+
+    def stats(self) -> dict:
+        """State and counters for monitoring"""
+        with self._lock:
+            return {
+                "state": self._current_state(time.monotonic()),
+                "consecutive_failures": self._failures,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
+
+
+# One breaker for every E-utilities caller in the process
+_ncbi_breaker: Optional[CircuitBreaker] = None
+_ncbi_breaker_lock = threading.Lock()
+
+
+def get_ncbi_circuit_breaker() -> CircuitBreaker:
+    """Return the process-wide E-utilities circuit breaker"""
+    global _ncbi_breaker
+    with _ncbi_breaker_lock:
+        if _ncbi_breaker is None:
+            _ncbi_breaker = CircuitBreaker(
+                "ncbi_eutils",
+                NCBI_HTTP_CONFIG["breaker_failure_threshold"],
+                NCBI_HTTP_CONFIG["breaker_reset_seconds"],
+            )
+        return _ncbi_breaker
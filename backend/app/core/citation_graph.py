@@ -0,0 +1,355 @@
+"""
+Citation graph for No Colon, Still Rollin'
+Citation links from elink, fetched for many PMIDs per request and kept in
+study_citations, so the library can grow along references and citing papers
+
+Each PMID's links are fetched once per direction and refreshed after
+refresh_days; graph questions ("most cited in the library") are answered
+from the local tables.
+
+    python src/main.py expand-citations --hops 2 --max 200
+"""
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional
+import json
+import logging
+import time
+
+from config import CITATION_GRAPH_CONFIG, EFETCH_BATCH_SIZE
+from pubmed_client import PubMedClient
+from pubmed_fetcher import build_study_record
+from pubmed_xml import iter_pubmed_articles
+from research_indexing import on_studies_added
+from research_keywords import is_relevant, tag_study
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = CITATION_GRAPH_CONFIG["batch_size"]
+REFRESH_DAYS = CITATION_GRAPH_CONFIG["refresh_days"]
+
+# Direction -> elink linkname
+LINKNAMES = {
+    "refs": "pubmed_pubmed_refs",        # papers the PMID cites
+    "citedin": "pubmed_pubmed_citedin",  # papers citing the PMID
+}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def elink_params(pmids: List[str], linkname: str) -> Dict:
+    """
+    elink parameters for one direction of many PMIDs' citation links
+
+    IDs go as repeated id= parameters: a single comma-separated id makes
+    NCBI merge every PMID's links into one linkset.
+    """
+    return {
+        'dbfrom': 'pubmed',
+        'db': 'pubmed',
+        'linkname': linkname,
+        'id': list(pmids),
+        'retmode': 'json',
+    }
+
+
+def parse_elink_json(json_text: str, linkname: str) -> Dict[str, List[str]]:
+    """Linked PMIDs per source PMID, for one linkname, from an elink JSON response"""
+    links: Dict[str, List[str]] = {}
+    for linkset in json.loads(json_text).get("linksets", []):
+        for pmid in linkset.get("ids", []):
+            found = links.setdefault(str(pmid), [])
+            for linksetdb in linkset.get("linksetdbs", []):
+                if linksetdb.get("linkname") == linkname:
+                    found.extend(str(link) for link in linksetdb.get("links", []))
+    return links
+
+
+def _stale_pmids(db, pmids: List[str], linkname: str, max_age_days: int) -> List[str]:
+    """PMIDs whose links in this direction were never fetched, or not within max_age_days"""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=max_age_days)).strftime("%Y-%m-%d %H:%M:%S")
+    fresh = set()
+    for start in range(0, len(pmids), 500):
+        chunk = pmids[start:start + 500]
+        fresh.update(row[0] for row in db.conn.execute(
+            f"SELECT pubmed_id FROM citation_fetches "
+            f"WHERE linkname = ? AND fetched_at >= ? AND pubmed_id IN ({','.join('?' for _ in chunk)})",
+            [linkname, cutoff, *chunk]
+        ))
+    return [pmid for pmid in pmids if pmid not in fresh]
+
+
+def _store_links(db, direction: str, links: Dict[str, List[str]], fetched_at: str):
+    """
+    Upsert one elink batch and drop edges it no longer returns
+
+    An edge is shared by both of its ends, so refreshing one end can drop
+    an edge last confirmed from the other; that end's next refresh adds
+    it back.
+    """
+    linkname = LINKNAMES[direction]
+    if direction == "refs":
+        edges = [(pmid, cited, fetched_at) for pmid, found in links.items() for cited in found]
+        stale = "DELETE FROM study_citations WHERE citing_pmid = ? AND fetched_at < ?"
+    else:
+        edges = [(citing, pmid, fetched_at) for pmid, found in links.items() for citing in found]
+        stale = "DELETE FROM study_citations WHERE cited_pmid = ? AND fetched_at < ?"
+
+    with db.conn:
+        db.conn.executemany("""
+            INSERT INTO study_citations (citing_pmid, cited_pmid, fetched_at) VALUES (?, ?, ?)
+            ON CONFLICT(citing_pmid, cited_pmid) DO UPDATE SET fetched_at = excluded.fetched_at
+        """, edges)
+        db.conn.executemany(stale, [(pmid, fetched_at) for pmid in links])
+        db.conn.executemany("""
+            INSERT OR REPLACE INTO citation_fetches (pubmed_id, linkname, links, fetched_at)
+            VALUES (?, ?, ?, ?)
+        """, [(pmid, linkname, len(found), fetched_at) for pmid, found in links.items()])
+
+
+def refresh_citations(db, pmids: Iterable[str], client: Optional[PubMedClient] = None,
+                      directions: Iterable[str] = ("refs", "citedin"),
+                      max_age_days: int = REFRESH_DAYS, batch_size: int = BATCH_SIZE) -> Dict:
+    """
+    Fetch citation links for PMIDs whose stored links are missing or stale
+
+    One elink request per direction covers batch_size PMIDs. A failed
+    batch is logged and skipped; its PMIDs stay stale for the next run.
+
+    Returns:
+        Counts of PMIDs checked, fetched and failed, edges stored, and requests made
+    """
+    client = client or PubMedClient()
+    pmids = list(dict.fromkeys(pmids))
+    result = {"pmids": len(pmids), "fetched": 0, "failed": 0, "edges": 0, "requests": 0}
+
+    for direction in directions:
+        linkname = LINKNAMES[direction]
+        stale = _stale_pmids(db, pmids, linkname, max_age_days)
+        for start in range(0, len(stale), batch_size):
+            batch = stale[start:start + batch_size]
+            result["requests"] += 1
+            try:
+                body = client.get_raw("elink.fcgi", elink_params(batch, linkname), timeout=60)
+                found = parse_elink_json(body, linkname)
+            except Exception as e:
+                logger.error(f"elink {direction} for {len(batch)} PMIDs failed: {e}")
+                result["failed"] += len(batch)
+                continue
+
+            # PMIDs elink left out have no links in this direction
+            links = {pmid: found.get(pmid, []) for pmid in batch}
+            _store_links(db, direction, links, _now())
+            result["fetched"] += len(batch)
+            result["edges"] += sum(len(v) for v in links.values())
+
+    return result
+
+
+def linked_pmids(db, pmids: Iterable[str]) -> Counter:
+    """PMIDs linked to any of these (either direction), with how many of them they link to"""
+    pmids = list(pmids)
+    counts: Counter = Counter()
+    for start in range(0, len(pmids), 500):
+        chunk = pmids[start:start + 500]
+        marks = ','.join('?' for _ in chunk)
+        counts.update(row[0] for row in db.conn.execute(f"""
+            SELECT cited_pmid FROM study_citations WHERE citing_pmid IN ({marks})
+            UNION ALL
+            SELECT citing_pmid FROM study_citations WHERE cited_pmid IN ({marks})
+        """, chunk + chunk))
+    return counts
+
+
+def _fetch_records(client: PubMedClient, pmids: List[str],
+                   relevant: Callable[[Dict], bool]) -> List[Dict]:
+    """efetch PMIDs and keep the articles that pass the relevance filter, as study rows"""
+    xml = client.get_raw(
+        "efetch.fcgi", {'id': ','.join(pmids), 'rettype': 'medline', 'retmode': 'xml'},
+        timeout=60, binary=True
+    )
+    records = []
+    for article in iter_pubmed_articles(xml):
+        if not article["pubmed_id"]:
+            continue
+        tags = tag_study(article["title"], article["abstract"])
+        if relevant(tags):
+            records.append(build_study_record(article, tags))
+    return records
+
+
+def expand_library(db=None, client: Optional[PubMedClient] = None,
+                   seeds: Optional[Iterable[str]] = None,
+                   max_hops: int = CITATION_GRAPH_CONFIG["max_hops"],
+                   max_new_studies: int = CITATION_GRAPH_CONFIG["max_new_studies"],
+                   max_examined: int = CITATION_GRAPH_CONFIG["max_examined"],
+                   relevant: Callable[[Dict], bool] = is_relevant) -> Dict:
+    """
+    Grow the library breadth-first along citation links
+
+    Each hop refreshes the frontier's links, then fetches the linked
+    PMIDs not yet seen, most-linked first. Articles that pass `relevant`
+    (tag_study() tags -> bool) are saved and form the next frontier;
+    the rest are not followed.
+
+    Args:
+        db: Database (default: the configured one)
+        client: PubMedClient for elink and efetch
+        seeds: PMIDs to start from (default: the whole library)
+        max_hops: Link distance from the seeds
+        max_new_studies: Stop after saving this many studies
+        max_examined: Stop after fetching this many candidate articles
+        relevant: Filter applied to each candidate's tags
+
+    Returns:
+        Per-hop and total counts
+    """
+    from database import Database
+
+    db = db or Database()
+    client = client or PubMedClient()
+    start = time.perf_counter()
+
+    library = {row[0] for row in db.conn.execute("SELECT pubmed_id FROM research_studies")}
+    frontier = list(dict.fromkeys(seeds)) if seeds is not None else sorted(library)
+    seen = library | set(frontier)
+    added = examined = 0
+    hops = []
+
+    for hop in range(1, max_hops + 1):
+        if not frontier or added >= max_new_studies or examined >= max_examined:
+            break
+        refreshed = refresh_citations(db, frontier, client)
+        counts = linked_pmids(db, frontier)
+        candidates = sorted((pmid for pmid in counts if pmid not in seen), key=lambda p: (-counts[p], p))
+        seen.update(candidates)
+
+        next_frontier: List[str] = []
+        hop_examined = 0
+        for batch_start in range(0, len(candidates), EFETCH_BATCH_SIZE):
+            budget = min(EFETCH_BATCH_SIZE, max_examined - examined)
+            if budget <= 0 or added >= max_new_studies:
+                break
+            batch = candidates[batch_start:batch_start + budget]
+            examined += len(batch)
+            hop_examined += len(batch)
+            try:
+                records = _fetch_records(client, batch, relevant)
+            except Exception as e:
+                logger.error(f"Fetching {len(batch)} linked articles failed: {e}")
+                continue
+            records = records[:max_new_studies - added]
+            if records:
+                added += db.add_research_studies(records)
+                next_frontier.extend(record["pubmed_id"] for record in records)
+
+        hops.append({
+            "hop": hop,
+            "frontier": len(frontier),
+            "elink_requests": refreshed["requests"],
+            "candidates": len(candidates),
+            "examined": hop_examined,
+            "added": len(next_frontier),
+        })
+        frontier = next_frontier
+
+    if added:
+        on_studies_added(db)
+
+    return {
+        "added": added,
+        "examined": examined,
+        "hops": hops,
+        "elapsed_seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def most_cited(db, limit: int = 20, within_library: bool = True) -> List[Dict]:
+    """
+    Library studies with the most known citations
+
+    Args:
+        within_library: Count only citations from other library studies
+            (otherwise every citing paper elink has returned)
+
+    Reads idx_study_citations_cited, grouped by the cited PMID.
+    """
+    citing_join = "JOIN research_studies citing ON citing.pubmed_id = c.citing_pmid" if within_library else ""
+    rows = db.conn.execute(f"""
+        SELECT r.id, r.pubmed_id, r.title, r.year, r.study_type, r.food_studied,
+               COUNT(*) AS citations
+        FROM study_citations c
+        JOIN research_studies r ON r.pubmed_id = c.cited_pmid
+        {citing_join}
+        WHERE r.duplicate_of IS NULL
+        GROUP BY c.cited_pmid
+        ORDER BY citations DESC, r.pubmed_id
+        LIMIT ?
+    """, (limit,)).fetchall()
+    return [dict(row) for row in rows]
+
+
+def get_citations(db, pubmed_id: str) -> Dict:
+    """A PMID's stored references and citing papers, marking those in the library"""
+    def linked(sql: str) -> List[Dict]:
+        rows = db.conn.execute(sql, (pubmed_id,)).fetchall()
+        return [{"pubmed_id": row[0], "title": row[1], "in_library": row[1] is not None} for row in rows]
+
+    fetched = dict(db.conn.execute(
+        "SELECT linkname, fetched_at FROM citation_fetches WHERE pubmed_id = ?", (pubmed_id,)
+    ).fetchall())
+    return {
+        "pubmed_id": pubmed_id,
+        "references": linked("""
+            SELECT c.cited_pmid, r.title FROM study_citations c
+            LEFT JOIN research_studies r ON r.pubmed_id = c.cited_pmid
+            WHERE c.citing_pmid = ? ORDER BY r.title IS NULL, c.cited_pmid
+        """),
+        "cited_by": linked("""
+            SELECT c.citing_pmid, r.title FROM study_citations c
+            LEFT JOIN research_studies r ON r.pubmed_id = c.citing_pmid
+            WHERE c.cited_pmid = ? ORDER BY r.title IS NULL, c.citing_pmid
+        """),
+        "fetched_at": {direction: fetched.get(linkname) for direction, linkname in LINKNAMES.items()},
+    }
+
+
+if __name__ == "__main__":
+    # Benchmark against the mock E-utilities server: batched vs per-PMID elink,
+    # a bounded expansion, and the most-cited query
+    import sys
+    import tempfile
+    from pathlib import Path
+    from database import Database
+    from mock_eutils import MockEUtilsServer
+    from rate_limiter import TokenBucket
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    workdir = Path(tempfile.mkdtemp(prefix="citation-graph-"))
+
+    with MockEUtilsServer(latency=0.02) as server:
+        client = PubMedClient(base_url=server.url, rate_limiter=TokenBucket(1000, 1000), cache=None)
+        pmids = [str(500_000 + i * 37) for i in range(count)]
+
+        for label, batch_size in (("one PMID per request", 1), (f"{BATCH_SIZE} PMIDs per request", BATCH_SIZE)):
+            bench_db = Database(str(workdir / f"graph-{batch_size}.db"))
+            t = time.perf_counter()
+            result = refresh_citations(bench_db, pmids, client, batch_size=batch_size)
+            print(f"refresh_citations ({label}): {result['requests']} requests, "
+                  f"{result['edges']:,} edges in {time.perf_counter() - t:.2f}s")
+
+        # Seed a library from the same PMIDs and expand it
+        bench_db = Database(str(workdir / "library.db"))
+        bench_db.add_research_studies(_fetch_records(client, pmids[:200], lambda tags: True))
+        result = expand_library(bench_db, client, max_hops=2, max_new_studies=300, max_examined=1500)
+        print(f"expand_library: {result['added']} added, {result['examined']} examined "
+              f"in {result['elapsed_seconds']}s")
+        for hop in result["hops"]:
+            print(f"  {hop}")
+
+        t = time.perf_counter()
+        top = most_cited(bench_db, limit=10)
+        print(f"most_cited: {(time.perf_counter() - t) * 1000:.1f} ms, top = "
+              f"{[(s['pubmed_id'], s['citations']) for s in top[:3]]}")
@@ -39,6 +39,9 @@ else:
 # Database type detection
 DATABASE_TYPE = "postgresql" if DATABASE_URL else "sqlite"
 
+# Connections kept open for API worker threads
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "4"))
+
 # NCBI/PubMed API
 NCBI_EMAIL = os.getenv("NCBI_EMAIL", "")
 NCBI_API_KEY = os.getenv("NCBI_API_KEY", "")
@@ -46,6 +49,114 @@ NCBI_API_KEY = os.getenv("NCBI_API_KEY", "")
 if not NCBI_EMAIL:
     print("⚠️  Warning: NCBI_EMAIL not set in .env file")
 
+# E-utilities endpoint (override to point at a local mock server)
+NCBI_EUTILS_BASE_URL = os.getenv(
+    "NCBI_EUTILS_BASE_URL", "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
+).rstrip("/")
+
+# NCBI allows 3 requests/second without an API key, 10 with one
+NCBI_REQUESTS_PER_SECOND = float(os.getenv(
+    "NCBI_REQUESTS_PER_SECOND", "10" if NCBI_API_KEY else "3"
+))
+
+# Concurrent E-utilities requests in flight for the async client
+NCBI_MAX_CONCURRENCY = int(os.getenv("NCBI_MAX_CONCURRENCY", "4"))
+
+# HTTP behaviour for E-utilities: pooled keep-alive connections, retries, circuit breaker
+NCBI_HTTP_CONFIG = {
+    "pool_size": int(os.getenv("NCBI_HTTP_POOL_SIZE", "10")),
+    "max_retries": int(os.getenv("NCBI_MAX_RETRIES", "3")),  # 429 / 5xx / timeouts
+    "backoff_base_seconds": float(os.getenv("NCBI_BACKOFF_BASE_SECONDS", "0.5")),
+    "backoff_max_seconds": float(os.getenv("NCBI_BACKOFF_MAX_SECONDS", "8")),
+    "breaker_failure_threshold": int(os.getenv("NCBI_BREAKER_FAILURES", "5")),  # consecutive
+    "breaker_reset_seconds": float(os.getenv("NCBI_BREAKER_RESET_SECONDS", "30")),
+}
+
+# PMIDs per efetch request during research sync (NCBI recommends <= 200 per GET)
+EFETCH_BATCH_SIZE = int(os.getenv("EFETCH_BATCH_SIZE", "200"))
+
+# PMIDs per esearch page when collecting everything added since a term's watermark
+ESEARCH_PAGE_SIZE = int(os.getenv("ESEARCH_PAGE_SIZE", "1000"))
+
+# Staged research ingest pipeline (fetch -> parse/extract -> write)
+# Spawning the parse pool costs ~0.6s before the first batch is parsed, and
+# parsing runs at ~1000 articles/s per core, so the pool only pays for itself
+# on multi-core hosts and syncs of a few thousand articles. Smaller syncs
+# parse in the pipeline's own thread: with a 0.01s mock E-utilities server,
+# 200 articles took 1.07s through the pool vs 0.44s in-thread (serial 0.45s),
+# and 4000 took 3.70s in-thread vs 4.20s serial.
+RESEARCH_PIPELINE_CONFIG = {
+    # 0 parses in a thread; a single-CPU host gains nothing from a process
+    "parse_workers": int(os.getenv("PIPELINE_PARSE_WORKERS",
+                                   str(os.cpu_count() if (os.cpu_count() or 1) > 1 else 0))),
+    "queue_size": int(os.getenv("PIPELINE_QUEUE_SIZE", "8")),  # items between stages
+    # Syncs below this many PMIDs parse in-thread even when workers are configured
+    "pool_min_articles": int(os.getenv("PIPELINE_POOL_MIN_ARTICLES", "2000")),
+}
+
+# Studies a research index may fall behind by before it stops catching up
+# inside the request that inserted them; the backlog (an existing library
+# on its first index, or a bulk insert) is left to the background refresh
+# (research_indexing.schedule_refresh) or the refresh-indexes command
+INDEX_BACKLOG_STUDIES = int(os.getenv("INDEX_BACKLOG_STUDIES", "1000"))
+
+# Near-duplicate study detection (MinHash signatures, LSH band index)
+# bands * rows = signature length; with 20 bands of 6 rows, pairs above ~0.6
+# Jaccard similarity usually share a bucket and are then checked against `threshold`
+NEAR_DUPLICATE_CONFIG = {
+    "bands": int(os.getenv("NEAR_DUPLICATE_BANDS", "20")),
+    "rows": int(os.getenv("NEAR_DUPLICATE_ROWS", "6")),
+    "threshold": float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.7")),  # estimated Jaccard
+}
+
+# BM25 relevance ranking of studies per food and cancer type
+RESEARCH_RANKING_CONFIG = {
+    "k1": float(os.getenv("RANKING_BM25_K1", "1.2")),
+    "b": float(os.getenv("RANKING_BM25_B", "0.75")),
+    # New studies are scored with the current term statistics; every stored
+    # score is refreshed once the library has grown by this fraction
+    "rescore_growth": float(os.getenv("RANKING_RESCORE_GROWTH", "0.1")),
+    "evidence_limit": int(os.getenv("RANKING_EVIDENCE_LIMIT", "20")),  # studies per food in protocols
+}
+
+RELATED_STUDIES_CONFIG = {
+    "k": int(os.getenv("RELATED_STUDIES_K", "10")),  # neighbors stored per study
+    "max_terms": int(os.getenv("RELATED_MAX_TERMS", "64")),  # strongest terms kept per vector
+    "max_df_ratio": float(os.getenv("RELATED_MAX_DF_RATIO", "0.2")),  # commoner terms carry no weight
+    # Rebuild vocabulary, vectors and neighbor lists once the library has grown by this fraction
+    "rebuild_growth": float(os.getenv("RELATED_REBUILD_GROWTH", "0.1")),
+}
+
+CITATION_GRAPH_CONFIG = {
+    "batch_size": int(os.getenv("ELINK_BATCH_SIZE", "200")),  # PMIDs per elink request
+    "refresh_days": int(os.getenv("CITATION_REFRESH_DAYS", "30")),  # re-fetch a PMID's links after this
+    # Expansion bounds (python src/main.py expand-citations)
+    "max_hops": int(os.getenv("CITATION_MAX_HOPS", "2")),
+    "max_new_studies": int(os.getenv("CITATION_MAX_NEW_STUDIES", "200")),
+    "max_examined": int(os.getenv("CITATION_MAX_EXAMINED", "2000")),  # candidates fetched per run
+}
+
+FOOD_EVIDENCE_CONFIG = {
+    # Dosed studies a food needs before protocols use its research-derived dose
+    "min_dose_studies": int(os.getenv("FOOD_EVIDENCE_MIN_DOSE_STUDIES", "3")),
+}
+
+# Publication window (years back) for research searches
+RESEARCH_SYNC_YEARS = int(os.getenv("RESEARCH_SYNC_YEARS", "10"))
+
+# On-disk cache of E-utilities responses
+EUTILS_CACHE_CONFIG = {
+    "enabled": os.getenv("EUTILS_CACHE_ENABLED", "true").lower() == "true",
+    "path": os.getenv("EUTILS_CACHE_PATH", str(DATA_DIR / "eutils_cache.db")),
+    "max_bytes": int(os.getenv("EUTILS_CACHE_MAX_MB", "256")) * 1024 * 1024,
+    "ttl_seconds": {  # per endpoint; search results change, article records rarely do
+        "esearch.fcgi": int(os.getenv("EUTILS_CACHE_ESEARCH_TTL", str(6 * 3600))),
+        "efetch.fcgi": int(os.getenv("EUTILS_CACHE_EFETCH_TTL", str(30 * 86400))),
+        "elink.fcgi": int(os.getenv("EUTILS_CACHE_ELINK_TTL", str(7 * 86400))),
+    },
+    "default_ttl_seconds": 86400,
+}
+
 # User defaults
 DEFAULT_USER = os.getenv("DEFAULT_USER", "jesse")
 DEFAULT_WEIGHT_LBS = float(os.getenv("DEFAULT_WEIGHT_LBS", "179"))
@@ -67,6 +178,28 @@ KETO_CONFIG = {
     "target_fat_percentage": int(os.getenv("TARGET_FAT_PERCENTAGE", "75")),
 }
 
+# Upper bound on weights evaluated by one /api/protocol/simulate call
+MAX_SIMULATION_WEIGHTS = int(os.getenv("MAX_SIMULATION_WEIGHTS", "1000"))
+
+# Upper bound on rows converted by one /api/library/dose-calculator/batch call
+MAX_BATCH_DOSES = int(os.getenv("MAX_BATCH_DOSES", "100000"))
+
+# Background pre-generation of tomorrow's protocol
+PREGENERATION_CONFIG = {
+    "enabled": os.getenv("PREGENERATE_PROTOCOLS", "true").lower() == "true",
+    "offpeak_start_hour": int(os.getenv("PREGENERATE_START_HOUR", "2")),  # local time
+    "offpeak_end_hour": int(os.getenv("PREGENERATE_END_HOUR", "5")),
+    "active_days": int(os.getenv("PREGENERATE_ACTIVE_DAYS", "14")),  # activity window
+    "poll_seconds": int(os.getenv("PREGENERATE_POLL_SECONDS", "300")),
+}
+
+# Shared protocol templates (by cancer type and weight band)
+PROTOCOL_TEMPLATE_CONFIG = {
+    "weight_band_lbs": float(os.getenv("TEMPLATE_WEIGHT_BAND_LBS", "10")),
+    "max_entries": int(os.getenv("TEMPLATE_CACHE_SIZE", "256")),
+    "ttl_seconds": int(os.getenv("TEMPLATE_CACHE_TTL_SECONDS", "3600")),
+}
+
 # Allometric scaling factors for dosing conversion
 # Mouse to human: dose_human = dose_mouse × (weight_human / weight_mouse) ^ 0.67
 # Rat to human: dose_human = dose_rat × (weight_human / weight_rat) ^ 0.67
@@ -3,13 +3,16 @@ Database setup and operations for No Colon, Still Rollin'
 Using SQLite with sqlite3
 """
 import sqlite3
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 from typing import List, Optional, Dict, Any
+import hashlib
 import json
 import logging
+import queue
 
-from app.core.config import DATABASE_PATH
+from app.core.config import DATABASE_PATH, DATABASE_POOL_SIZE
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -18,23 +21,25 @@ logger = logging.getLogger(__name__)
 class Database:
     """Database manager for the application"""
 
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, create_tables: bool = True):
         """
         Initialize database connection
 
         Args:
             db_path: Path to database file. If None, uses DATABASE_PATH from config
+            create_tables: Run schema DDL on connect. Pooled connections skip
+                this once the first connection has created the schema.
         """
         self.db_path = db_path or DATABASE_PATH
         self.conn = None
         try:
-            self._ensure_database_exists()
+            self._ensure_database_exists(create_tables)
             logger.info(f"Database initialized at: {self.db_path}")
         except Exception as e:
             logger.error(f"Failed to initialize database: {e}")
             raise
 
-    def _ensure_database_exists(self):
+    def _ensure_database_exists(self, create_tables: bool = True):
         """Create database and tables if they don't exist"""
         try:
             # Ensure directory exists
@@ -46,7 +51,8 @@ class Database:
             self.conn.row_factory = sqlite3.Row  # Return rows as dictionaries
 
             # Create all tables
-            self._create_tables()
+            if create_tables:
+                self._create_tables()
 
         except Exception as e:
             logger.error(f"Error ensuring database exists: {e}")
@@ -117,6 +123,9 @@ class Database:
                 dose_unit TEXT,
                 dose_frequency TEXT,
                 subject_weight_kg REAL,
+                subject_species TEXT,
+                dose_mentions TEXT,      -- JSON list of every dose found (dose_extraction)
+                duplicate_of INTEGER,    -- id of the study this near-duplicates (near_duplicates)
                 results_summary TEXT,
                 efficacy_percentage REAL,
                 doi TEXT,
@@ -125,6 +134,28 @@ class Database:
             )
         """)
 
+        # Research sync progress, one row per PubMed search term
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS research_sync_state (
+                search_term TEXT PRIMARY KEY,
+                last_synced_date TEXT,   -- YYYY/MM/DD watermark; next run searches from here
+                checkpoint TEXT,         -- JSON array of PMIDs from an unfinished run
+                checkpoint_date TEXT,    -- date the unfinished run searched up to
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # Offline bulk ingest progress, one row per baseline/update dump file
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS research_ingest_files (
+                file_name TEXT PRIMARY KEY,
+                articles INTEGER,        -- citations scanned
+                matched INTEGER,         -- citations kept by the keyword filter
+                deleted INTEGER,         -- DeleteCitation PMIDs removed
+                ingested_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
         # Weight records table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS weight_records (
@@ -145,17 +176,181 @@ class Database:
                 user_id INTEGER NOT NULL,
                 date TEXT NOT NULL,
                 weight_lbs REAL NOT NULL,
-                foods TEXT NOT NULL,  -- JSON array of ProtocolFood objects
+                foods TEXT NOT NULL,  -- legacy inline JSON; empty when foods_hash is set
+                foods_hash TEXT,      -- protocol_bodies.hash
                 total_net_carbs REAL DEFAULT 0,
                 total_protein REAL DEFAULT 0,
                 total_fat REAL DEFAULT 0,
                 total_calories REAL DEFAULT 0,
+                keto_compatible BOOLEAN,
+                keto_score REAL,
                 generated_at TEXT DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (user_id) REFERENCES users (id),
                 UNIQUE(user_id, date)
             )
         """)
 
+        # Databases created before content-addressed storage lack these columns
+        self._add_column_if_missing(cursor, "daily_protocols", "foods_hash", "TEXT")
+        self._add_column_if_missing(cursor, "daily_protocols", "keto_compatible", "BOOLEAN")
+        self._add_column_if_missing(cursor, "daily_protocols", "keto_score", "REAL")
+        self._add_column_if_missing(cursor, "research_studies", "subject_species", "TEXT")
+        self._add_column_if_missing(cursor, "research_studies", "dose_mentions", "TEXT")
+        self._add_column_if_missing(cursor, "research_studies", "duplicate_of", "INTEGER")
+
+        # Near-duplicate index: one MinHash signature per study, and its LSH band buckets
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS study_minhash (
+                study_id INTEGER PRIMARY KEY,   -- research_studies.id
+                signature BLOB                  -- uint32 array; NULL when there is no text
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS study_lsh_buckets (
+                bucket INTEGER NOT NULL,        -- hash of one band of the signature
+                study_id INTEGER NOT NULL,
+                PRIMARY KEY (bucket, study_id)
+            ) WITHOUT ROWID
+        """)
+
+        # BM25 ranking (research_ranking): term counts per study, corpus
+        # statistics, and precomputed scores per food and cancer type
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS bm25_documents (
+                study_id INTEGER PRIMARY KEY,
+                length INTEGER NOT NULL        -- words in title + abstract
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS bm25_study_terms (
+                study_id INTEGER NOT NULL,
+                term TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (study_id, term)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS bm25_term_stats (
+                term TEXT PRIMARY KEY,
+                doc_freq INTEGER NOT NULL
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS bm25_corpus (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                documents INTEGER NOT NULL DEFAULT 0,
+                total_length INTEGER NOT NULL DEFAULT 0,
+                scored_documents INTEGER NOT NULL DEFAULT 0   -- library size at the last full rescore
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS study_rankings (
+                food TEXT NOT NULL,
+                cancer_type TEXT NOT NULL,
+                study_id INTEGER NOT NULL,
+                score REAL NOT NULL,
+                PRIMARY KEY (food, cancer_type, study_id)
+            ) WITHOUT ROWID
+        """)
+
+        # Related studies (related_studies): TF-IDF vocabulary, pruned vectors,
+        # and each study's top-k most similar studies
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tfidf_terms (
+                term TEXT PRIMARY KEY,
+                term_id INTEGER NOT NULL UNIQUE,
+                doc_freq INTEGER NOT NULL
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tfidf_vectors (
+                study_id INTEGER PRIMARY KEY,
+                term_ids BLOB NOT NULL,   -- int32 array
+                weights BLOB NOT NULL     -- float32 array, L2 normalized
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tfidf_corpus (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                documents INTEGER NOT NULL DEFAULT 0,
+                built_documents INTEGER NOT NULL DEFAULT 0,  -- library size at the last full build
+                generation INTEGER NOT NULL DEFAULT 0        -- bumped whenever stored vectors are replaced or removed
+            )
+        """)
+        self._add_column_if_missing(cursor, "tfidf_corpus", "generation", "INTEGER NOT NULL DEFAULT 0")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS study_related (
+                study_id INTEGER NOT NULL,
+                related_id INTEGER NOT NULL,
+                score REAL NOT NULL,       -- cosine similarity
+                PRIMARY KEY (study_id, related_id)
+            ) WITHOUT ROWID
+        """)
+
+        # Citation graph (citation_graph): elink edges between PMIDs, in or
+        # out of the library, and when each PMID's links were last fetched
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS study_citations (
+                citing_pmid TEXT NOT NULL,
+                cited_pmid TEXT NOT NULL,
+                fetched_at TEXT NOT NULL,   -- last time elink returned this edge
+                PRIMARY KEY (citing_pmid, cited_pmid)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS citation_fetches (
+                pubmed_id TEXT NOT NULL,
+                linkname TEXT NOT NULL,     -- pubmed_pubmed_refs / pubmed_pubmed_citedin
+                links INTEGER NOT NULL,
+                fetched_at TEXT NOT NULL,
+                PRIMARY KEY (pubmed_id, linkname)
+            ) WITHOUT ROWID
+        """)
+
+        # Per-food evidence (food_evidence): each study's contribution, and
+        # one summary row per food read by protocol generation
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS food_evidence_studies (
+                study_id INTEGER PRIMARY KEY,
+                food TEXT NOT NULL,
+                study_type TEXT NOT NULL,
+                compound TEXT,
+                hed_mg_kg REAL,                  -- human-equivalent dose, if the study has one
+                conservative_hed_mg_kg REAL
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS food_evidence_summary (
+                food TEXT PRIMARY KEY,
+                studies INTEGER NOT NULL,
+                study_type_counts TEXT NOT NULL,  -- JSON object
+                best_evidence_level TEXT,
+                dose_studies INTEGER NOT NULL DEFAULT 0,  -- dosed studies of dose_compound
+                dose_compound TEXT,               -- compound most often dosed; HED columns cover only it
+                hed_median_mg_kg REAL,
+                hed_q1_mg_kg REAL,
+                hed_q3_mg_kg REAL,
+                conservative_hed_median_mg_kg REAL,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS food_evidence_state (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                last_study_id INTEGER NOT NULL DEFAULT 0,  -- watermark for new studies
+                revision INTEGER NOT NULL DEFAULT 0        -- bumped whenever a summary changes
+            )
+        """)
+
+        # Protocol food lists, stored once per content hash
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS protocol_bodies (
+                hash TEXT PRIMARY KEY,  -- sha256 of canonical foods JSON
+                foods TEXT NOT NULL,    -- JSON array of ProtocolFood objects
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
         # Compliance records table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS compliance_records (
@@ -234,6 +429,12 @@ class Database:
             ON daily_protocols(user_id, date)
         """)
 
+        # Whether any protocol still references a body (see save_daily_protocol)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_protocols_foods_hash
+            ON daily_protocols(foods_hash)
+        """)
+
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_compliance_user_date
             ON compliance_records(user_id, date)
@@ -244,6 +445,37 @@ class Database:
             ON research_studies(food_studied, cancer_type)
         """)
 
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_research_duplicate_of
+            ON research_studies(duplicate_of)
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_study_rankings_score
+            ON study_rankings(food, cancer_type, score DESC)
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_study_related_related
+            ON study_related(related_id)
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_study_citations_cited
+            ON study_citations(cited_pmid, citing_pmid)
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_food_evidence_studies_food
+            ON food_evidence_studies(food, study_type)
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_food_evidence_studies_compound_hed
+            ON food_evidence_studies(food, compound, hed_mg_kg)
+        """)
+        cursor.execute("DROP INDEX IF EXISTS idx_food_evidence_studies_hed")
+
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_health_photos_user_date
             ON health_photos(user_id, date)
@@ -302,6 +534,13 @@ class Database:
 
         self.conn.commit()
 
+    @staticmethod
+    def _add_column_if_missing(cursor, table: str, column: str, definition: str):
+        """Add a column to an existing table (no-op if it is already there)"""
+        columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
     # User operations
     def create_user(self, user_data: Dict[str, Any]) -> int:
         """Create a new user"""
@@ -345,6 +584,17 @@ class Database:
             return user
         return None
 
+    def get_active_user_ids(self, since: str) -> List[int]:
+        """Get users created, weighed in, checked in or given a protocol since a date"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT id FROM users WHERE created_at >= ?
+            UNION SELECT user_id FROM weight_records WHERE date >= ?
+            UNION SELECT user_id FROM compliance_records WHERE date >= ?
+            UNION SELECT user_id FROM daily_protocols WHERE date >= ?
+        """, (since, since, since, since))
+        return [row[0] for row in cursor.fetchall()]
+
     def update_user_weight(self, user_id: int, weight_lbs: float):
         """Update user's current weight"""
         cursor = self.conn.cursor()
@@ -369,6 +619,16 @@ class Database:
         # Also update user's current weight
         self.update_user_weight(user_id, weight_lbs)
 
+    def get_latest_weigh_ins(self, since: str) -> Dict[int, str]:
+        """Time of each user's latest weight record on or after a date"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT user_id, MAX(date) FROM weight_records
+            WHERE date >= ?
+            GROUP BY user_id
+        """, (since,))
+        return {row[0]: row[1] for row in cursor.fetchall()}
+
     def get_weight_history(self, user_id: int, limit: int = 52) -> List[Dict]:
         """Get weight history (default last year of weekly weigh-ins)"""
         cursor = self.conn.cursor()
@@ -381,6 +641,13 @@ class Database:
         return [dict(row) for row in cursor.fetchall()]
 
     # Food operations
+    _FOOD_COLUMNS = (
+        'common_names', 'active_compounds', 'net_carbs_per_100g', 'protein_per_100g',
+        'fat_per_100g', 'fiber_per_100g', 'cancer_types', 'mechanisms', 'best_preparation',
+        'preparation_notes', 'max_daily_amount_grams', 'side_effects', 'contraindications',
+        'evidence_level', 'pubmed_ids',
+    )
+
     def add_food(self, food_data: Dict[str, Any]) -> int:
         """Add a new food to the database"""
         cursor = self.conn.cursor()
@@ -420,6 +687,22 @@ class Database:
         self.conn.commit()
         return cursor.lastrowid
 
+    def update_food(self, name: str, changes: Dict[str, Any]) -> bool:
+        """Update some fields of a food; returns False if there is no such food"""
+        columns = {
+            field: json.dumps(value) if isinstance(value, (list, dict)) else value
+            for field, value in changes.items()
+            if field in self._FOOD_COLUMNS
+        }
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            UPDATE foods
+            SET {''.join(f"{field} = ?, " for field in columns)}last_updated = ?
+            WHERE name = ?
+        """, (*columns.values(), datetime.now().isoformat(), name))
+        self.conn.commit()
+        return cursor.rowcount > 0
+
     def get_all_foods(self) -> List[Dict]:
         """Get all foods"""
         cursor = self.conn.cursor()
@@ -450,96 +733,334 @@ class Database:
         return None
 
     # Research operations
+    _RESEARCH_STUDY_COLUMNS = (
+        'pubmed_id', 'title', 'authors', 'journal', 'year', 'abstract',
+        'study_type', 'food_studied', 'compound_studied', 'cancer_type',
+        'dose_amount', 'dose_unit', 'dose_frequency', 'subject_weight_kg',
+        'results_summary', 'efficacy_percentage', 'doi', 'url',
+        'subject_species', 'dose_mentions',
+    )
+
+    def _research_study_sql(self, verb: str) -> str:
+        """INSERT statement for the research study columns"""
+        columns = ', '.join(self._RESEARCH_STUDY_COLUMNS)
+        placeholders = ', '.join('?' for _ in self._RESEARCH_STUDY_COLUMNS)
+        return f"{verb} INTO research_studies ({columns}) VALUES ({placeholders})"
+
+    def _research_study_row(self, study_data: Dict[str, Any]) -> tuple:
+        """Column values for one research study, in _RESEARCH_STUDY_COLUMNS order"""
+        return tuple(study_data.get(column) for column in self._RESEARCH_STUDY_COLUMNS)
+
     def add_research_study(self, study_data: Dict[str, Any]) -> int:
         """Add a research study"""
         cursor = self.conn.cursor()
         try:
-            cursor.execute("""
-                INSERT INTO research_studies (
-                    pubmed_id, title, authors, journal, year, abstract,
-                    study_type, food_studied, compound_studied, cancer_type,
-                    dose_amount, dose_unit, dose_frequency, subject_weight_kg,
-                    results_summary, efficacy_percentage, doi, url
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                study_data.get('pubmed_id'),
-                study_data.get('title'),
-                study_data.get('authors'),
-                study_data.get('journal'),
-                study_data.get('year'),
-                study_data.get('abstract'),
-                study_data.get('study_type'),
-                study_data.get('food_studied'),
-                study_data.get('compound_studied'),
-                study_data.get('cancer_type'),
-                study_data.get('dose_amount'),
-                study_data.get('dose_unit'),
-                study_data.get('dose_frequency'),
-                study_data.get('subject_weight_kg'),
-                study_data.get('results_summary'),
-                study_data.get('efficacy_percentage'),
-                study_data.get('doi'),
-                study_data.get('url'),
-            ))
+            cursor.execute(self._research_study_sql("INSERT"), self._research_study_row(study_data))
             self.conn.commit()
             return cursor.lastrowid
         except sqlite3.IntegrityError:
             # Study already exists (duplicate pubmed_id)
             return -1
 
+    def add_research_studies(self, studies: List[Dict[str, Any]]) -> int:
+        """
+        Bulk-insert research studies in one transaction
+
+        Studies whose pubmed_id is already stored are skipped.
+
+        Returns:
+            Number of studies inserted
+        """
+        if not studies:
+            return 0
+
+        before = self.conn.total_changes
+        with self.conn:
+            self.conn.executemany(
+                self._research_study_sql("INSERT OR IGNORE"),
+                [self._research_study_row(study) for study in studies]
+            )
+        return self.conn.total_changes - before
+
+    def upsert_research_studies(self, studies: List[Dict[str, Any]]) -> int:
+        """
+        Bulk insert-or-update research studies in one transaction
+
+        Existing rows keep their id and are overwritten with the new values,
+        so a newer revision of a citation (PubMed update files) replaces the
+        old one.
+
+        Returns:
+            Number of studies written
+        """
+        if not studies:
+            return 0
+
+        updates = ', '.join(
+            f"{column} = excluded.{column}"
+            for column in self._RESEARCH_STUDY_COLUMNS if column != 'pubmed_id'
+        )
+        with self.conn:
+            self.conn.executemany(
+                f"{self._research_study_sql('INSERT')} ON CONFLICT(pubmed_id) DO UPDATE SET {updates}",
+                [self._research_study_row(study) for study in studies]
+            )
+        return len(studies)
+
+    def delete_research_studies(self, pubmed_ids: List[str]) -> int:
+        """Delete studies by PubMed ID; returns the number removed"""
+        before = self.conn.total_changes
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM research_studies WHERE pubmed_id = ?",
+                [(pmid,) for pmid in pubmed_ids]
+            )
+        return self.conn.total_changes - before
+
+    def get_ingested_dump_files(self) -> set:
+        """Names of dump files already bulk-ingested"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT file_name FROM research_ingest_files")
+        return {row[0] for row in cursor.fetchall()}
+
+    def record_ingested_dump_file(self, file_name: str, articles: int, matched: int, deleted: int):
+        """Mark a dump file as ingested"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            INSERT OR REPLACE INTO research_ingest_files
+            (file_name, articles, matched, deleted, ingested_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, (file_name, articles, matched, deleted))
+        self.conn.commit()
+
+    def get_existing_pubmed_ids(self, pubmed_ids: List[str]) -> set:
+        """Return the subset of pubmed_ids already in research_studies"""
+        pubmed_ids = list(dict.fromkeys(pubmed_ids))
+        existing = set()
+        cursor = self.conn.cursor()
+
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(pubmed_ids), 500):
+            chunk = pubmed_ids[start:start + 500]
+            cursor.execute(
+                f"SELECT pubmed_id FROM research_studies WHERE pubmed_id IN ({','.join('?' for _ in chunk)})",
+                chunk
+            )
+            existing.update(row[0] for row in cursor.fetchall())
+
+        return existing
+
+    def get_research_study_ids(self, pubmed_ids: List[str]) -> Dict[str, int]:
+        """Map stored PubMed IDs to research_studies row ids"""
+        pubmed_ids = list(dict.fromkeys(pubmed_ids))
+        ids = {}
+        cursor = self.conn.cursor()
+
+        for start in range(0, len(pubmed_ids), 500):
+            chunk = pubmed_ids[start:start + 500]
+            cursor.execute(
+                f"SELECT pubmed_id, id FROM research_studies WHERE pubmed_id IN ({','.join('?' for _ in chunk)})",
+                chunk
+            )
+            ids.update((row[0], row[1]) for row in cursor.fetchall())
+
+        return ids
+
+    def get_research_sync_state(self, search_term: str) -> Optional[Dict]:
+        """Get the sync watermark and any unfinished checkpoint for a search term"""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT * FROM research_sync_state WHERE search_term = ?", (search_term,)
+        )
+        row = cursor.fetchone()
+        if not row:
+            return None
+
+        state = dict(row)
+        state['checkpoint'] = json.loads(state['checkpoint']) if state['checkpoint'] else None
+        return state
+
+    def save_research_sync_checkpoint(self, search_term: str, pubmed_ids: List[str],
+                                      checkpoint_date: str):
+        """Record the PMIDs a sync run found for a term before fetching them"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            INSERT INTO research_sync_state (search_term, checkpoint, checkpoint_date, updated_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(search_term) DO UPDATE SET
+                checkpoint = excluded.checkpoint,
+                checkpoint_date = excluded.checkpoint_date,
+                updated_at = CURRENT_TIMESTAMP
+        """, (search_term, json.dumps(pubmed_ids), checkpoint_date))
+        self.conn.commit()
+
+    def complete_research_sync(self, search_term: str):
+        """Advance a term's watermark to its checkpoint date and clear the checkpoint"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            UPDATE research_sync_state
+            SET last_synced_date = checkpoint_date,
+                checkpoint = NULL,
+                checkpoint_date = NULL,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE search_term = ? AND checkpoint_date IS NOT NULL
+        """, (search_term,))
+        self.conn.commit()
+
     def get_research_for_food(self, food_name: str, cancer_type: str = None) -> List[Dict]:
-        """Get research studies for a specific food"""
+        """Get research studies for a specific food (near-duplicates left out)"""
         cursor = self.conn.cursor()
         if cancer_type:
             cursor.execute("""
                 SELECT * FROM research_studies
-                WHERE food_studied = ? AND cancer_type = ?
+                WHERE food_studied = ? AND cancer_type = ? AND duplicate_of IS NULL
                 ORDER BY year DESC
             """, (food_name, cancer_type))
         else:
             cursor.execute("""
                 SELECT * FROM research_studies
-                WHERE food_studied = ?
+                WHERE food_studied = ? AND duplicate_of IS NULL
                 ORDER BY year DESC
             """, (food_name,))
         return [dict(row) for row in cursor.fetchall()]
 
+    def get_top_research_for_food(self, food_name: str, cancer_type: str = None,
+                                  limit: int = 20) -> List[Dict]:
+        """
+        Most relevant studies for a food, best first (research_ranking)
+
+        Reads precomputed BM25 scores through idx_study_rankings_score, so
+        the cost does not grow with the library. Without a cancer type,
+        studies are ranked for cancer in general.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT r.*, s.score AS relevance_score
+            FROM study_rankings s
+            JOIN research_studies r ON r.id = s.study_id
+            WHERE s.food = ? AND s.cancer_type = ? AND r.duplicate_of IS NULL
+            ORDER BY s.score DESC
+            LIMIT ?
+        """, (food_name.lower(), cancer_type or 'general', limit))
+        return [dict(row) for row in cursor.fetchall()]
+
+    def get_food_evidence_summary(self, food_name: str) -> Optional[Dict]:
+        """Aggregated evidence for a food (food_evidence), or None if no study names it"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT * FROM food_evidence_summary WHERE food = ?", (food_name.lower(),))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        summary = dict(row)
+        summary['study_type_counts'] = json.loads(summary['study_type_counts'])
+        return summary
+
+    def get_food_evidence_revision(self) -> int:
+        """Counter bumped on every food evidence change (part of protocol template keys)"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT revision FROM food_evidence_state WHERE id = 1")
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
     # Protocol operations
     def save_daily_protocol(self, protocol_data: Dict[str, Any]) -> int:
-        """Save a daily protocol"""
+        """
+        Save a daily protocol
+
+        The food list is stored once per content hash in protocol_bodies;
+        the daily row keeps only the hash and totals. If the row for this
+        user and date already holds the same content, nothing is written.
+        A body the replaced row was the last to reference is deleted.
+        """
         cursor = self.conn.cursor()
 
-        foods_json = json.dumps(protocol_data.get('foods', []))
+        foods_json = json.dumps(protocol_data.get('foods', []), sort_keys=True, separators=(',', ':'))
+        foods_hash = hashlib.sha256(foods_json.encode('utf-8')).hexdigest()
 
-        cursor.execute("""
-            INSERT OR REPLACE INTO daily_protocols (
-                user_id, date, weight_lbs, foods,
-                total_net_carbs, total_protein, total_fat, total_calories
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+        row = (
             protocol_data.get('user_id'),
             protocol_data.get('date'),
             protocol_data.get('weight_lbs'),
-            foods_json,
+            foods_hash,
             protocol_data.get('total_net_carbs', 0),
             protocol_data.get('total_protein', 0),
             protocol_data.get('total_fat', 0),
             protocol_data.get('total_calories', 0),
-        ))
+            protocol_data.get('keto_compatible'),
+            protocol_data.get('keto_score'),
+        )
+
+        cursor.execute("""
+            SELECT id, user_id, date, weight_lbs, foods_hash,
+                   total_net_carbs, total_protein, total_fat, total_calories,
+                   keto_compatible, keto_score
+            FROM daily_protocols
+            WHERE user_id = ? AND date = ?
+        """, (row[0], row[1]))
+        existing = cursor.fetchone()
+        if existing and tuple(existing)[1:] == row:
+            return existing['id']
+
+        cursor.execute("""
+            INSERT OR IGNORE INTO protocol_bodies (hash, foods) VALUES (?, ?)
+        """, (foods_hash, foods_json))
+
+        cursor.execute("""
+            INSERT OR REPLACE INTO daily_protocols (
+                user_id, date, weight_lbs, foods, foods_hash,
+                total_net_carbs, total_protein, total_fat, total_calories,
+                keto_compatible, keto_score
+            ) VALUES (?, ?, ?, '', ?, ?, ?, ?, ?, ?, ?)
+        """, row)
+        protocol_id = cursor.lastrowid
+
+        previous_hash = existing['foods_hash'] if existing else None
+        if previous_hash and previous_hash != foods_hash:
+            # Same write transaction as the insert, so no other save can
+            # start referencing the body between the check and the delete
+            cursor.execute("""
+                DELETE FROM protocol_bodies
+                WHERE hash = ?
+                  AND NOT EXISTS (SELECT 1 FROM daily_protocols WHERE foods_hash = ?)
+            """, (previous_hash, previous_hash))
         self.conn.commit()
-        return cursor.lastrowid
+        return protocol_id
+
+    def prune_protocol_bodies(self) -> int:
+        """Delete protocol bodies no protocol references (e.g. left by older versions)"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            DELETE FROM protocol_bodies
+            WHERE NOT EXISTS (SELECT 1 FROM daily_protocols WHERE foods_hash = protocol_bodies.hash)
+        """)
+        self.conn.commit()
+        return cursor.rowcount
+
+    def get_protocol_user_ids(self, date: str) -> List[int]:
+        """Users with a saved protocol for a date"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT DISTINCT user_id FROM daily_protocols WHERE date = ?", (date,))
+        return [row[0] for row in cursor.fetchall()]
 
     def get_protocol_for_date(self, user_id: int, date: str) -> Optional[Dict]:
         """Get protocol for a specific date"""
         cursor = self.conn.cursor()
         cursor.execute("""
-            SELECT * FROM daily_protocols
-            WHERE user_id = ? AND date = ?
+            SELECT p.*, b.foods AS body
+            FROM daily_protocols p
+            LEFT JOIN protocol_bodies b ON b.hash = p.foods_hash
+            WHERE p.user_id = ? AND p.date = ?
         """, (user_id, date))
         row = cursor.fetchone()
         if row:
             protocol = dict(row)
-            protocol['foods'] = json.loads(protocol['foods'])
+            body = protocol.pop('body')
+            protocol['foods'] = json.loads(body if body is not None else protocol['foods'])
+            if protocol['keto_compatible'] is None:
+                # Saved before keto results were stored
+                del protocol['keto_compatible'], protocol['keto_score']
+            else:
+                protocol['keto_compatible'] = bool(protocol['keto_compatible'])
             return protocol
         return None
 
@@ -793,3 +1314,52 @@ class Database:
         """Close database connection"""
         if self.conn:
             self.conn.close()
+
+
+class DatabasePool:
+    """
+    Fixed-size pool of Database connections shared across worker threads
+
+    The schema is created once by the first connection; the rest connect
+    without running DDL. Each connection is handed to one thread at a time.
+    """
+
+    def __init__(self, size: int = DATABASE_POOL_SIZE, db_path: str = None):
+        """
+        Open the pool
+
+        Args:
+            size: Number of connections to keep open
+            db_path: Path to database file. If None, uses DATABASE_PATH from config
+        """
+        self.size = max(1, size)
+        self._connections: "queue.Queue[Database]" = queue.Queue(maxsize=self.size)
+        self._all: List[Database] = []
+
+        for i in range(self.size):
+            db = Database(db_path, create_tables=(i == 0))
+            self._all.append(db)
+            self._connections.put(db)
+
+        logger.info(f"Database pool opened with {self.size} connections")
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """
+        Borrow a connection for the duration of a `with` block
+
+        Args:
+            timeout: Seconds to wait for a free connection (None waits forever)
+        """
+        db = self._connections.get(timeout=timeout)
+        try:
+            yield db
+        finally:
+            self._connections.put(db)
+
+    def close(self):
+        """Close every connection in the pool"""
+        for db in self._all:
+            db.close()
+        self._all = []
+        logger.info("Database pool closed")
@@ -2,9 +2,11 @@
 Dose Calculator for Converting Animal/In Vitro Studies to Human Equivalent Doses
 Uses FDA allometric scaling and standard conversion factors
 """
-from typing import Dict, Optional
+from typing import Dict, Optional, Sequence, Union
 from enum import Enum
 
+import numpy as np
+
 
 class StudyType(str, Enum):
     """Types of preclinical studies"""
@@ -28,6 +30,26 @@ BSA_FACTORS = {
     StudyType.HUMAN: 37,     # 60kg human (default)
 }
 
+# Interspecies safety factor applied to animal HEDs for a conservative starting dose
+SAFETY_FACTOR = 10
+
+ArrayLike = Union[float, str, Sequence, np.ndarray]
+
+
+def _round(values: np.ndarray, digits: int) -> np.ndarray:
+    """
+    np.round that agrees with Python's round() (used by the scalar methods)
+
+    np.round scales by 10**digits first, which can tip values sitting next
+    to a half the other way; those few are re-rounded one at a time.
+    """
+    rounded = np.round(values, digits)
+    scaled = values * 10 ** digits
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_half.any():
+        rounded[near_half] = [round(float(v), digits) for v in values[near_half]]
+    return rounded
+
 
 class DoseCalculator:
     """Calculate human equivalent doses from animal studies"""
@@ -136,6 +158,78 @@ class DoseCalculator:
             "practical_note": f"Approximately {round(grams_needed, 0)}g of {food_name} per day"
         }
 
+    @staticmethod
+    def calculate_batch(
+        study_dose_mg_kg: ArrayLike,
+        study_type: ArrayLike,
+        compound_per_100g_food: ArrayLike,
+        human_weight_kg: ArrayLike = 70
+    ) -> Dict[str, np.ndarray]:
+        """
+        HED, conservative dose and daily food grams for many studies at once
+
+        Same arithmetic and rounding as calculate_full_protocol, on arrays
+        that broadcast together (e.g. n studies against one weight, or a
+        column of weights against a row of studies). Human-study doses are
+        used as-is, without the animal safety factor. Rows that cannot be
+        converted are NaN with the reason in "error".
+
+        Args:
+            study_dose_mg_kg: Study doses (mg/kg)
+            study_type: Species per study (StudyType values)
+            compound_per_100g_food: Compound mg per 100g of food
+            human_weight_kg: Human body weights (kg)
+
+        Returns:
+            Arrays of the broadcast shape: conversion_factor, hed_mg_kg,
+            total_mg, conservative_hed_mg_kg, conservative_total_mg,
+            grams, conservative_grams, error (None where valid)
+        """
+        dose = np.asarray(study_dose_mg_kg, dtype=float)
+        concentration = np.asarray(compound_per_100g_food, dtype=float)
+        weight = np.asarray(human_weight_kg, dtype=float)
+
+        # Km ratio per species: one vectorized comparison per species, with a
+        # second pass over lowercased copies of whatever matched none
+        study_type = np.asarray(study_type, dtype=str)
+        factor = np.full(study_type.shape, np.nan)
+        for attempt in range(2):
+            unmatched = np.isnan(factor)
+            if attempt and unmatched.any():
+                study_type = study_type.copy()
+                study_type[unmatched] = np.char.lower(study_type[unmatched])
+            for kind, km in BSA_FACTORS.items():
+                factor[study_type == kind.value] = km / BSA_FACTORS[StudyType.HUMAN]
+        safety = np.where(study_type == StudyType.HUMAN.value, 1, SAFETY_FACTOR)
+
+        dose, factor, safety, concentration, weight = np.broadcast_arrays(
+            dose, factor, safety, concentration, weight
+        )
+        hed = dose * factor
+        conservative = hed / safety
+        total_mg = _round(hed * weight, 1)
+        conservative_total_mg = _round(conservative * weight, 1)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            usable = concentration > 0
+            grams = np.where(usable, _round(total_mg / concentration * 100, 1), np.nan)
+            conservative_grams = np.where(usable, _round(conservative_total_mg / concentration * 100, 1), np.nan)
+
+        error = np.full(hed.shape, None, dtype=object)
+        error[~usable] = "Compound amount per 100g must be greater than 0"
+        error[np.isnan(factor)] = "Cannot calculate dose for this study type (in vitro or unknown species)"
+
+        return {
+            "conversion_factor": _round(factor, 4),
+            "hed_mg_kg": _round(hed, 3),
+            "total_mg": total_mg,
+            "conservative_hed_mg_kg": _round(conservative, 3),
+            "conservative_total_mg": conservative_total_mg,
+            "grams": grams,
+            "conservative_grams": conservative_grams,
+            "error": error,
+        }
+
     @staticmethod
     def calculate_full_protocol(
         study_dose_mg_kg: float,
@@ -242,3 +336,25 @@ if __name__ == "__main__":
     print(f"  - Conservative: {result['daily_food_amounts']['conservative']['grams']}g ({result['daily_food_amounts']['conservative']['tablespoons']} tbsp)")
     print(f"  - Calculated: {result['daily_food_amounts']['calculated']['grams']}g ({result['daily_food_amounts']['calculated']['tablespoons']} tbsp)")
     print(f"\nRecommendation: {result['recommendation']}")
+
+    # Batch conversion vs one study at a time
+    import random
+    import time
+
+    rng = random.Random(0)
+    count = 100_000
+    species = [rng.choice(["mouse", "rat", "rabbit", "dog", "monkey"]) for _ in range(count)]
+    doses = [round(rng.uniform(1, 500), 2) for _ in range(count)]
+    concentrations = [rng.choice([50, 150, 500, 3000, 4000]) for _ in range(count)]
+
+    start = time.perf_counter()
+    for dose, kind, concentration in zip(doses, species, concentrations):
+        calc.calculate_full_protocol(dose, StudyType(kind), "compound", "food", concentration, 70)
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = calc.calculate_batch(doses, species, concentrations, 70)
+    batch_seconds = time.perf_counter() - start
+
+    print(f"\n{count:,} studies: calculate_full_protocol loop {loop_seconds:.2f}s, "
+          f"calculate_batch {batch_seconds * 1000:.1f} ms")
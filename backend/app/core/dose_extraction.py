@@ -0,0 +1,440 @@
+"""
+Dose extraction from research abstracts for No Colon, Still Rollin'
+One compiled pattern finds every dose, frequency, species and subject-weight
+mention in a single pass; a units table normalizes what it finds
+"""
+from bisect import bisect_right
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import json
+import re
+import time
+
+# Units table: spelling -> (kind, factor to the canonical unit of that kind)
+#   mass          -> mg     (mg/kg for body-weight doses, g for absolute doses)
+#   concentration -> µM
+#   volume        -> mL
+UNITS: Dict[str, Tuple[str, float]] = {
+    "µg": ("mass", 1e-3), "μg": ("mass", 1e-3), "ug": ("mass", 1e-3), "mcg": ("mass", 1e-3),
+    "mg": ("mass", 1.0),
+    "g": ("mass", 1e3),
+    "nM": ("concentration", 1e-3),
+    "µM": ("concentration", 1.0), "μM": ("concentration", 1.0), "uM": ("concentration", 1.0),
+    "mM": ("concentration", 1e3),
+    "ml": ("volume", 1.0), "mL": ("volume", 1.0),
+}
+
+# Canonical units produced
+UNIT_MG_PER_KG = "mg/kg"
+UNIT_G_PER_DAY = "g/day"
+UNIT_G = "g"
+UNIT_UM = "µM"
+UNIT_UG_PER_ML = "µg/mL"
+UNIT_ML = "mL"
+
+FREQUENCY_TERMS: Dict[str, List[str]] = {
+    "twice daily": ["twice daily", "twice a day", "twice per day", "two times daily",
+                    "two times a day", "b.i.d.", "bid"],
+    "three times daily": ["three times daily", "three times a day", "three times per day",
+                          "thrice daily", "t.i.d.", "tid"],
+    "daily": ["once daily", "once a day", "daily", "per day", "a day", "every day",
+              "each day", "once per day", "q.d."],
+    "every other day": ["every other day", "every second day", "on alternate days"],
+    "three times weekly": ["three times a week", "three times per week", "three times weekly"],
+    "twice weekly": ["twice a week", "twice per week", "twice weekly"],
+    "weekly": ["once a week", "once weekly", "weekly", "per week"],
+    "single dose": ["single dose", "single oral dose", "single injection", "single administration"],
+}
+
+# Labels match dose_calculator.StudyType values
+SPECIES_TERMS: Dict[str, List[str]] = {
+    "mouse": ["mice", "mouse", "murine"],
+    "rat": ["rats", "rat"],
+    "rabbit": ["rabbits", "rabbit"],
+    "dog": ["dogs", "dog", "canine", "beagles"],
+    "monkey": ["monkeys", "monkey", "macaques", "macaque", "primates"],
+    "human": ["patients", "participants", "volunteers", "humans", "subjects", "adults",
+              "men", "women", "healthy individuals"],
+    "petri_dish": ["cell line", "cell lines", "cells", "in vitro", "cell culture"],
+}
+
+_NUM = r"(?:\d{1,3}(?:,\d{3})+(?!\d)|\d+(?:\.\d+)?|\.\d+)"
+_RANGE_SEP = r"(?:\s*[-–—−~]\s*|\s+to\s+)"
+_LIST_SEP = r"(?:\s*,\s*|\s*,?\s+(?:and|or)\s+)"
+_INVERSE = r"(?:\s*(?:-1|−1|⁻¹))"
+
+
+def _alternation(terms) -> str:
+    return "|".join(
+        r"\s+".join(re.escape(word) for word in term.split())
+        for term in sorted(terms, key=len, reverse=True)
+    )
+
+
+def _term_index(vocabulary: Dict[str, List[str]]) -> Dict[str, str]:
+    return {" ".join(term.lower().split()): label
+            for label, terms in vocabulary.items() for term in terms}
+
+
+_MASS_UNITS = _alternation(u.lower() for u, (kind, _) in UNITS.items() if kind == "mass")
+_CONC_UNITS = _alternation({u.lower() for u, (kind, _) in UNITS.items() if kind == "concentration"})
+_SPECIES_WEIGHT = _alternation(
+    t for label in ("mouse", "rat", "rabbit", "dog", "monkey") for t in SPECIES_TERMS[label]
+)
+_RANGE = rf"{_NUM}(?:{_RANGE_SEP}{_NUM})?"
+
+# Runs over lower-cased text (much faster than re.IGNORECASE). Numeric
+# mentions and word mentions are two guarded branches, so most positions
+# fail on a single character test. Within a branch alternatives are tried
+# in order: subject weights before doses (so "25 g mice" is not a 25 g
+# dose), frequencies before sentence breaks (so "b.i.d." is not three
+# sentence ends).
+_PATTERN = re.compile(
+    rf"(?<![\w.])(?=[\d.])(?:"
+    # "25 g male balb/c mice", "200-250 g rats"
+    rf"(?P<weight>(?P<w_amount>{_RANGE})\s*(?P<w_unit>kg|g)\s+"
+    rf"(?:[a-z/()-]+\s+){{0,2}}?(?P<w_species>{_SPECIES_WEIGHT})(?!\w))"
+    # Doses: amounts (single, range or list), unit, then optional /kg, /ml, /day
+    rf"|(?P<dose>(?P<amounts>{_NUM}(?:(?:{_RANGE_SEP}|{_LIST_SEP}){_NUM})*)\s*"
+    rf"(?:(?P<mass>{_MASS_UNITS})|(?P<conc>{_CONC_UNITS})|(?P<volume>ml))(?![a-z])"
+    rf"(?P<per_kg>\s*(?:/|per|·)\s*kg{_INVERSE}?|\s+kg{_INVERSE})?"
+    rf"(?P<bw>\s*(?:body\s+weight|bw|b\.w\.)(?![a-z]))?"
+    rf"(?P<per_ml>\s*/\s*ml(?![a-z]))?"
+    rf"(?P<per_day>\s*(?:/|per|·)\s*(?:day|d)(?![a-z]){_INVERSE}?|\s+d(?:ay)?{_INVERSE}"
+    rf"|\s+(?:per|a|each)\s+day(?![a-z])|\s+daily(?![a-z]))?))"
+    rf"|(?<!\w)(?=[a-z])(?:"
+    # "mice (20-25 g)"
+    rf"(?P<paren_weight>(?P<pw_species>{_SPECIES_WEIGHT})\s*\(\s*(?:(?:about|approximately|~)\s*)?"
+    rf"(?P<pw_amount>{_RANGE})\s*(?P<pw_unit>kg|g)\s*[),;])"
+    # "weighing 20-25 g"
+    rf"|(?P<weighing>(?:weighing|weighed|body\s+weights?\s+of)\s+(?:(?:about|approximately|~)\s*)?"
+    rf"(?P<wg_amount>{_RANGE})\s*(?P<wg_unit>kg|g)(?!\w))"
+    rf"|(?P<frequency>{_alternation(t for ts in FREQUENCY_TERMS.values() for t in ts)})(?!\w)"
+    rf"|(?P<species>{_alternation(t for ts in SPECIES_TERMS.values() for t in ts)})(?!\w))"
+    # Sentence breaks
+    rf"|(?P<sentence>[.!?;](?=\s|$))"
+)
+
+
+def _lower(text: str) -> str:
+    """Lower-case without changing length, so match offsets index the original"""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+
+_AMOUNT_TOKEN = re.compile(rf"(?P<num>{_NUM})|(?P<range>{_RANGE_SEP})|(?P<list>{_LIST_SEP})")
+
+_FREQUENCY_INDEX = _term_index(FREQUENCY_TERMS)
+_SPECIES_INDEX = _term_index(SPECIES_TERMS)
+
+
+class DoseMention(NamedTuple):
+    """One dose found in an abstract, in canonical units"""
+    amount: float
+    amount_max: Optional[float]   # upper end of a range
+    unit: str
+    species: Optional[str]
+    frequency: Optional[str]
+    text: str
+
+
+def _number(text: str) -> float:
+    return float(text.replace(",", ""))
+
+
+def _parse_amounts(text: str, between: bool) -> List[Tuple[float, Optional[float]]]:
+    """
+    "50" -> [(50, None)]; "50-100" -> [(50, 100)];
+    "25, 50 or 100" -> [(25, None), (50, None), (100, None)];
+    "between 50 and 100" -> [(50, 100)]
+    """
+    values: List[Tuple[float, Optional[float]]] = []
+    in_range = False
+    for token in _AMOUNT_TOKEN.finditer(text):
+        if token.group("num"):
+            value = _number(token.group("num"))
+            if in_range and values:
+                values[-1] = (values[-1][0], value)
+            else:
+                values.append((value, None))
+            in_range = False
+        elif token.group("range"):
+            in_range = True
+
+    if between and len(values) == 2 and values[0][1] is None:
+        values = [(values[0][0], values[1][0])]
+    return values
+
+
+def _normalize(match, text: str) -> Optional[Tuple[str, float]]:
+    """
+    Canonical unit and multiplier for a dose match, or None if it is not one
+
+    The pattern runs on lower-cased text, so concentration units are
+    checked against the original: "5 mM" is a dose, "5 mm" and "450 nm"
+    are not.
+    """
+    if match.group("conc"):
+        unit = UNITS.get(text[match.start("conc"):match.end("conc")])
+        return (UNIT_UM, unit[1]) if unit and unit[0] == "concentration" else None
+    if match.group("volume"):
+        return UNIT_ML, 1.0
+
+    mg = UNITS[match.group("mass")][1]
+    if match.group("per_kg") or match.group("bw"):
+        return UNIT_MG_PER_KG, mg
+    if match.group("per_ml"):
+        return UNIT_UG_PER_ML, mg * 1e3
+    if match.group("per_day"):
+        return UNIT_G_PER_DAY, mg / 1e3
+    return UNIT_G, mg / 1e3
+
+
+def _midpoint_kg(amounts: str, unit: str) -> Optional[float]:
+    parsed = _parse_amounts(amounts, between=False)
+    if not parsed:
+        return None
+    low, high = parsed[0]
+    grams = (low + high) / 2 if high is not None else low
+    return grams if unit == "kg" else grams / 1000
+
+
+def extract_doses(text: str) -> Dict:
+    """
+    Find every dose mention with its species and frequency
+
+    Each dose takes the species and frequency mentioned in its own
+    sentence (nearest first); otherwise the species falls back to the
+    nearest earlier mention, then the most common one in the text. A
+    "/day" or "daily" attached to the dose implies daily frequency, and
+    an absolute amount taken once daily is reported in g/day.
+
+    Returns:
+        Dict with mentions (List[DoseMention]), species (study-level) and
+        subject_weight_kg
+    """
+    doses = []          # (start, sentence, match)
+    species: List[Tuple[int, int, str]] = []
+    frequencies: List[Tuple[int, int, str]] = []
+    subject_weight_kg = None
+    sentence = 0
+
+    for match in _PATTERN.finditer(_lower(text)):
+        kind = match.lastgroup
+        if kind == "sentence":
+            sentence += 1
+        elif kind == "dose":
+            doses.append((match.start(), sentence, match))
+        elif kind == "frequency":
+            label = _FREQUENCY_INDEX.get(" ".join(match.group(kind).split()))
+            if label:
+                frequencies.append((match.start(), sentence, label))
+        elif kind == "species":
+            label = _SPECIES_INDEX.get(" ".join(match.group(kind).split()))
+            if label:
+                species.append((match.start(), sentence, label))
+        elif kind == "weight":
+            label = _SPECIES_INDEX.get(" ".join(match.group("w_species").split()))
+            species.append((match.start("w_species"), sentence, label))
+            if subject_weight_kg is None:
+                subject_weight_kg = _midpoint_kg(match.group("w_amount"), match.group("w_unit"))
+        elif kind == "paren_weight":
+            label = _SPECIES_INDEX.get(" ".join(match.group("pw_species").split()))
+            species.append((match.start(), sentence, label))
+            if subject_weight_kg is None:
+                subject_weight_kg = _midpoint_kg(match.group("pw_amount"), match.group("pw_unit"))
+        elif kind == "weighing" and subject_weight_kg is None:
+            subject_weight_kg = _midpoint_kg(match.group("wg_amount"), match.group("wg_unit"))
+
+    species_counts: Dict[str, int] = {}
+    for _, _, label in species:
+        species_counts[label] = species_counts.get(label, 0) + 1
+    dominant = max(species_counts, key=species_counts.get) if species_counts else None
+    species_starts = [start for start, _, _ in species]
+
+    def nearest_in_sentence(mentions, start, sentence_no):
+        same = [(abs(s - start), label) for s, n, label in mentions if n == sentence_no]
+        return min(same)[1] if same else None
+
+    mentions = []
+    for start, sentence_no, match in doses:
+        normalized = _normalize(match, text)
+        if normalized is None:
+            continue
+        unit, factor = normalized
+        between = match.string[max(0, start - 8):start].endswith("between ")
+
+        subject = nearest_in_sentence(species, start, sentence_no)
+        if subject is None and species:
+            before = bisect_right(species_starts, start) - 1
+            subject = species[before][2] if before >= 0 else dominant
+        frequency = nearest_in_sentence(frequencies, start, sentence_no)
+        if frequency is None and match.group("per_day"):
+            frequency = "daily"
+        if unit == UNIT_G and frequency == "daily":
+            # "800 mg EGCG once daily" is a per-day amount
+            unit = UNIT_G_PER_DAY
+
+        for low, high in _parse_amounts(match.group("amounts"), between):
+            mentions.append(DoseMention(
+                amount=round(low * factor, 6),
+                amount_max=round(high * factor, 6) if high is not None else None,
+                unit=unit,
+                species=subject,
+                frequency=frequency,
+                text=text[match.start("dose"):match.end("dose")],
+            ))
+
+    return {"mentions": mentions, "species": dominant, "subject_weight_kg": subject_weight_kg}
+
+
+# Preferred unit for the study's headline dose
+_PRIMARY_UNIT_ORDER = [UNIT_MG_PER_KG, UNIT_G_PER_DAY, UNIT_G, UNIT_UM, UNIT_UG_PER_ML, UNIT_ML]
+
+
+def primary_mention(mentions: List[DoseMention]) -> Optional[DoseMention]:
+    """The dose to store as the study's headline: first of the most useful unit"""
+    for unit in _PRIMARY_UNIT_ORDER:
+        for mention in mentions:
+            if mention.unit == unit:
+                return mention
+    return None
+
+
+def dosing_fields(text: str) -> Dict:
+    """
+    research_studies dosing columns for an abstract
+
+    dose_amount/dose_unit/dose_frequency hold the headline dose (low end
+    of a range); every mention is kept as JSON in dose_mentions.
+    """
+    result = extract_doses(text or "")
+    mentions = result["mentions"]
+    primary = primary_mention(mentions)
+
+    return {
+        "dose_amount": primary.amount if primary else None,
+        "dose_unit": primary.unit if primary else "",
+        "dose_frequency": (primary.frequency or "") if primary else "",
+        "subject_weight_kg": result["subject_weight_kg"],
+        "subject_species": (primary.species if primary and primary.species else result["species"]) or "",
+        "dose_mentions": json.dumps([m._asdict() for m in mentions]) if mentions else None,
+    }
+
+
+def reextract_library_doses(db=None, batch_size: int = 2000) -> Dict:
+    """
+    Re-run dose extraction over every stored study
+
+    Pages through research_studies by id and updates each page in one
+    transaction, so it can run against a large library without holding
+    it all in memory.
+
+    Returns:
+        Counts and throughput
+    """
+    from database import Database
+
+    db = db or Database()
+    columns = ("dose_amount", "dose_unit", "dose_frequency", "subject_weight_kg",
+               "subject_species", "dose_mentions")
+    update_sql = (
+        f"UPDATE research_studies SET {', '.join(f'{c} = ?' for c in columns)} WHERE id = ?"
+    )
+
+    start = time.perf_counter()
+    last_id = 0
+    studies = with_dose = 0
+    while True:
+        rows = db.conn.execute(
+            "SELECT id, abstract FROM research_studies WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, batch_size)
+        ).fetchall()
+        if not rows:
+            break
+
+        updates = []
+        for study_id, abstract in rows:
+            fields = dosing_fields(abstract)
+            with_dose += fields["dose_amount"] is not None
+            updates.append(tuple(fields[c] for c in columns) + (study_id,))
+        with db.conn:
+            db.conn.executemany(update_sql, updates)
+
+        studies += len(rows)
+        last_id = rows[-1][0]
+
+    elapsed = time.perf_counter() - start
+    return {
+        "studies": studies,
+        "with_dose": with_dose,
+        "elapsed_seconds": round(elapsed, 2),
+        "studies_per_second": round(studies / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+FIXTURES_PATH = Path(__file__).parent / "data" / "dose_fixtures.json"
+
+
+def evaluate_fixtures(path: Path = FIXTURES_PATH) -> Dict:
+    """
+    Precision/recall of extract_doses against the labeled fixture set
+
+    A mention counts as correct when amount, amount_max and unit match;
+    species and frequency accuracy are measured over correct mentions.
+    """
+    fixtures = json.loads(Path(path).read_text(encoding="utf-8"))
+    true_pos = false_pos = false_neg = 0
+    species_ok = frequency_ok = 0
+
+    def key(m):
+        return (round(m["amount"], 4), round(m["amount_max"], 4) if m["amount_max"] is not None else None,
+                m["unit"])
+
+    for fixture in fixtures:
+        found = {key(m._asdict()): m for m in extract_doses(fixture["text"])["mentions"]}
+        expected = {key({"amount_max": None, **m}): m for m in fixture["doses"]}
+
+        for k, want in expected.items():
+            got = found.get(k)
+            if got is None:
+                false_neg += 1
+                print(f"  missed {k} in: {fixture['text'][:70]}...")
+                continue
+            true_pos += 1
+            species_ok += got.species == want.get("species")
+            frequency_ok += got.frequency == want.get("frequency")
+        for k in found.keys() - expected.keys():
+            false_pos += 1
+            print(f"  spurious {k} in: {fixture['text'][:70]}...")
+
+    return {
+        "fixtures": len(fixtures),
+        "precision": round(true_pos / (true_pos + false_pos), 3) if true_pos + false_pos else 0.0,
+        "recall": round(true_pos / (true_pos + false_neg), 3) if true_pos + false_neg else 0.0,
+        "species_accuracy": round(species_ok / true_pos, 3) if true_pos else 0.0,
+        "frequency_accuracy": round(frequency_ok / true_pos, 3) if true_pos else 0.0,
+    }
+
+
+def benchmark_extraction(count: int = 20000):
+    """Throughput of dosing_fields over fixture abstracts padded to typical length"""
+    fixtures = json.loads(FIXTURES_PATH.read_text(encoding="utf-8"))
+    filler = (" Tumor volume and body weight were measured twice weekly and results were "
+              "compared with vehicle-treated controls using two-way ANOVA.") * 6
+    corpus = [fixtures[i % len(fixtures)]["text"] + filler for i in range(count)]
+
+    total_bytes = sum(len(text) for text in corpus)
+    start = time.perf_counter()
+    for text in corpus:
+        dosing_fields(text)
+    elapsed = time.perf_counter() - start
+    print(f"{count} abstracts ({total_bytes / 1e6:.1f} MB) in {elapsed:.2f}s: "
+          f"{count / elapsed:,.0f} abstracts/s")
+
+
+if __name__ == "__main__":
+    print(evaluate_fixtures())
+    benchmark_extraction()
@@ -0,0 +1,220 @@
+"""
+Persistent E-utilities response cache for No Colon, Still Rollin'
+Shared by PubMedClient and PubMedFetcher so repeated searches and fetches skip NCBI
+"""
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Union
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from config import EUTILS_CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Parameters that identify the caller rather than the request
+_IGNORED_PARAMS = {"email", "api_key", "tool"}
+
+
+class CachedResponse(NamedTuple):
+    """A cached body and whether it is still within its TTL"""
+    key: str
+    body: Union[str, bytes]  # as stored: efetch XML is kept as bytes
+    fresh: bool
+
+
+class EUtilsCache:
+    """
+    SQLite-backed response cache keyed by normalized request parameters
+
+    - Per-endpoint TTLs (short for esearch, long for efetch)
+    - Size-bounded: least recently used entries are evicted past max_bytes.
+      The file is shared by the API, CLI and pipeline processes, so the
+      total is read from the table inside each write, never kept in memory
+    - Expired entries are kept so they can be served when NCBI is unreachable
+    """
+
+    def __init__(self, config: Dict = None):
+        config = config or EUTILS_CACHE_CONFIG
+        self.path = config["path"]
+        self.max_bytes = config["max_bytes"]
+        self.ttl_seconds = config["ttl_seconds"]
+        self.default_ttl_seconds = config["default_ttl_seconds"]
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS eutils_cache (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                body TEXT NOT NULL,  -- or a BLOB for bodies stored as bytes
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        # Covers both the size total and the LRU scan, so neither reads bodies
+        self.conn.execute("DROP INDEX IF EXISTS idx_eutils_cache_access")
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_eutils_cache_lru
+            ON eutils_cache(last_access, size)
+        """)
+        self.conn.commit()
+
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(endpoint: str, params: Dict) -> str:
+        """
+        Normalized cache key
+
+        Caller identity (email, api_key) is dropped, whitespace in values is
+        collapsed and ID lists are sorted, so equivalent requests share a key.
+        """
+        normalized = {}
+        for name, value in params.items():
+            if name in _IGNORED_PARAMS or value is None:
+                continue
+            if isinstance(value, (list, tuple)):
+                # Repeated parameter (elink's id=1&id=2 keeps one linkset per ID)
+                value = sorted({" ".join(str(v).split()) for v in value})
+            else:
+                value = " ".join(str(value).split())
+                if name == "id":
+                    value = ",".join(sorted(set(value.replace(" ", "").split(","))))
+            normalized[name] = value
+
+        raw = json.dumps([endpoint, normalized], sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, endpoint: str, params: Dict) -> Optional[CachedResponse]:
+        """
+        Look up a response, fresh or expired
+
+        Callers should use a fresh entry directly and keep an expired one
+        as a fallback (see serve_stale). Only fresh entries count as hits.
+        """
+        key = self.key(endpoint, params)
+        now = time.time()
+        ttl = self.ttl_seconds.get(endpoint, self.default_ttl_seconds)
+
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT body, fetched_at FROM eutils_cache WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            fresh = now - row[1] < ttl
+            if fresh:
+                self.hits += 1
+                self.conn.execute(
+                    "UPDATE eutils_cache SET last_access = ? WHERE key = ?", (now, key)
+                )
+                self.conn.commit()
+            else:
+                self.misses += 1
+
+            return CachedResponse(key, row[0], fresh)
+
+    def serve_stale(self, cached: CachedResponse) -> Union[str, bytes]:
+        """Record that an expired entry was served because the live request failed"""
+        with self._lock:
+            self.stale_hits += 1
+        logger.warning("E-utilities request failed; serving stale cached response")
+        return cached.body
+
+    def put(self, endpoint: str, params: Dict, body: Union[str, bytes]):
+        """Store a response (text or bytes) and evict least recently used entries past max_bytes"""
+        key = self.key(endpoint, params)
+        size = len(body) if isinstance(body, bytes) else len(body.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        now = time.time()
+        with self._lock:
+            # Write lock first, so the total below includes other processes' writes
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("""
+                    INSERT OR REPLACE INTO eutils_cache
+                    (key, endpoint, body, size, fetched_at, last_access)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (key, endpoint, body, size, now, now))
+                total = self._total_size()
+                if total > self.max_bytes:
+                    self._evict(total)
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                raise
+
+    def _total_size(self) -> int:
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM eutils_cache").fetchone()[0]
+
+    def _evict(self, total: int):
+        """Delete least recently used entries until under max_bytes (lock and transaction held)"""
+        rows = self.conn.execute(
+            "SELECT rowid, size FROM eutils_cache ORDER BY last_access"
+        )
+        doomed = []
+        for rowid, size in rows:
+            if total <= self.max_bytes:
+                break
+            doomed.append((rowid,))
+            total -= size
+
+        self.conn.executemany("DELETE FROM eutils_cache WHERE rowid = ?", doomed)
+        self.evictions += len(doomed)
+
+    def clear(self):
+        """Remove every cached response"""
+        with self._lock:
+            self.conn.execute("DELETE FROM eutils_cache")
+            self.conn.commit()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and size for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            entries = self.conn.execute("SELECT COUNT(*) FROM eutils_cache").fetchone()[0]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": entries,
+                "size_bytes": self._total_size(),
+                "max_bytes": self.max_bytes,
+            }
+
+    def close(self):
+        """Close the cache database"""
+        with self._lock:
+            self.conn.close()
+
+
+# Process-wide cache shared by every PubMed client
+_cache: Optional[EUtilsCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_eutils_cache() -> Optional[EUtilsCache]:
+    """Return the shared cache, or None if caching is disabled"""
+    global _cache
+    if not EUTILS_CACHE_CONFIG["enabled"]:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = EUtilsCache()
+        return _cache
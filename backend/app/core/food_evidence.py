@@ -0,0 +1,367 @@
+"""
+Per-food evidence summaries for No Colon, Still Rollin'
+Study counts by type, the best evidence level and a central human-equivalent
+dose for each food, kept current as studies are added or removed
+
+Each study's contribution (food, study type, HED) is stored in
+food_evidence_studies; a change re-aggregates only the foods it touched,
+through indexes on that table. Protocol generation reads one
+food_evidence_summary row per food.
+
+    python src/main.py summarize-evidence
+"""
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import json
+import threading
+import time
+
+import numpy as np
+
+from dose_calculator import DoseCalculator, StudyType
+from dose_extraction import UNIT_MG_PER_KG
+from models import EvidenceLevel
+
+# Weakest to strongest
+EVIDENCE_ORDER = [level.value for level in EvidenceLevel]
+
+_STUDY_COLUMNS = ("id, food_studied, study_type, compound_studied, dose_amount, dose_unit, "
+                  "subject_species, duplicate_of")
+
+
+def human_equivalent_dose(dose_amount: Optional[float], dose_unit: Optional[str],
+                          species: Optional[str]) -> Optional[Tuple[float, float]]:
+    """
+    (HED, conservative HED) in mg/kg for a study's headline dose
+
+    Only mg/kg doses in a species DoseCalculator can scale give a value;
+    in vitro concentrations and fixed amounts do not.
+    """
+    if not dose_amount or dose_unit != UNIT_MG_PER_KG or not species:
+        return None
+    try:
+        study_type = StudyType(species)
+    except ValueError:
+        return None
+
+    hed = DoseCalculator.animal_to_human_bsa(dose_amount, study_type)
+    if "error" in hed:
+        return None
+    if study_type == StudyType.HUMAN:
+        # Already a human dose; no interspecies safety factor
+        return hed["human_dose_mg_kg"], hed["human_dose_mg_kg"]
+    return hed["calculated_hed_mg_kg"], hed["conservative_hed_mg_kg"]
+
+
+def _contribution(row) -> Optional[Tuple]:
+    """food_evidence_studies row for a research_studies row, or None if it does not count"""
+    study_id, food, study_type, compound, dose_amount, dose_unit, species, duplicate_of = row
+    if not food or duplicate_of is not None:
+        return None
+    hed = human_equivalent_dose(dose_amount, dose_unit, species)
+    return (study_id, food.lower(), study_type or "", compound or None,
+            hed[0] if hed else None, hed[1] if hed else None)
+
+
+def _median_and_quartiles(db, food: str, compound: str, column: str, n: int) -> Tuple[float, float, float]:
+    """Median, Q1 and Q3 of a column over one food's doses of one compound, read in index order"""
+    def at(position: float) -> float:
+        lo = int(position)
+        values = [row[0] for row in db.conn.execute(
+            f"SELECT {column} FROM food_evidence_studies "
+            f"WHERE food = ? AND compound = ? AND {column} IS NOT NULL ORDER BY {column} LIMIT 2 OFFSET ?",
+            (food, compound, lo)
+        )]
+        if len(values) < 2 or position == lo:
+            return values[0]
+        return values[0] + (values[1] - values[0]) * (position - lo)
+
+    return at((n - 1) * 0.5), at((n - 1) * 0.25), at((n - 1) * 0.75)
+
+
+def _summarize(db, foods: Iterable[str]):
+    """Re-aggregate summary rows for these foods and bump the revision. The caller holds the transaction."""
+    foods = set(foods)
+    for food in foods:
+        counts = dict(db.conn.execute(
+            "SELECT study_type, COUNT(*) FROM food_evidence_studies WHERE food = ? GROUP BY study_type",
+            (food,)
+        ).fetchall())
+        if not counts:
+            db.conn.execute("DELETE FROM food_evidence_summary WHERE food = ?", (food,))
+            continue
+
+        ranked = [level for level in EVIDENCE_ORDER if counts.get(level)]
+
+        # Dose statistics cover only the most often dosed compound: protocols
+        # turn the median into grams with that compound's concentration, so
+        # other compounds' and whole-extract (no compound) doses are left out
+        hed = conservative = (None, None, None)
+        compound, dose_studies = db.conn.execute("""
+            SELECT compound, COUNT(*) FROM food_evidence_studies
+            WHERE food = ? AND hed_mg_kg IS NOT NULL AND compound IS NOT NULL
+            GROUP BY compound ORDER BY COUNT(*) DESC, compound LIMIT 1
+        """, (food,)).fetchone() or (None, 0)
+        if dose_studies:
+            hed = _median_and_quartiles(db, food, compound, "hed_mg_kg", dose_studies)
+            conservative = _median_and_quartiles(db, food, compound, "conservative_hed_mg_kg", dose_studies)
+
+        db.conn.execute("""
+            INSERT OR REPLACE INTO food_evidence_summary (
+                food, studies, study_type_counts, best_evidence_level, dose_studies, dose_compound,
+                hed_median_mg_kg, hed_q1_mg_kg, hed_q3_mg_kg, conservative_hed_median_mg_kg, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, (
+            food, sum(counts.values()), json.dumps(counts, sort_keys=True),
+            ranked[-1] if ranked else None, dose_studies, compound,
+            hed[0], hed[1], hed[2], conservative[0],
+        ))
+
+    if foods:
+        db.conn.execute("""
+            INSERT INTO food_evidence_state (id, revision) VALUES (1, 1)
+            ON CONFLICT(id) DO UPDATE SET revision = revision + 1
+        """)
+
+
+def _foods_of(db, study_ids: List[int]) -> Set[str]:
+    foods = set()
+    for start in range(0, len(study_ids), 500):
+        chunk = study_ids[start:start + 500]
+        foods.update(row[0] for row in db.conn.execute(
+            f"SELECT DISTINCT food FROM food_evidence_studies WHERE study_id IN ({','.join('?' for _ in chunk)})",
+            chunk
+        ))
+    return foods
+
+
+def _delete(db, study_ids: List[int]):
+    for start in range(0, len(study_ids), 500):
+        chunk = study_ids[start:start + 500]
+        db.conn.execute(
+            f"DELETE FROM food_evidence_studies WHERE study_id IN ({','.join('?' for _ in chunk)})", chunk
+        )
+
+
+def _watermark(db) -> int:
+    row = db.conn.execute("SELECT last_study_id FROM food_evidence_state WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+def index_new_studies(db, batch_size: int = 5000) -> int:
+    """
+    Add studies inserted since the last call and re-aggregate their foods
+
+    Returns:
+        Number of studies read
+    """
+    last_id = _watermark(db)
+    read = 0
+    touched: Set[str] = set()
+    with db.conn:
+        while True:
+            rows = db.conn.execute(
+                f"SELECT {_STUDY_COLUMNS} FROM research_studies WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                break
+            contributions = [c for c in map(_contribution, rows) if c]
+            db.conn.executemany(
+                "INSERT OR REPLACE INTO food_evidence_studies VALUES (?, ?, ?, ?, ?, ?)", contributions
+            )
+            touched.update(c[1] for c in contributions)
+            last_id = rows[-1][0]
+            read += len(rows)
+
+        if read:
+            db.conn.execute("""
+                INSERT INTO food_evidence_state (id, last_study_id) VALUES (1, ?)
+                ON CONFLICT(id) DO UPDATE SET last_study_id = excluded.last_study_id
+            """, (last_id,))
+        _summarize(db, touched)
+    return read
+
+
+def remove_studies(db, study_ids: Iterable[int]):
+    """Drop deleted studies and re-aggregate the foods they counted toward"""
+    study_ids = list(study_ids)
+    if not study_ids:
+        return
+    with db.conn:
+        foods = _foods_of(db, study_ids)
+        _delete(db, study_ids)
+        _summarize(db, foods)
+
+
+def reindex_studies(db, study_ids: Iterable[int]) -> int:
+    """Recount studies whose tags or doses changed (food, type or dose may differ now)"""
+    watermark = _watermark(db)
+    study_ids = [study_id for study_id in study_ids if study_id <= watermark]
+    if not study_ids:
+        return 0
+    with db.conn:
+        foods = _foods_of(db, study_ids)
+        _delete(db, study_ids)
+        for start in range(0, len(study_ids), 500):
+            chunk = study_ids[start:start + 500]
+            rows = db.conn.execute(
+                f"SELECT {_STUDY_COLUMNS} FROM research_studies WHERE id IN ({','.join('?' for _ in chunk)})",
+                chunk
+            ).fetchall()
+            contributions = [c for c in map(_contribution, rows) if c]
+            db.conn.executemany(
+                "INSERT OR REPLACE INTO food_evidence_studies VALUES (?, ?, ?, ?, ?, ?)", contributions
+            )
+            foods.update(c[1] for c in contributions)
+        _summarize(db, foods)
+    return len(study_ids)
+
+
+def rebuild_food_evidence(db=None) -> Dict:
+    """Recount every study from scratch (after re-extracting doses, for example)"""
+    from database import Database
+
+    db = db or Database()
+    start = time.perf_counter()
+    with db.conn:
+        db.conn.execute("DELETE FROM food_evidence_studies")
+        db.conn.execute("DELETE FROM food_evidence_summary")
+        db.conn.execute("UPDATE food_evidence_state SET last_study_id = 0")
+    studies = index_new_studies(db)
+    foods = db.conn.execute("SELECT COUNT(*) FROM food_evidence_summary").fetchone()[0]
+    return {"studies": studies, "foods": foods, "elapsed_seconds": round(time.perf_counter() - start, 2)}
+
+
+# Dosed-study columns per database, reloaded when the evidence revision changes
+_dose_columns: Dict[str, Tuple[int, Dict[str, np.ndarray]]] = {}
+_dose_columns_lock = threading.Lock()
+
+
+def library_dose_columns(db) -> Dict[str, np.ndarray]:
+    """
+    Every counted study with an mg/kg dose, as columns for DoseCalculator.calculate_batch
+
+    compound_per_100g comes from the food's active_compounds (0 when the
+    dosed compound is not listed, which calculate_batch reports).
+    """
+    revision = db.get_food_evidence_revision()
+    with _dose_columns_lock:
+        cached = _dose_columns.get(db.db_path)
+        if cached and cached[0] == revision:
+            return cached[1]
+
+        concentrations = {
+            (food['name'].lower(), compound['name'].lower()): compound.get('amount_per_100g') or 0
+            for food in db.get_all_foods() for compound in food.get('active_compounds') or []
+        }
+        rows = db.conn.execute("""
+            SELECT r.pubmed_id, e.food, e.compound, r.dose_amount, r.subject_species
+            FROM food_evidence_studies e
+            JOIN research_studies r ON r.id = e.study_id
+            WHERE e.hed_mg_kg IS NOT NULL
+            ORDER BY e.food, e.study_id
+        """).fetchall()
+        columns = {
+            "pubmed_id": np.array([row[0] for row in rows], dtype=object),
+            "food": np.array([row[1] for row in rows], dtype=object),
+            "compound": np.array([row[2] for row in rows], dtype=object),
+            "study_dose_mg_kg": np.array([row[3] for row in rows], dtype=float),
+            "study_type": np.array([row[4] for row in rows], dtype=str),
+            "compound_per_100g": np.array(
+                [concentrations.get((row[1], (row[2] or "").lower()), 0) for row in rows], dtype=float
+            ),
+        }
+        _dose_columns[db.db_path] = (revision, columns)
+        return columns
+
+
+def rescore_library_doses(db, human_weight_kg: float, food: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """
+    Human-equivalent dose and daily food grams of every dosed study, for one body weight
+
+    Returns:
+        Study columns (pubmed_id, food, compound, study_dose_mg_kg, study_type,
+        compound_per_100g) followed by the calculate_batch columns
+    """
+    columns = library_dose_columns(db)
+    if food:
+        mask = columns["food"] == food.lower()
+        columns = {name: values[mask] for name, values in columns.items()}
+    return {
+        **columns,
+        **DoseCalculator.calculate_batch(
+            columns["study_dose_mg_kg"], columns["study_type"], columns["compound_per_100g"], human_weight_kg
+        ),
+    }
+
+
+def _summarize_by_scan(db, food: str) -> Dict:
+    """Aggregate one food straight from research_studies (benchmark baseline)"""
+    import statistics
+
+    types: Counter = Counter()
+    heds: Dict[str, List[float]] = {}
+    for row in db.conn.execute(f"SELECT {_STUDY_COLUMNS} FROM research_studies WHERE food_studied = ?", (food,)):
+        contribution = _contribution(row)
+        if contribution:
+            types[contribution[2]] += 1
+            if contribution[3] is not None and contribution[4] is not None:
+                heds.setdefault(contribution[3], []).append(contribution[4])
+    compound = min(heds, key=lambda c: (-len(heds[c]), c)) if heds else None
+    return {"study_type_counts": dict(types), "dose_compound": compound,
+            "hed_median_mg_kg": statistics.median(heds[compound]) if compound else None}
+
+
+if __name__ == "__main__":
+    # Benchmark: protocol-time lookup vs aggregating the library on every generation
+    import sys
+    import tempfile
+    from pathlib import Path
+    from database import Database
+    from mock_eutils import synthetic_article
+    from pubmed_fetcher import build_study_record
+    from pubmed_xml import iter_pubmed_articles
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    bench_db = Database(str(Path(tempfile.mkdtemp(prefix="food-evidence-")) / "library.db"))
+
+    xml = "<PubmedArticleSet>" + "".join(synthetic_article(str(1_000_000 + i)) for i in range(count)) + "</PubmedArticleSet>"
+    bench_db.add_research_studies([build_study_record(a) for a in iter_pubmed_articles(xml)])
+
+    t = time.perf_counter()
+    result = rebuild_food_evidence(bench_db)
+    print(f"rebuild_food_evidence: {result}")
+
+    foods = [row[0] for row in bench_db.conn.execute("SELECT food FROM food_evidence_summary ORDER BY food")]
+    t = time.perf_counter()
+    for food in foods:
+        bench_db.get_food_evidence_summary(food)
+    print(f"summary lookup: {(time.perf_counter() - t) / len(foods) * 1000:.3f} ms per food")
+
+    t = time.perf_counter()
+    for food in foods:
+        _summarize_by_scan(bench_db, food)
+    print(f"aggregate on demand: {(time.perf_counter() - t) / len(foods) * 1000:.1f} ms per food")
+
+    summary = bench_db.get_food_evidence_summary(foods[0])
+    scanned = _summarize_by_scan(bench_db, foods[0])
+    print(f"  {foods[0]}: {summary['study_type_counts']} best={summary['best_evidence_level']} "
+          f"{summary['dose_compound']} HED median {summary['hed_median_mg_kg']} "
+          f"(scan: {scanned['dose_compound']} {scanned['hed_median_mg_kg']}) "
+          f"from {summary['dose_studies']} dosed studies")
+
+    extra = "<PubmedArticleSet>" + synthetic_article(str(9_000_000)) + "</PubmedArticleSet>"
+    bench_db.add_research_studies([build_study_record(a) for a in iter_pubmed_articles(extra)])
+    t = time.perf_counter()
+    index_new_studies(bench_db)
+    print(f"index_new_studies: 1 new study in {(time.perf_counter() - t) * 1000:.1f} ms")
+
+    t = time.perf_counter()
+    library_dose_columns(bench_db)
+    load = time.perf_counter() - t
+    t = time.perf_counter()
+    for weight in range(50, 150):
+        rescored = rescore_library_doses(bench_db, weight)
+    print(f"rescore_library_doses: {len(rescored['hed_mg_kg']):,} dosed studies in "
+          f"{(time.perf_counter() - t) / 100 * 1000:.1f} ms per weight (columns loaded once in {load:.2f}s)")
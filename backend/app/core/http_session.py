@@ -0,0 +1,76 @@
+"""
+Shared HTTP session and retry policy for No Colon, Still Rollin'
+Keep-alive connection pooling and backoff for NCBI E-utilities
+"""
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+import random
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import NCBI_HTTP_CONFIG
+
+# Statuses worth retrying: rate limited, or a transient server/gateway failure
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def retry_after_seconds(response: Optional[requests.Response]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP date), if present"""
+    if response is None:
+        return None
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(attempt: int, base: float = NCBI_HTTP_CONFIG["backoff_base_seconds"],
+                  maximum: float = NCBI_HTTP_CONFIG["backoff_max_seconds"]) -> float:
+    """
+    Exponential backoff with full jitter
+
+    Attempt 0 waits up to `base`, attempt 1 up to 2 * base, and so on,
+    capped at `maximum`. Randomizing the whole interval keeps clients that
+    failed together from retrying together.
+    """
+    return random.uniform(0, min(maximum, base * (2 ** attempt)))
+
+
+def build_session(pool_size: int = NCBI_HTTP_CONFIG["pool_size"]) -> requests.Session:
+    """A requests.Session with a keep-alive pool sized for concurrent callers"""
+    session = requests.Session()
+    # Retries are done by the caller so each attempt goes through the rate limiter
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "Accept-Encoding": "gzip, deflate",
+        "User-Agent": "no-colon-still-rollin/2.0 (research library)",
+    })
+    return session
+
+
+_ncbi_session: Optional[requests.Session] = None
+_ncbi_session_lock = threading.Lock()
+
+
+def get_ncbi_session() -> requests.Session:
+    """Return the process-wide session for E-utilities requests"""
+    global _ncbi_session
+    with _ncbi_session_lock:
+        if _ncbi_session is None:
+            _ncbi_session = build_session()
+        return _ncbi_session
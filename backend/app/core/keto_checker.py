@@ -2,9 +2,11 @@
 Keto compatibility checker for No Colon, Still Rollin'
 Ensures food recommendations fit ketogenic diet requirements
 """
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from dataclasses import dataclass
 
+import numpy as np
+
 from config import KETO_CONFIG
 
 
@@ -114,7 +116,6 @@ class KetoChecker:
         total_net_carbs = 0
         total_protein = 0
         total_fat = 0
-        total_calories = 0
 
         for food in foods:
             profile = self.calculate_macro_profile(
@@ -124,7 +125,32 @@ class KetoChecker:
             total_net_carbs += profile.net_carbs_g
             total_protein += profile.protein_g
             total_fat += profile.fat_g
-            total_calories += profile.calories
+
+        return self.check_totals(
+            total_net_carbs,
+            total_protein,
+            total_fat,
+            user_weight_kg
+        )
+
+    def check_totals(self, total_net_carbs: float, total_protein: float,
+                     total_fat: float, user_weight_kg: float) -> KetoCompatibility:
+        """
+        Assess keto compatibility from daily macro totals
+
+        Lets callers that keep running totals (e.g. incremental protocol
+        updates) re-score without walking every food again.
+
+        Args:
+            total_net_carbs: Net carbs per day in grams
+            total_protein: Protein per day in grams
+            total_fat: Fat per day in grams
+            user_weight_kg: User's weight in kg
+
+        Returns:
+            KetoCompatibility assessment
+        """
+        total_calories = (total_net_carbs * 4) + (total_protein * 4) + (total_fat * 9)
 
         # Calculate macro ratios
         if total_calories > 0:
@@ -216,6 +242,44 @@ class KetoChecker:
             warnings=warnings,
         )
 
+    def score_totals_array(self, total_net_carbs: np.ndarray, total_protein: np.ndarray,
+                           total_fat: np.ndarray,
+                           user_weight_kg: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized keto check over many sets of daily totals at once
+
+        Applies the same rules as check_totals element-wise, for sweeps
+        where recommendation text is not needed.
+
+        Args:
+            total_net_carbs: Net carbs per day (grams), one entry per scenario
+            total_protein: Protein per day (grams)
+            total_fat: Fat per day (grams)
+            user_weight_kg: User weight (kg) for each scenario
+
+        Returns:
+            (is_keto_friendly, compatibility_score) arrays
+        """
+        total_calories = (total_net_carbs * 4) + (total_protein * 4) + (total_fat * 9)
+        safe_calories = np.where(total_calories > 0, total_calories, 1)
+        fat_pct = np.where(total_calories > 0, total_fat * 9 / safe_calories * 100, 0)
+
+        target_protein = user_weight_kg * self.target_protein_g_per_kg
+
+        is_keto = (total_net_carbs <= self.max_net_carbs) & (fat_pct >= 60)
+
+        score = np.full(np.shape(total_net_carbs), 100.0)
+        carb_overage = np.maximum(total_net_carbs - self.max_net_carbs, 0)
+        score -= np.minimum(50, carb_overage * 5)
+        fat_shortage = np.maximum(self.target_fat_percentage - fat_pct, 0)
+        score -= np.minimum(30, fat_shortage)
+        protein_diff = np.abs(total_protein - target_protein)
+        score -= np.where(protein_diff > 20, np.minimum(20, (protein_diff - 20) * 0.5), 0)
+
+        score = np.round(np.maximum(score, 0), 1)
+
+        return is_keto, score
+
     def suggest_keto_additions(self, current_net_carbs: float,
                               current_fat_pct: float) -> List[Dict]:
         """
@@ -32,27 +32,149 @@ def setup():
     print("  3. Track daily: python src/main.py track")
 
 
-def update_research(max_per_search: int = 20):
+def update_research(max_per_search: int = 20, full: bool = False, pipeline: bool = False):
     """Update research database from PubMed"""
     print("\n🔬 Updating research from PubMed...\n")
 
     try:
         fetcher = PubMedFetcher()
-        fetcher.update_research_database(max_per_search=max_per_search)
+        if pipeline:
+            from research_pipeline import run_research_sync
+            run_research_sync(max_per_search=max_per_search, full=full, fetcher=fetcher)
+        else:
+            fetcher.update_research_database(max_per_search=max_per_search, full=full)
 
         print("\n📊 Research Summary:")
         summary = fetcher.get_research_summary()
         print(f"  Total studies: {summary['total_studies']}")
+        if summary['near_duplicates']:
+            print(f"  Near-duplicates (not counted): {summary['near_duplicates']}")
         print(f"  Top foods:")
         for food, count in list(summary['top_foods'].items())[:5]:
             print(f"    - {food}: {count} studies")
 
+        refresh_indexes()
+
     except Exception as e:
         print(f"\n❌ Error: {e}")
         if "Biopython" in str(e):
             print("\n💡 Install biopython: pip install biopython")
 
 
+def ingest_dumps(paths, workers: int = None, force: bool = False):
+    """Load research from local PubMed baseline/update dump files"""
+    print("\n📦 Ingesting PubMed dump files...\n")
+
+    try:
+        from research_bulk_ingest import bulk_ingest
+        bulk_ingest(paths, workers=workers, force=force)
+        refresh_indexes()
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+
+
+def reextract_doses():
+    """Re-run dose extraction over every stored study"""
+    print("\n💊 Re-extracting doses from stored abstracts...\n")
+
+    try:
+        from dose_extraction import reextract_library_doses
+        from food_evidence import rebuild_food_evidence
+        result = reextract_library_doses()
+        print(f"✅ {result['studies']:,} studies re-extracted, {result['with_dose']:,} with a dose "
+              f"({result['elapsed_seconds']}s, {result['studies_per_second']:,.0f} studies/s)")
+        # Human-equivalent doses in the food summaries come from these columns
+        rebuild_food_evidence()
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+
+
+def cluster_duplicates():
+    """Rebuild the near-duplicate index and clusters for the whole library"""
+    print("\n🧬 Clustering near-duplicate studies...\n")
+
+    try:
+        from near_duplicates import cluster_library
+        result = cluster_library()
+        print(f"✅ {result['studies']:,} studies indexed in {result['elapsed_seconds']}s: "
+              f"{result['duplicates']:,} near-duplicates in {result['clusters']:,} clusters")
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+
+
+def rank_research():
+    """Recompute relevance rankings for the whole library"""
+    print("\n📈 Ranking research by relevance...\n")
+
+    try:
+        from research_ranking import rebuild_rankings
+        result = rebuild_rankings()
+        print(f"✅ {result['studies']:,} studies ranked ({result['rankings']:,} food/cancer rankings) "
+              f"in {result['elapsed_seconds']}s")
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+
+
+def build_related():
+    """Rebuild TF-IDF vectors and related-study lists for the whole library"""
+    print("\n🔗 Finding related studies...\n")
+
+    try:
+        from related_studies import build_related_index
+        result = build_related_index()
+        print(f"✅ {result['studies']:,} studies linked to their {result['neighbor_rows']:,} nearest neighbors "
+              f"({result['terms']:,} terms) in {result['elapsed_seconds']}s")
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+
+
+def expand_citations(hops: int = None, max_new: int = None):
+    """Grow the library along citation links"""
+    print("\n🕸️  Following citations from the library...\n")
+
+    try:
+        from config import CITATION_GRAPH_CONFIG
+        from citation_graph import expand_library
+        result = expand_library(
+            max_hops=hops or CITATION_GRAPH_CONFIG["max_hops"],
+            max_new_studies=max_new or CITATION_GRAPH_CONFIG["max_new_studies"],
+        )
+        for hop in result['hops']:
+            print(f"  Hop {hop['hop']}: {hop['candidates']:,} linked articles, "
+                  f"{hop['examined']:,} fetched, {hop['added']:,} added")
+        print(f"✅ {result['added']:,} studies added in {result['elapsed_seconds']}s")
+        refresh_indexes()
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+
+
+def summarize_evidence():
+    """Recount per-food evidence summaries for the whole library"""
+    print("\n📊 Summarizing evidence per food...\n")
+
+    try:
+        from food_evidence import rebuild_food_evidence
+        result = rebuild_food_evidence()
+        print(f"✅ {result['studies']:,} studies summarized into {result['foods']:,} foods "
+              f"in {result['elapsed_seconds']}s")
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+
+
+def refresh_indexes():
+    """Run full refreshes of research indexes that the library has outgrown"""
+    print("\n🔄 Refreshing research indexes...\n")
+
+    try:
+        from research_indexing import refresh_stale_indexes
+        results = refresh_stale_indexes(Database())
+        for name, result in results.items():
+            print(f"  {name}: {result}")
+        print(f"✅ {len(results)} index(es) refreshed" if results else "✅ All research indexes are current")
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+
+
 def generate_protocol(user: str = "Jesse Mills", weight: float = None):
     """Generate daily protocol"""
     print(f"\n📋 Generating protocol for {user}...\n")
@@ -160,6 +282,30 @@ Examples:
   # Update research database
   python src/main.py update-research
 
+  # Load research from downloaded PubMed baseline files (no network)
+  python src/main.py ingest-dumps ~/pubmed/baseline
+
+  # Re-run dose extraction over the stored library
+  python src/main.py reextract-doses
+
+  # Find preprints and duplicate publications stored under different PMIDs
+  python src/main.py cluster-duplicates
+
+  # Recompute relevance rankings (kept current automatically as studies are added)
+  python src/main.py rank-research
+
+  # Rebuild related-study lists (also kept current automatically)
+  python src/main.py build-related
+
+  # Run index refreshes the library has outgrown (also run after each sync)
+  python src/main.py refresh-indexes
+
+  # Add relevant papers that cite, or are cited by, saved studies
+  python src/main.py expand-citations --hops 2 --max 200
+
+  # Recount per-food evidence and dose summaries (also kept current automatically)
+  python src/main.py summarize-evidence
+
   # Generate today's protocol
   python src/main.py protocol
 
@@ -192,6 +338,41 @@ Examples:
     research_parser = subparsers.add_parser('update-research', help='Update research from PubMed')
     research_parser.add_argument('--max', type=int, default=20,
                                 help='Max results per search (default: 20)')
+    research_parser.add_argument('--full', action='store_true',
+                                help='Ignore sync watermarks and search the full window')
+    research_parser.add_argument('--pipeline', action='store_true',
+                                help='Fetch, parse and store concurrently (staged pipeline)')
+
+    # Offline research ingest
+    ingest_parser = subparsers.add_parser('ingest-dumps',
+                                          help='Load research from PubMed baseline/update .xml.gz files')
+    ingest_parser.add_argument('paths', nargs='+', help='Dump files or directories')
+    ingest_parser.add_argument('--workers', type=int, help='Parser processes (default: CPU count)')
+    ingest_parser.add_argument('--force', action='store_true',
+                               help='Re-ingest files that were already loaded')
+
+    # Dose re-extraction
+    subparsers.add_parser('reextract-doses', help='Re-run dose extraction over stored studies')
+
+    # Near-duplicate clustering
+    subparsers.add_parser('cluster-duplicates', help='Rebuild near-duplicate study clusters')
+
+    # Relevance rankings
+    subparsers.add_parser('rank-research', help='Recompute research relevance rankings')
+
+    # Related studies
+    subparsers.add_parser('build-related', help='Rebuild related-study lists')
+
+    # Pending index refreshes
+    subparsers.add_parser('refresh-indexes', help='Run due full refreshes of research indexes')
+
+    # Citation expansion
+    citations_parser = subparsers.add_parser('expand-citations', help='Add studies linked by citations')
+    citations_parser.add_argument('--hops', type=int, help='Citation links to follow from the library')
+    citations_parser.add_argument('--max', type=int, help='Most studies to add')
+
+    # Food evidence summaries
+    subparsers.add_parser('summarize-evidence', help='Recount per-food evidence summaries')
 
     # Protocol
     protocol_parser = subparsers.add_parser('protocol', help='Generate daily protocol')
@@ -218,7 +399,31 @@ Examples:
         setup()
 
     elif args.command == 'update-research':
-        update_research(max_per_search=args.max)
+        update_research(max_per_search=args.max, full=args.full, pipeline=args.pipeline)
+
+    elif args.command == 'ingest-dumps':
+        ingest_dumps(args.paths, workers=args.workers, force=args.force)
+
+    elif args.command == 'reextract-doses':
+        reextract_doses()
+
+    elif args.command == 'cluster-duplicates':
+        cluster_duplicates()
+
+    elif args.command == 'rank-research':
+        rank_research()
+
+    elif args.command == 'build-related':
+        build_related()
+
+    elif args.command == 'refresh-indexes':
+        refresh_indexes()
+
+    elif args.command == 'expand-citations':
+        expand_citations(hops=args.hops, max_new=args.max)
+
+    elif args.command == 'summarize-evidence':
+        summarize_evidence()
 
     elif args.command == 'protocol':
         generate_protocol(user=args.user, weight=args.weight)
@@ -0,0 +1,420 @@
+"""
+Local stand-in for NCBI E-utilities for No Colon, Still Rollin'
+Serves esearch, efetch and elink from recorded or synthetic fixtures, with
+injectable latency, 429s, server errors and timeouts
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+import hashlib
+import json
+import random
+import threading
+import time
+
+from research_keywords import CANCER_TYPE_TERMS, FOOD_COMPOUNDS, STUDY_TYPE_TERMS
+
+_XML_HEADER = (
+    '<?xml version="1.0" ?>\n'
+    '<!DOCTYPE PubmedArticleSet PUBLIC "-//NLM//DTD PubMedArticle, 1st January 2019//EN" '
+    '"https://dtd.nlm.nih.gov/ncbi/pubmed/out/pubmed_190101.dtd">\n'
+)
+
+# Filler sentences with slots, so synthetic abstracts differ the way real
+# ones do (near-duplicate detection would otherwise cluster them all)
+_FILLER = [
+    "{marker} expression fell by {pct}% in {tissue} after {weeks} weeks of treatment.",
+    "Treatment {verb} tumor proliferation and increased apoptosis compared with {control}.",
+    "No adverse effects on {organ} function or body weight were observed at {pct}% of the maximal dose.",
+    "{marker} and {marker2} were measured by {method} in {n} samples per group.",
+    "The effect was {strength} in {tissue} than in {control} (p < 0.{p}).",
+    "Mechanistically, {compound_role} {verb} {pathway} signalling within {hours} hours.",
+    "Combination with {drug} {verb} tumor volume by a further {pct}%.",
+    "These results support {design} trials of dietary {compound_role} in {population}.",
+]
+_FILLER_SLOTS = {
+    "marker": ["Ki-67", "COX-2", "NF-kB", "Bcl-2", "cyclin D1", "VEGF", "p53", "caspase-3", "MMP-9", "STAT3"],
+    "marker2": ["TNF-alpha", "IL-6", "PCNA", "survivin", "beta-catenin", "Nrf2", "HO-1", "AKT"],
+    "pct": [str(n) for n in range(5, 95, 3)],
+    "tissue": ["colonic mucosa", "tumor xenografts", "liver", "polyps", "crypts", "serum", "stool"],
+    "weeks": [str(n) for n in range(2, 26)],
+    "hours": [str(n) for n in (6, 12, 24, 48, 72)],
+    "verb": ["suppressed", "attenuated", "inhibited", "reduced", "downregulated", "blocked"],
+    "control": ["vehicle controls", "untreated controls", "placebo", "baseline", "sham-treated animals"],
+    "organ": ["liver", "kidney", "cardiac", "hepatic", "renal", "hematologic"],
+    "method": ["western blot", "qPCR", "immunohistochemistry", "ELISA", "flow cytometry", "RNA-seq"],
+    "n": [str(n) for n in range(4, 40)],
+    "strength": ["stronger", "weaker", "more pronounced", "less consistent", "faster"],
+    "p": ["001", "01", "02", "03", "04", "05"],
+    "compound_role": ["the extract", "the isolated compound", "whole-food intake", "the metabolite"],
+    "pathway": ["Wnt", "PI3K/AKT", "MAPK", "mTOR", "JAK/STAT", "Hedgehog", "NF-kB"],
+    "drug": ["5-fluorouracil", "oxaliplatin", "irinotecan", "capecitabine", "cetuximab"],
+    "design": ["randomized", "dose-finding", "placebo-controlled", "crossover", "pilot"],
+    "population": ["healthy adults", "survivors of colorectal cancer", "patients with polyps",
+                   "older adults", "high-risk individuals"],
+}
+
+
+def _filler_sentence(rng: random.Random) -> str:
+    return rng.choice(_FILLER).format(**{slot: rng.choice(values) for slot, values in _FILLER_SLOTS.items()})
+
+_DOSE_PHRASES = [
+    "{dose} mg/kg body weight daily",
+    "{dose} mg/kg/day by oral gavage",
+    "{dose} mg per day",
+    "{dose} g/day",
+    "{dose} μM for 48 hours",
+]
+
+
+def synthetic_article(pmid: str) -> str:
+    """
+    A deterministic, realistic-looking <PubmedArticle> for a PMID
+
+    Study type, food, compound, cancer type and dose vary with the PMID so
+    keyword tagging and dose extraction see a representative mix.
+    """
+    rng = random.Random(int(hashlib.md5(pmid.encode()).hexdigest()[:8], 16))
+    study_type = rng.choice(list(STUDY_TYPE_TERMS))
+    food = rng.choice(list(FOOD_COMPOUNDS))
+    compound = rng.choice(FOOD_COMPOUNDS[food])
+    cancer = rng.choice(list(CANCER_TYPE_TERMS))
+    study_term = rng.choice(STUDY_TYPE_TERMS[study_type])
+    cancer_term = rng.choice(CANCER_TYPE_TERMS[cancer])
+    dose = rng.choice(_DOSE_PHRASES).format(dose=rng.choice([5, 10, 25, 50, 100, 200, 500]))
+    year = rng.randint(2015, 2025)
+
+    abstract = (
+        f"In this {study_term} study we examined {compound} from {food} in {cancer_term} cancer. "
+        f"Subjects received {dose}. " + " ".join(_filler_sentence(rng) for _ in range(rng.randint(3, 8)))
+    )
+    authors = "".join(
+        f"<Author ValidYN=\"Y\"><LastName>Author{pmid[-3:]}{i}</LastName>"
+        f"<ForeName>Test</ForeName><Initials>T</Initials></Author>"
+        for i in range(rng.randint(1, 8))
+    )
+
+    return (
+        f'<PubmedArticle><MedlineCitation Status="MEDLINE" Owner="NLM">'
+        f'<PMID Version="1">{pmid}</PMID><Article PubModel="Print">'
+        f'<Journal><JournalIssue CitedMedium="Print"><PubDate><Year>{year}</Year></PubDate>'
+        f'</JournalIssue><Title>Journal of Synthetic Oncology</Title></Journal>'
+        f'<ArticleTitle>{escape(compound.title())} and {escape(cancer_term)} cancer ({pmid})</ArticleTitle>'
+        f'<Abstract><AbstractText>{escape(abstract)}</AbstractText></Abstract>'
+        f'<AuthorList CompleteYN="Y">{authors}</AuthorList></Article></MedlineCitation>'
+        f'<PubmedData><ArticleIdList><ArticleId IdType="pubmed">{pmid}</ArticleId>'
+        f'<ArticleId IdType="doi">10.5555/synthetic.{pmid}</ArticleId></ArticleIdList>'
+        f'</PubmedData></PubmedArticle>'
+    )
+
+
+def record_fixtures(pubmed_ids: List[str], fixtures_dir: str, client=None) -> int:
+    """
+    Save real PubMed records as per-article fixtures (<pmid>.xml)
+
+    Args:
+        pubmed_ids: Articles to record
+        fixtures_dir: Output directory
+        client: PubMedClient to fetch with (default: PubMedClient())
+
+    Returns:
+        Number of fixtures written
+    """
+    import xml.etree.ElementTree as ET
+    from pubmed_client import PubMedClient
+
+    client = client or PubMedClient()
+    out = Path(fixtures_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    written = 0
+    for start in range(0, len(pubmed_ids), 200):
+        batch = pubmed_ids[start:start + 200]
+        root = ET.fromstring(client.get_raw("efetch.fcgi", client.fetch_params(batch), timeout=60))
+        for article in root.findall("PubmedArticle"):
+            pmid = (article.findtext("./MedlineCitation/PMID") or "").strip()
+            if pmid:
+                (out / f"{pmid}.xml").write_bytes(ET.tostring(article, encoding="utf-8"))
+                written += 1
+    return written
+
+
+class MockEUtilsServer:
+    """
+    Threaded HTTP server that answers like eutils.ncbi.nlm.nih.gov
+
+    - esearch.fcgi: deterministic PMIDs per term (JSON or XML, retstart/retmax)
+    - efetch.fcgi: recorded <pmid>.xml fixtures, else synthetic articles (GET or POST)
+    - elink.fcgi: deterministic citation links (pubmed_pubmed_citedin / _refs)
+    - /_stats: request and injected-fault counters as JSON
+
+    Faults are drawn per request from a seeded RNG, so a run is repeatable:
+    429s carry a Retry-After header, "timeouts" hold the connection for
+    hang_seconds before answering.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.05, jitter: float = 0.0,
+                 rate_limit_rate: float = 0.0, error_rate: float = 0.0,
+                 timeout_rate: float = 0.0, hang_seconds: float = 60.0,
+                 retry_after: int = 1, fixtures_dir: Optional[str] = None,
+                 corpus_size: int = 1_000_000, seed: int = 0):
+        """
+        Args:
+            host, port: Bind address (port 0 picks a free port)
+            latency: Seconds added to every response
+            jitter: Extra random latency, uniform in [0, jitter]
+            rate_limit_rate: Fraction of requests answered 429
+            error_rate: Fraction of requests answered 500/502/503
+            timeout_rate: Fraction of requests that hang for hang_seconds
+            hang_seconds: How long a "timeout" request is held
+            retry_after: Retry-After seconds sent with 429s
+            fixtures_dir: Directory of recorded <pmid>.xml articles
+            corpus_size: Range PMIDs are drawn from
+            seed: RNG seed for faults and jitter
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.hang_seconds = hang_seconds
+        self.retry_after = retry_after
+        self.fixtures_dir = Path(fixtures_dir) if fixtures_dir else None
+        self.corpus_size = corpus_size
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+        self.faults: Dict[str, int] = {"429": 0, "5xx": 0, "timeout": 0}
+
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        """Serve in a background thread and return the base URL"""
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-eutils", daemon=True)
+        self._thread.start()
+        return self.url
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"requests": dict(self.counts), "faults": dict(self.faults)}
+
+    # Request handling
+
+    def _draw_fault(self) -> Tuple[Optional[str], float, int]:
+        """Pick this request's fault (if any), its delay and its error status"""
+        with self._lock:
+            roll = self._rng.random()
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            fault = None
+            if roll < self.rate_limit_rate:
+                fault = "429"
+            elif roll < self.rate_limit_rate + self.error_rate:
+                fault = "5xx"
+            elif roll < self.rate_limit_rate + self.error_rate + self.timeout_rate:
+                fault = "timeout"
+            if fault:
+                self.faults[fault] += 1
+            return fault, delay, self._rng.choice([500, 502, 503])
+
+    def _count(self, endpoint: str):
+        with self._lock:
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+
+    def _search_ids(self, term: str, retstart: int, retmax: int) -> Tuple[int, List[str]]:
+        """Stable result set per term: `total` PMIDs starting at a term-derived offset"""
+        digest = int(hashlib.md5(term.encode()).hexdigest()[:8], 16)
+        total = 5000 + digest % 5000
+        base = 1 + digest % max(1, self.corpus_size - total)
+        end = min(total, retstart + retmax)
+        return total, [str(base + i) for i in range(retstart, end)]
+
+    def esearch(self, params: Dict[str, str]) -> Tuple[str, str]:
+        total, ids = self._search_ids(
+            params.get("term", ""), int(params.get("retstart", 0)), int(params.get("retmax", 20))
+        )
+        if params.get("retmode") == "json":
+            body = json.dumps({"esearchresult": {
+                "count": str(total), "retmax": str(len(ids)),
+                "retstart": params.get("retstart", "0"), "idlist": ids,
+            }})
+            return body, "application/json"
+
+        id_list = "".join(f"<Id>{pmid}</Id>" for pmid in ids)
+        body = (
+            f'<?xml version="1.0" ?>\n<eSearchResult><Count>{total}</Count>'
+            f'<RetMax>{len(ids)}</RetMax><RetStart>{params.get("retstart", "0")}</RetStart>'
+            f'<IdList>{id_list}</IdList></eSearchResult>'
+        )
+        return body, "text/xml"
+
+    def efetch(self, params: Dict[str, str]) -> Tuple[str, str]:
+        parts = [_XML_HEADER, "<PubmedArticleSet>"]
+        for pmid in filter(None, (p.strip() for p in params.get("id", "").split(","))):
+            fixture = self.fixtures_dir / f"{pmid}.xml" if self.fixtures_dir else None
+            if fixture is not None and fixture.exists():
+                parts.append(fixture.read_text(encoding="utf-8"))
+            else:
+                parts.append(synthetic_article(pmid))
+        parts.append("</PubmedArticleSet>")
+        return "".join(parts), "text/xml"
+
+    def elink(self, params: Dict[str, str]) -> Tuple[str, str]:
+        """Each PMID cites a handful of lower PMIDs and is cited by higher ones"""
+        linksets = []
+        for pmid in filter(None, (p.strip() for p in params.get("id", "").split(","))):
+            n = int(pmid)
+            rng = random.Random(n)
+            refs = sorted({str(max(1, n - rng.randint(1, 5000))) for _ in range(rng.randint(3, 12))})
+            cited_in = sorted({str(n + rng.randint(1, 5000)) for _ in range(rng.randint(0, 8))})
+            linksets.append({
+                "dbfrom": "pubmed",
+                "ids": [pmid],
+                "linksetdbs": [
+                    {"dbto": "pubmed", "linkname": "pubmed_pubmed_refs", "links": refs},
+                    {"dbto": "pubmed", "linkname": "pubmed_pubmed_citedin", "links": cited_in},
+                ],
+            })
+        return json.dumps({"header": {"type": "elink"}, "linksets": linksets}), "application/json"
+
+    def _handler_class(self):
+        server = self
+        routes = {"esearch.fcgi": server.esearch, "efetch.fcgi": server.efetch, "elink.fcgi": server.elink}
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: str = "", content_type: str = "text/plain",
+                      headers: Optional[Dict[str, str]] = None):
+                payload = body.encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", f"{content_type}; charset=UTF-8")
+                    self.send_header("Content-Length", str(len(payload)))
+                    for name, value in (headers or {}).items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Client gave up (e.g. its timeout fired during a hang)
+                    self.close_connection = True
+
+            def _handle(self, query: str):
+                path = urlparse(self.path).path
+                endpoint = path.rsplit("/", 1)[-1]
+                if endpoint == "_stats":
+                    return self._send(200, json.dumps(server.stats()), "application/json")
+                if endpoint not in routes:
+                    return self._send(404, "Unknown E-utility")
+
+                server._count(endpoint)
+                # Repeated parameters (id=1&id=2) are read as one comma-separated list
+                params = {k: ",".join(v) for k, v in parse_qs(query).items()}
+                fault, delay, error_status = server._draw_fault()
+
+                if fault == "timeout":
+                    time.sleep(server.hang_seconds)
+                elif delay:
+                    time.sleep(delay)
+
+                if fault == "429":
+                    return self._send(429, '{"error":"API rate limit exceeded"}', "application/json",
+                                      {"Retry-After": str(server.retry_after)})
+                if fault == "5xx":
+                    return self._send(error_status, "Backend unavailable")
+
+                try:
+                    body, content_type = routes[endpoint](params)
+                except (KeyError, ValueError) as e:
+                    return self._send(400, f"Bad request: {e}")
+                self._send(200, body, content_type)
+
+            def do_GET(self):
+                self._handle(urlparse(self.path).query)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                self._handle(self.rfile.read(length).decode("utf-8"))
+
+        return Handler
+
+
+def _serve_in_child(options: Dict, conn):
+    server = MockEUtilsServer(**options)
+    conn.send(server.url)
+    conn.close()
+    server.serve_forever()
+
+
+def start_mock_server_process(**options):
+    """
+    Run a MockEUtilsServer in a separate process
+
+    Keeps the server's CPU time and memory out of benchmark measurements.
+
+    Returns:
+        (process, base_url); terminate the process when done
+    """
+    import multiprocessing
+
+    context = multiprocessing.get_context("spawn")
+    parent, child = context.Pipe()
+    process = context.Process(target=_serve_in_child, args=(options, child), daemon=True)
+    process.start()
+    url = parent.recv()
+    return process, url
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve mock NCBI E-utilities locally")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--hang-seconds", type=float, default=60.0)
+    parser.add_argument("--fixtures-dir")
+    args = parser.parse_args()
+
+    server = MockEUtilsServer(
+        port=args.port, latency=args.latency, jitter=args.jitter,
+        rate_limit_rate=args.rate_limit_rate, error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate, hang_seconds=args.hang_seconds,
+        fixtures_dir=args.fixtures_dir,
+    )
+    print(f"Mock E-utilities at {server.url}")
+    print(f"  export NCBI_EUTILS_BASE_URL={server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -92,6 +92,8 @@ class ResearchStudy:
     dose_unit: str = ""
     dose_frequency: str = ""
     subject_weight_kg: Optional[float] = None
+    subject_species: str = ""
+    dose_mentions: Optional[str] = None   # JSON list of every dose in the abstract
 
     # Results
     results_summary: str = ""
@@ -0,0 +1,505 @@
+"""
+Near-duplicate study detection for No Colon, Still Rollin'
+MinHash signatures over title + abstract shingles, with an LSH band index
+in SQLite so a new study is compared only with studies sharing a bucket
+
+Preprints, duplicate publications and reposted abstracts arrive under
+different PMIDs. Each one is flagged with research_studies.duplicate_of
+(the lowest id in its cluster) and left out of evidence counts.
+
+    python src/main.py cluster-duplicates
+"""
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from config import INDEX_BACKLOG_STUDIES, NEAR_DUPLICATE_CONFIG
+
+BANDS = NEAR_DUPLICATE_CONFIG["bands"]
+ROWS = NEAR_DUPLICATE_CONFIG["rows"]
+NUM_PERM = BANDS * ROWS
+THRESHOLD = NEAR_DUPLICATE_CONFIG["threshold"]
+
+SHINGLE_WORDS = 3
+
+# Signatures compared per new study, however many share its buckets
+MAX_CANDIDATES = 256
+
+# Fixed seed: stored signatures must stay comparable across processes and runs.
+# Each permutation is x -> a*x + b (mod 2**32) with odd a, a bijection on uint32.
+_rng = np.random.default_rng(20240611)
+_PERM_A = (_rng.integers(0, 2 ** 31, NUM_PERM, dtype=np.uint64) * 2 + 1).astype(np.uint32)
+_PERM_B = _rng.integers(0, 2 ** 32, NUM_PERM, dtype=np.uint64).astype(np.uint32)
+_SHINGLE_MIX = np.array([0x9E3779B1, 0x85EBCA77, 0xC2B2AE3D], dtype=np.uint32)
+_BAND_MIX = _rng.integers(1, 2 ** 63, (BANDS, ROWS), dtype=np.uint64) | np.uint64(1)
+_BAND_SALT = _rng.integers(0, 2 ** 63, BANDS, dtype=np.uint64)
+
+# Shingles hashed per permutation block; bounds the (NUM_PERM x shingles) work array
+_BLOCK_SHINGLES = 1 << 16
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_TOKEN_HASH_CACHE_SIZE = 500_000
+_token_hashes: Dict[str, int] = {}
+# Held across clear, fill and lookup: another thread's clear() between the
+# fill and the lookups would otherwise raise KeyError
+_token_hashes_lock = threading.Lock()
+
+
+def _hash_tokens(tokens: List[str]) -> np.ndarray:
+    """Stable 32-bit token hashes (Python's hash() is salted per process)"""
+    with _token_hashes_lock:
+        cache = _token_hashes
+        if len(cache) > _TOKEN_HASH_CACHE_SIZE:
+            cache.clear()
+        for token in set(tokens).difference(cache):
+            cache[token] = zlib.crc32(token.encode())
+        return np.array([cache[token] for token in tokens], dtype=np.uint32)
+
+
+def shingles(title: Optional[str], abstract: Optional[str]) -> np.ndarray:
+    """Distinct hashed word 3-grams of a study's title and abstract"""
+    tokens = _TOKEN.findall(f"{title or ''} {abstract or ''}".lower())
+    hashed = _hash_tokens(tokens)
+    if len(hashed) < SHINGLE_WORDS:
+        return np.unique(hashed)
+
+    with np.errstate(over="ignore"):
+        combined = hashed[:-2] * _SHINGLE_MIX[0]
+        combined ^= hashed[1:-1] * _SHINGLE_MIX[1]
+        combined ^= hashed[2:] * _SHINGLE_MIX[2]
+    return np.unique(combined)
+
+
+def minhash_signatures(shingle_sets: Sequence[np.ndarray]) -> np.ndarray:
+    """
+    MinHash signatures for many shingle sets at once
+
+    All shingles are hashed under every permutation in blocks, and
+    np.minimum.reduceat takes each study's minimum per permutation.
+
+    Returns:
+        (len(shingle_sets), NUM_PERM) uint32 array; rows for empty sets
+        are all 0xFFFFFFFF
+    """
+    signatures = np.full((len(shingle_sets), NUM_PERM), np.iinfo(np.uint32).max, dtype=np.uint32)
+    nonempty = [i for i, s in enumerate(shingle_sets) if len(s)]
+
+    start = 0
+    while start < len(nonempty):
+        # Whole studies per block, up to about _BLOCK_SHINGLES shingles
+        end, size = start, 0
+        while end < len(nonempty) and (end == start or size + len(shingle_sets[nonempty[end]]) <= _BLOCK_SHINGLES):
+            size += len(shingle_sets[nonempty[end]])
+            end += 1
+        block = nonempty[start:end]
+        values = np.concatenate([shingle_sets[i] for i in block])
+        offsets = np.cumsum([0] + [len(shingle_sets[i]) for i in block[:-1]])
+
+        with np.errstate(over="ignore"):
+            hashed = _PERM_A[:, None] * values[None, :] + _PERM_B[:, None]
+        signatures[block] = np.minimum.reduceat(hashed, offsets, axis=1).T
+        start = end
+
+    return signatures
+
+
+def band_keys(signatures: np.ndarray) -> np.ndarray:
+    """
+    LSH bucket keys: one signed 64-bit hash per band of each signature
+
+    Returns:
+        (len(signatures), BANDS) int64 array
+    """
+    bands = signatures.reshape(len(signatures), BANDS, ROWS).astype(np.uint64)
+    with np.errstate(over="ignore"):
+        keys = (bands * _BAND_MIX).sum(axis=2, dtype=np.uint64) + _BAND_SALT
+        keys ^= keys >> np.uint64(31)
+        keys *= np.uint64(0x9E3779B97F4A7C15)
+    return keys.view(np.int64)
+
+
+def similarity(signature: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """Estimated Jaccard similarity: the fraction of matching MinHash values"""
+    return (others == signature).mean(axis=-1)
+
+
+def _load_signatures(db, study_ids: Iterable[int]) -> Dict[int, np.ndarray]:
+    study_ids = list(study_ids)
+    signatures = {}
+    for start in range(0, len(study_ids), 500):
+        chunk = study_ids[start:start + 500]
+        rows = db.conn.execute(
+            f"SELECT study_id, signature FROM study_minhash "
+            f"WHERE study_id IN ({','.join('?' for _ in chunk)}) AND signature IS NOT NULL",
+            chunk
+        ).fetchall()
+        for study_id, blob in rows:
+            signature = np.frombuffer(blob, dtype=np.uint32)
+            if len(signature) == NUM_PERM:
+                signatures[study_id] = signature
+    return signatures
+
+
+def _index_rows(db, rows: List[Tuple[int, str, str]]) -> int:
+    """
+    Add studies to the index and flag the ones that near-duplicate a stored study
+
+    Studies are looked up and added one at a time, so duplicates within
+    the same batch find each other. The caller holds the transaction.
+
+    Returns:
+        Number of studies flagged as duplicates
+    """
+    sets = [shingles(title, abstract) for _, title, abstract in rows]
+    signatures = minhash_signatures(sets)
+    keys = band_keys(signatures)
+    flagged = 0
+
+    for (study_id, _, _), shingle_set, signature, study_keys in zip(rows, sets, signatures, keys):
+        if not len(shingle_set):
+            db.conn.execute("INSERT OR REPLACE INTO study_minhash (study_id, signature) VALUES (?, NULL)",
+                            (study_id,))
+            continue
+
+        shared_bands = Counter()
+        for key in study_keys.tolist():
+            shared_bands.update(row[0] for row in db.conn.execute(
+                "SELECT study_id FROM study_lsh_buckets WHERE bucket = ?", (key,)
+            ))
+        shared_bands.pop(study_id, None)
+        # Studies sharing the most bands are the most similar; a crowded
+        # bucket (boilerplate text) then costs at most MAX_CANDIDATES checks
+        candidates = [other for other, _ in shared_bands.most_common(MAX_CANDIDATES)]
+
+        if candidates:
+            stored = _load_signatures(db, candidates)
+            others = list(stored)
+            sims = similarity(signature, np.array([stored[other] for other in others])) if others else []
+            matches = [other for other, sim in zip(others, sims) if sim >= THRESHOLD]
+            if matches:
+                marks = ','.join('?' for _ in matches)
+                canonical = db.conn.execute(
+                    f"SELECT MIN(COALESCE(duplicate_of, id)) FROM research_studies WHERE id IN ({marks})",
+                    matches
+                ).fetchone()[0]
+                if canonical is not None and canonical != study_id:
+                    db.conn.execute("UPDATE research_studies SET duplicate_of = ? WHERE id = ?",
+                                    (canonical, study_id))
+                    flagged += 1
+
+        db.conn.execute("INSERT OR REPLACE INTO study_minhash (study_id, signature) VALUES (?, ?)",
+                        (study_id, signature.tobytes()))
+        db.conn.executemany("INSERT OR IGNORE INTO study_lsh_buckets (bucket, study_id) VALUES (?, ?)",
+                            [(key, study_id) for key in study_keys.tolist()])
+
+    return flagged
+
+
+def _backlog(db) -> int:
+    """How far the highest indexed id trails the highest study id"""
+    return db.conn.execute("""
+        SELECT (SELECT COALESCE(MAX(id), 0) FROM research_studies)
+             - (SELECT COALESCE(MAX(study_id), 0) FROM study_minhash)
+    """).fetchone()[0]
+
+
+def needs_refresh(db) -> bool:
+    """More than INDEX_BACKLOG_STUDIES studies are waiting to be indexed"""
+    return _backlog(db) > INDEX_BACKLOG_STUDIES
+
+
+def refresh(db) -> Dict:
+    """
+    Index the backlog (research_indexing.refresh_stale_indexes)
+
+    A library with nothing indexed yet is clustered in one pass.
+    """
+    if db.conn.execute("SELECT 1 FROM study_minhash LIMIT 1").fetchone() is None:
+        return cluster_library(db)
+    start = time.perf_counter()
+    flagged = _index_pending(db)
+    return {"duplicates": flagged, "elapsed_seconds": round(time.perf_counter() - start, 2)}
+
+
+def index_new_studies(db, batch_size: int = 1000) -> int:
+    """
+    Index studies added since the last call and flag near-duplicates
+
+    Study ids only grow, so new studies are the ones above the highest
+    indexed id. Each lookup reads BANDS buckets, however large the library.
+    A backlog over INDEX_BACKLOG_STUDIES is left to refresh(), so an insert
+    never indexes the whole library.
+
+    Returns:
+        Number of new studies flagged as duplicates
+    """
+    if needs_refresh(db):
+        return 0
+    return _index_pending(db, batch_size)
+
+
+def _index_pending(db, batch_size: int = 1000) -> int:
+    """Index every study above the watermark; returns duplicates flagged"""
+    flagged = 0
+    last_id = db.conn.execute("SELECT COALESCE(MAX(study_id), 0) FROM study_minhash").fetchone()[0]
+    while True:
+        rows = db.conn.execute(
+            "SELECT id, title, abstract FROM research_studies WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, batch_size)
+        ).fetchall()
+        if not rows:
+            return flagged
+        with db.conn:
+            flagged += _index_rows(db, [tuple(row) for row in rows])
+        last_id = rows[-1][0]
+
+
+def remove_studies(db, study_ids: Iterable[int]):
+    """
+    Drop studies from the index (deleted, or about to be re-indexed)
+
+    A cluster whose first study is removed is re-pointed at its next
+    lowest id. Its members are each similar to the removed study, not
+    necessarily to each other; cluster-duplicates recomputes exactly.
+    """
+    study_ids = list(study_ids)
+    if not study_ids:
+        return
+
+    signatures = _load_signatures(db, study_ids)
+    with db.conn:
+        for study_id, signature in signatures.items():
+            db.conn.executemany("DELETE FROM study_lsh_buckets WHERE bucket = ? AND study_id = ?",
+                                [(key, study_id) for key in band_keys(signature[None, :])[0].tolist()])
+        db.conn.executemany("DELETE FROM study_minhash WHERE study_id = ?", [(i,) for i in study_ids])
+        db.conn.executemany("UPDATE research_studies SET duplicate_of = NULL WHERE id = ?",
+                            [(i,) for i in study_ids])
+
+        for study_id in study_ids:
+            members = [row[0] for row in db.conn.execute(
+                "SELECT id FROM research_studies WHERE duplicate_of = ? ORDER BY id", (study_id,)
+            )]
+            if members:
+                db.conn.execute("UPDATE research_studies SET duplicate_of = NULL WHERE id = ?", (members[0],))
+                db.conn.execute("UPDATE research_studies SET duplicate_of = ? WHERE duplicate_of = ?",
+                                (members[0], study_id))
+
+
+def reindex_studies(db, study_ids: Iterable[int]) -> int:
+    """Re-index studies whose title or abstract changed; returns duplicates flagged"""
+    # Studies above the watermark are not indexed yet; index_new_studies takes them
+    watermark = db.conn.execute("SELECT COALESCE(MAX(study_id), 0) FROM study_minhash").fetchone()[0]
+    study_ids = [study_id for study_id in study_ids if study_id <= watermark]
+    remove_studies(db, study_ids)
+
+    flagged = 0
+    for start in range(0, len(study_ids), 500):
+        chunk = study_ids[start:start + 500]
+        rows = db.conn.execute(
+            f"SELECT id, title, abstract FROM research_studies WHERE id IN ({','.join('?' for _ in chunk)}) "
+            f"ORDER BY id",
+            chunk
+        ).fetchall()
+        with db.conn:
+            flagged += _index_rows(db, [tuple(row) for row in rows])
+    return flagged
+
+
+def _find(parent: np.ndarray, i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def cluster_library(db=None, batch_size: int = 5000) -> Dict:
+    """
+    Rebuild the index and the duplicate clusters for the whole library
+
+    Signatures are computed in batches and every study's band keys are
+    sorted together; studies sharing a key are compared and joined with
+    union-find, so clusters are transitive. Each cluster points at its
+    lowest id.
+
+    Returns:
+        Counts and timings
+    """
+    from database import Database
+
+    db = db or Database()
+    start = time.perf_counter()
+
+    with db.conn:
+        db.conn.execute("DELETE FROM study_lsh_buckets")
+        db.conn.execute("DELETE FROM study_minhash")
+        db.conn.execute("UPDATE research_studies SET duplicate_of = NULL WHERE duplicate_of IS NOT NULL")
+
+    # 1. Signatures and bucket rows
+    ids: List[int] = []
+    signature_batches: List[np.ndarray] = []
+    key_batches: List[np.ndarray] = []
+    last_id = 0
+    while True:
+        rows = db.conn.execute(
+            "SELECT id, title, abstract FROM research_studies WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, batch_size)
+        ).fetchall()
+        if not rows:
+            break
+        sets = [shingles(title, abstract) for _, title, abstract in rows]
+        signatures = minhash_signatures(sets)
+        keys = band_keys(signatures)
+        has_text = np.array([len(s) > 0 for s in sets])
+
+        with db.conn:
+            db.conn.executemany(
+                "INSERT INTO study_minhash (study_id, signature) VALUES (?, ?)",
+                [(row[0], signature.tobytes() if text else None)
+                 for row, signature, text in zip(rows, signatures, has_text)]
+            )
+            db.conn.executemany(
+                "INSERT OR IGNORE INTO study_lsh_buckets (bucket, study_id) VALUES (?, ?)",
+                [(key, row[0]) for row, row_keys, text in zip(rows, keys.tolist(), has_text) if text
+                 for key in row_keys]
+            )
+
+        ids.extend(row[0] for row, text in zip(rows, has_text) if text)
+        signature_batches.append(signatures[has_text])
+        key_batches.append(keys[has_text])
+        last_id = rows[-1][0]
+
+    indexed = time.perf_counter()
+    if not ids:
+        return {"studies": 0, "clusters": 0, "duplicates": 0, "elapsed_seconds": round(indexed - start, 2)}
+
+    # 2. Candidate pairs from shared buckets, verified against the signatures
+    signatures = np.concatenate(signature_batches)
+    keys = np.concatenate(key_batches).ravel()
+    owners = np.repeat(np.arange(len(ids)), BANDS)
+    order = np.argsort(keys, kind="stable")
+    keys, owners = keys[order], owners[order]
+    boundaries = np.flatnonzero(np.diff(keys)) + 1
+    run_starts = np.concatenate(([0], boundaries))
+    run_ends = np.concatenate((boundaries, [len(keys)]))
+
+    parent = np.arange(len(ids))
+    compared = 0
+    multi = run_ends - run_starts > 1
+    for run_start, run_end in zip(run_starts[multi], run_ends[multi]):
+        # Compare each member with one representative per cluster already in
+        # the run, so a bucket of many copies costs O(n), not O(n^2)
+        representatives: List[int] = []
+        for member in np.unique(owners[run_start:run_end]).tolist():
+            root = _find(parent, member)
+            others = [r for r in representatives if _find(parent, r) != root]
+            if len(others) < len(representatives):
+                continue
+            if others:
+                sims = similarity(signatures[member], signatures[others])
+                compared += len(others)
+                matched = [others[i] for i in np.flatnonzero(sims >= THRESHOLD).tolist()]
+                if matched:
+                    for other in matched:
+                        a, b = _find(parent, member), _find(parent, other)
+                        if a != b:
+                            parent[max(a, b)] = min(a, b)
+                    continue
+            representatives.append(member)
+
+    # 3. Point every non-root study at its root (ids are ascending, so the root is the lowest id)
+    roots = np.array([_find(parent, i) for i in range(len(ids))])
+    updates = [(ids[root], ids[i]) for i, root in enumerate(roots.tolist()) if root != i]
+    with db.conn:
+        db.conn.executemany("UPDATE research_studies SET duplicate_of = ? WHERE id = ?", updates)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "studies": len(ids),
+        "clusters": len({int(ids[root]) for root in roots[roots != np.arange(len(ids))]}),
+        "duplicates": len(updates),
+        "pairs_compared": compared,
+        "signature_seconds": round(indexed - start, 2),
+        "elapsed_seconds": round(elapsed, 2),
+    }
+
+
+def get_duplicates(db, study_id: int) -> List[Dict]:
+    """The other studies in a study's near-duplicate cluster"""
+    row = db.conn.execute("SELECT COALESCE(duplicate_of, id) FROM research_studies WHERE id = ?",
+                          (study_id,)).fetchone()
+    if not row:
+        return []
+    canonical = row[0]
+    rows = db.conn.execute("""
+        SELECT id, pubmed_id, title, year, duplicate_of FROM research_studies
+        WHERE (id = ? OR duplicate_of = ?) AND id != ?
+        ORDER BY id
+    """, (canonical, canonical, study_id)).fetchall()
+    return [dict(row) for row in rows]
+
+
+def _synthetic_library(count: int, duplicate_rate: float = 0.05, seed: int = 7):
+    """
+    Random abstracts with planted near-duplicates, for the benchmark
+
+    Returns:
+        (rows for research_studies, list of (original index, copy index))
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"w{i}" for i in range(20000)])
+    studies, planted = [], []
+    for i in range(count):
+        if studies and rng.random() < duplicate_rate:
+            source = int(rng.integers(0, len(studies)))
+            words = studies[source]["abstract"].split()
+            # Reworded copy: replace ~5% of the words
+            for position in rng.integers(0, len(words), max(1, len(words) // 20)):
+                words[position] = vocabulary[rng.integers(0, len(vocabulary))]
+            title, abstract = studies[source]["title"], " ".join(words)
+            planted.append((source, i))
+        else:
+            title = " ".join(rng.choice(vocabulary, 10))
+            abstract = " ".join(rng.choice(vocabulary, int(rng.integers(150, 300))))
+        studies.append({"pubmed_id": str(10_000_000 + i), "title": title, "abstract": abstract,
+                        "cancer_type": "colon", "food_studied": ""})
+    return studies, planted
+
+
+if __name__ == "__main__":
+    # Benchmark: cluster a synthetic library with planted duplicates, then index new studies
+    import sys
+    import tempfile
+    from pathlib import Path
+    from database import Database
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    workdir = Path(tempfile.mkdtemp(prefix="near-duplicates-"))
+    bench_db = Database(str(workdir / "library.db"))
+
+    studies, planted = _synthetic_library(count + 1000)
+    bench_db.add_research_studies(studies[:count])
+    print(f"{count:,} studies, {sum(1 for _, copy in planted if copy < count):,} planted duplicates")
+
+    result = cluster_library(bench_db)
+    print(f"cluster_library: {result}")
+
+    id_of = bench_db.get_research_study_ids([s["pubmed_id"] for s in studies[:count]])
+    flagged = {row[0] for row in bench_db.conn.execute(
+        "SELECT id FROM research_studies WHERE duplicate_of IS NOT NULL")}
+    planted_ids = {id_of[studies[copy]["pubmed_id"]] for _, copy in planted if copy < count}
+    found = len(flagged & planted_ids)
+    print(f"  recall {found / max(1, len(planted_ids)):.3f}, "
+          f"precision {found / max(1, len(flagged)):.3f}")
+
+    bench_db.add_research_studies(studies[count:])
+    t = time.perf_counter()
+    new_flags = index_new_studies(bench_db)
+    elapsed = time.perf_counter() - t
+    new_count = len(studies) - count
+    print(f"index_new_studies: {new_count:,} new studies in {elapsed:.2f}s "
+          f"({elapsed / new_count * 1000:.2f} ms per study), {new_flags} flagged")
@@ -7,19 +7,37 @@ from datetime import datetime, date
 from typing import List, Dict, Optional
 import json
 
+from config import FOOD_EVIDENCE_CONFIG, RESEARCH_RANKING_CONFIG
 from database import Database
+from dose_calculator import DoseCalculator
 from dosing_calculator import DosingCalculator
 from keto_checker import KetoChecker
 from models import PreparationMethod
+from research_ranking import ranking_cancer_type
 
 
 class ProtocolGenerator:
     """Generate daily food protocols"""
 
-    def __init__(self):
-        self.db = Database()
-        self.dosing_calc = DosingCalculator()
-        self.keto_checker = KetoChecker()
+    def __init__(self, db: Optional[Database] = None,
+                 dosing_calc: Optional[DosingCalculator] = None,
+                 keto_checker: Optional[KetoChecker] = None,
+                 catalog=None, templates=None):
+        """
+        Args:
+            db: Database connection (default: open a new one)
+            dosing_calc: Shared dosing calculator (default: create one)
+            keto_checker: Shared keto checker (default: create one)
+            catalog: Shared food catalog cache with a get(db) method
+                     (default: read foods from the database every time)
+            templates: Shared ProtocolTemplateCache (default: build the
+                       food list from scratch for every protocol)
+        """
+        self.db = db if db is not None else Database()
+        self.dosing_calc = dosing_calc or DosingCalculator()
+        self.keto_checker = keto_checker or KetoChecker()
+        self.catalog = catalog
+        self.templates = templates
 
     def generate_daily_protocol(self, user_name: str = "Jesse Mills",
                                 weight_lbs: Optional[float] = None,
@@ -56,37 +74,30 @@ class ProtocolGenerator:
         print(f"Cancer type: {user['cancer_type']}")
         print()
 
-        # Get all anti-cancer foods
-        all_foods = self.db.get_all_foods()
+        # Shared template for this cancer type and weight band
+        template = self._get_template(user['cancer_type'], weight_lbs)
 
-        # Filter for best foods for this cancer type
-        relevant_foods = [
-            f for f in all_foods
-            if user['cancer_type'] in f.get('cancer_types', []) or 'general' in f.get('cancer_types', [])
-        ]
-
-        print(f"Found {len(relevant_foods)} relevant anti-cancer foods")
+        print(f"Found {len(template)} relevant anti-cancer foods")
         print()
 
-        # Generate protocol foods
+        # Generate protocol foods, applying per-user overrides
         protocol_foods = []
 
-        for food_data in relevant_foods:
-            # Get research for this food
-            research = self.db.get_research_for_food(
-                food_data['name'],
-                user['cancer_type']
-            )
+        for food_data, entry, research in template:
+            if self._excluded_for_user(food_data, user):
+                print(f"Skipping {food_data['name']} (allergy)")
+                continue
 
-            # Calculate recommended dose
-            food_protocol = self._calculate_food_dose(
-                food_data,
-                weight_lbs,
-                research
-            )
+            if entry is None:
+                # Dose scales with weight, so it is computed per user
+                entry = self._calculate_food_dose(
+                    food_data,
+                    weight_lbs,
+                    research
+                )
 
-            if food_protocol:
-                protocol_foods.append(food_protocol)
+            if entry:
+                protocol_foods.append(dict(entry))
 
         # Check keto compatibility
         print("Checking keto compatibility...")
@@ -136,15 +147,244 @@ class ProtocolGenerator:
 
         return protocol
 
+    def update_protocol_for_weight(self, protocol: Dict, weight_lbs: float) -> Dict:
+        """
+        Incrementally update a saved protocol for a new body weight
+
+        Only foods whose dose depends on weight are recomputed; totals and
+        the keto score are updated by difference.
+
+        Args:
+            protocol: Existing protocol (as saved)
+            weight_lbs: New weight in pounds
+
+        Returns:
+            Updated protocol (not saved)
+        """
+        changes = {}
+        foods_by_name = {f['name']: f for f in self._get_all_foods()}
+        user = self.db.get_user(user_id=protocol['user_id'])
+
+        for food in protocol['foods']:
+            food_data = foods_by_name.get(food['name'])
+            if food_data and self._dose_depends_on_weight(food_data):
+                research = self._get_research(food_data['name'], user['cancer_type'])
+                changes[food['name']] = self._calculate_food_dose(food_data, weight_lbs, research)
+
+        return self._apply_food_changes(protocol, changes, weight_lbs)
+
+    def update_protocol_for_food(self, protocol: Dict, food_name: str) -> Dict:
+        """
+        Incrementally update a saved protocol after one food was added or changed
+
+        Args:
+            protocol: Existing protocol (as saved)
+            food_name: Name of the food that changed
+
+        Returns:
+            Updated protocol (not saved)
+        """
+        user = self.db.get_user(user_id=protocol['user_id'])
+        food_data = self.db.get_food_by_name(food_name)
+
+        new_entry = None
+        if (food_data and self._is_relevant(food_data, user['cancer_type'])
+                and not self._excluded_for_user(food_data, user)):
+            research = self._get_research(food_name, user['cancer_type'])
+            new_entry = self._calculate_food_dose(food_data, protocol['weight_lbs'], research)
+
+        return self._apply_food_changes(protocol, {food_name: new_entry}, protocol['weight_lbs'])
+
+    def _apply_food_changes(self, protocol: Dict, changes: Dict[str, Optional[Dict]],
+                            weight_lbs: float) -> Dict:
+        """
+        Swap changed food entries into a protocol and update totals by difference
+
+        Args:
+            protocol: Existing protocol
+            changes: Food name -> new entry (None removes the food)
+            weight_lbs: Weight the updated protocol is for
+
+        Returns:
+            Updated protocol
+        """
+        foods = [dict(f) for f in protocol['foods']]
+        index = {f['name']: i for i, f in enumerate(foods)}
+
+        net_carbs = protocol['total_net_carbs']
+        protein = protocol['total_protein']
+        fat = protocol['total_fat']
+
+        old_weight_kg = protocol['weight_lbs'] * 0.453592
+        was_keto = self.keto_checker.check_totals(net_carbs, protein, fat, old_weight_kg).is_keto_friendly
+
+        removed = set()
+        for name, new_entry in changes.items():
+            if name in index:
+                old_entry = foods[index[name]]
+                net_carbs -= old_entry.get('net_carbs', 0)
+                protein -= old_entry.get('protein', 0)
+                fat -= old_entry.get('fat', 0)
+
+            if new_entry is None:
+                removed.add(name)
+                continue
+
+            net_carbs += new_entry.get('net_carbs', 0)
+            protein += new_entry.get('protein', 0)
+            fat += new_entry.get('fat', 0)
+
+            if name in index:
+                foods[index[name]] = new_entry
+            else:
+                foods.append(new_entry)
+
+        if removed:
+            foods = [f for f in foods if f['name'] not in removed]
+
+        weight_kg = weight_lbs * 0.453592
+        keto_result = self.keto_checker.check_totals(net_carbs, protein, fat, weight_kg)
+
+        # Only re-run the keto adjustment when the change pushed us over a limit
+        if was_keto and not keto_result.is_keto_friendly:
+            foods = self._adjust_for_keto(foods, keto_result, weight_kg)
+            net_carbs = sum(f.get('net_carbs', 0) for f in foods)
+            protein = sum(f.get('protein', 0) for f in foods)
+            fat = sum(f.get('fat', 0) for f in foods)
+            keto_result = self.keto_checker.check_totals(net_carbs, protein, fat, weight_kg)
+
+        calories = (net_carbs * 4) + (protein * 4) + (fat * 9)
+
+        return {
+            **protocol,
+            "weight_lbs": weight_lbs,
+            "foods": foods,
+            "total_net_carbs": round(net_carbs, 1),
+            "total_protein": round(protein, 1),
+            "total_fat": round(fat, 1),
+            "total_calories": round(calories, 0),
+            "keto_compatible": keto_result.is_keto_friendly,
+            "keto_score": keto_result.compatibility_score,
+        }
+
+    def _get_template(self, cancer_type: str, weight_lbs: float) -> List:
+        """
+        Get the shared food list for a cancer type and weight band
+
+        Each item is (food_data, entry, research). Entries for foods whose
+        dose depends on weight are None and must be computed per user.
+        """
+        def build():
+            template = []
+            for food_data in self._get_all_foods():
+                if not self._is_relevant(food_data, cancer_type):
+                    continue
+
+                # Get research for this food
+                research = self._get_research(food_data['name'], cancer_type)
+
+                entry = None
+                if not self._dose_depends_on_weight(food_data):
+                    entry = self._calculate_food_dose(food_data, weight_lbs, research)
+                template.append((food_data, entry, research))
+            return template
+
+        if self.templates is None:
+            return build()
+
+        key = self.templates.key(
+            cancer_type,
+            weight_lbs,
+            self.catalog.version if self.catalog is not None else 0,
+            (self.keto_checker.max_net_carbs,
+             self.keto_checker.target_protein_g_per_kg,
+             self.keto_checker.target_fat_percentage),
+            evidence_revision=self.db.get_food_evidence_revision(),
+        )
+        return self.templates.get_or_build(key, build)
+
+    def _get_research(self, food_name: str, cancer_type: str) -> List[Dict]:
+        """
+        Evidence for a food: its most relevant studies, best first
+
+        Ranked by precomputed BM25 score and study type (research_ranking),
+        so this is one indexed query however large the library grows.
+        """
+        return self.db.get_top_research_for_food(
+            food_name,
+            ranking_cancer_type(cancer_type),
+            limit=RESEARCH_RANKING_CONFIG["evidence_limit"]
+        )
+
+    @staticmethod
+    def _excluded_for_user(food_data: Dict, user: Dict) -> bool:
+        """Whether a user's allergies rule out a food (matches name or common names)"""
+        allergies = [a.lower() for a in user.get('allergies') or [] if a]
+        if not allergies:
+            return False
+
+        names = [food_data['name']] + list(food_data.get('common_names') or [])
+        names = [n.lower() for n in names]
+        return any(allergy in name or name in allergy for allergy in allergies for name in names)
+
+    def _get_all_foods(self) -> List[Dict]:
+        """Get all foods, from the shared catalog cache when one is injected"""
+        if self.catalog is not None:
+            return self.catalog.get(self.db)
+        return self.db.get_all_foods()
+
+    @staticmethod
+    def _is_relevant(food_data: Dict, cancer_type: str) -> bool:
+        """Whether a food belongs in protocols for this cancer type"""
+        cancer_types = food_data.get('cancer_types') or []
+        return cancer_type in cancer_types or 'general' in cancer_types
+
+    def _dose_depends_on_weight(self, food_data: Dict) -> bool:
+        """
+        Whether a food's dose scales with body weight
+
+        Doses derived from research are per kg; default doses are fixed
+        daily amounts, so for those a weight change only moves the keto
+        protein target.
+        """
+        return self._get_dose_evidence(food_data) is not None
+
+    def _get_dose_evidence(self, food_data: Dict) -> Optional[Dict]:
+        """
+        The food's evidence summary, if enough studies give it a dose
+
+        Returns:
+            food_evidence_summary row with a central HED, plus the compound's
+            mg per 100g of the food, or None to use the default dose
+        """
+        summary = self.db.get_food_evidence_summary(food_data['name'])
+        if (not summary or summary['conservative_hed_median_mg_kg'] is None
+                or summary['dose_studies'] < FOOD_EVIDENCE_CONFIG["min_dose_studies"]):
+            return None
+
+        compounds = food_data.get('active_compounds') or []
+        dosed = summary['dose_compound']
+        compound = next((c for c in compounds if dosed and c['name'].lower() == dosed), None)
+        if compound is None or not compound.get('amount_per_100g'):
+            return None
+        return {**summary, "compound_per_100g": compound['amount_per_100g']}
+
     def _calculate_food_dose(self, food_data: Dict, weight_lbs: float,
                             research: List[Dict]) -> Optional[Dict]:
         """Calculate dose for a single food"""
 
         food_name = food_data['name']
 
-        # Use a default therapeutic dose based on food type
-        # In a real scenario, we'd calculate from research studies
-        dose_grams = self._get_default_dose(food_name)
+        # Median conservative human-equivalent dose of the food's most often
+        # dosed compound, else a default therapeutic dose based on food type
+        evidence = self._get_dose_evidence(food_data)
+        if evidence:
+            dose_mg = evidence['conservative_hed_median_mg_kg'] * weight_lbs * 0.453592
+            dose_grams = DoseCalculator.food_dose_to_daily_amount(
+                dose_mg, evidence['compound_per_100g'], food_name
+            )["grams_needed"]
+        else:
+            dose_grams = self._get_default_dose(food_name)
 
         # Check safety
         max_safe = food_data.get('max_daily_amount_grams', 1000)
@@ -188,8 +428,9 @@ class ProtocolGenerator:
         """
         Get default therapeutic dose for a food
 
-        These are conservative doses based on typical research
-        and traditional use. Will be refined with actual research data.
+        These are conservative doses based on typical research and
+        traditional use, for foods without enough dosed studies in the
+        library (see _get_dose_evidence).
         """
         defaults = {
             "Ginger": 4.0,  # 4g raw ginger per day
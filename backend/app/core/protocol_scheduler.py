@@ -0,0 +1,179 @@
+"""
+Background protocol pre-generation for No Colon, Still Rollin'
+Builds tomorrow's protocol ahead of time so the morning load is a single read
+"""
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional, Tuple
+import logging
+import queue
+import threading
+
+from config import PREGENERATION_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Queued by stop() so the thread wakes from its poll wait at once
+_WAKE = object()
+
+
+class ProtocolPregenerator:
+    """
+    In-process scheduler that keeps protocols generated ahead of time
+
+    - On start, fills in today's and tomorrow's protocol for active users
+    - Once a night, during the off-peak window, generates tomorrow's protocol
+      and deletes protocol bodies no protocol references
+    - When a weight is recorded after tomorrow's protocol was last generated
+      (through the API, which wakes the thread, or from another process,
+      picked up at the next poll), regenerates it for that user
+    - Generates protocols the API asked for (request_generation)
+    """
+
+    def __init__(self, service, config: Dict = None):
+        """
+        Args:
+            service: ProtocolService used to generate and save protocols
+            config: Scheduler settings (default: PREGENERATION_CONFIG)
+        """
+        self.service = service
+        self.config = config or PREGENERATION_CONFIG
+        self._requests: "queue.Queue[Tuple[int, date]]" = queue.Queue()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_nightly_run: Optional[date] = None
+        self._started_at = datetime.now()
+        # (user_id, protocol date) -> when that protocol was last generated here
+        self.last_run: Dict[Tuple[int, date], datetime] = {}
+
+    def start(self):
+        """Start the background thread (after the previous one has exited)"""
+        if self._thread and self._thread.is_alive():
+            if not self._stop.is_set():
+                return
+            # Stopped but still finishing a protocol: never run two threads
+            self._thread.join()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            name="protocol-pregenerator",
+            daemon=True
+        )
+        self._thread.start()
+        logger.info("Protocol pre-generation started")
+
+    def stop(self, timeout: Optional[float] = 10.0) -> bool:
+        """
+        Stop the background thread and wait for it to finish
+
+        Args:
+            timeout: Seconds to wait for a protocol being generated (None waits until done)
+
+        Returns:
+            Whether the thread has exited
+        """
+        self._stop.set()
+        if self._thread:
+            self._requests.put(_WAKE)
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logger.warning("Protocol pre-generation still finishing after stop")
+                return False
+            self._thread = None
+        logger.info("Protocol pre-generation stopped")
+        return True
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def notify_weight_recorded(self, user_id: int):
+        """Queue a regeneration of tomorrow's protocol after a new weigh-in"""
+        self.request_generation(user_id, date.today() + timedelta(days=1))
+
+    def request_generation(self, user_id: int, target_date: date):
+        """Queue one protocol to be generated and saved in the background"""
+        if self._thread is not None:
+            self._requests.put((user_id, target_date))
+
+    def _run(self):
+        """Thread body: catch up once, then poll for work until stopped"""
+        today = date.today()
+        self._generate_for_active_users([today, today + timedelta(days=1)], only_missing=True)
+
+        while not self._stop.is_set():
+            try:
+                request = self._requests.get(timeout=self.config["poll_seconds"])
+            except queue.Empty:
+                request = None
+
+            if self._stop.is_set():
+                break
+
+            if request is not None and request is not _WAKE:
+                self._generate(*request)
+
+            self._regenerate_after_new_weights()
+
+            if self._in_offpeak_window() and self._last_nightly_run != date.today():
+                self._last_nightly_run = date.today()
+                self._generate_for_active_users([date.today() + timedelta(days=1)])
+                self._prune_protocol_bodies()
+
+    def _in_offpeak_window(self) -> bool:
+        """Whether the current local hour is inside the off-peak window"""
+        hour = datetime.now().hour
+        return self.config["offpeak_start_hour"] <= hour < self.config["offpeak_end_hour"]
+
+    def _prune_protocol_bodies(self):
+        """Nightly sweep for protocol bodies nothing references any more"""
+        try:
+            with self.service.pool.connection() as db:
+                pruned = db.prune_protocol_bodies()
+            if pruned:
+                logger.info(f"Pruned {pruned} unreferenced protocol bodies")
+        except Exception as e:
+            logger.warning(f"Pruning protocol bodies failed: {e}")
+
+    def _generate_for_active_users(self, dates, only_missing: bool = False):
+        """Generate protocols for every recently active user"""
+        since = (date.today() - timedelta(days=self.config["active_days"])).isoformat()
+        with self.service.pool.connection() as db:
+            user_ids = db.get_active_user_ids(since)
+
+        for user_id in user_ids:
+            for target_date in dates:
+                if self._stop.is_set():
+                    return
+                if only_missing:
+                    with self.service.pool.connection() as db:
+                        if db.get_protocol_for_date(user_id, target_date.isoformat()):
+                            continue
+                self._generate(user_id, target_date)
+
+    def _regenerate_after_new_weights(self):
+        """
+        Regenerate tomorrow's protocol for users who weighed in after it was last generated
+
+        Protocols not generated since this scheduler started count as
+        generated at start-up.
+        """
+        tomorrow = date.today() + timedelta(days=1)
+        since = (date.today() - timedelta(days=self.config["active_days"])).isoformat()
+        with self.service.pool.connection() as db:
+            weigh_ins = db.get_latest_weigh_ins(since)
+
+        for user_id, recorded_at in weigh_ins.items():
+            if self._stop.is_set():
+                return
+            last_run = self.last_run.get((user_id, tomorrow), self._started_at)
+            if datetime.fromisoformat(recorded_at) > last_run:
+                self._generate(user_id, tomorrow)
+
+    def _generate(self, user_id: int, target_date: date):
+        """Generate and save one protocol, logging rather than raising on failure"""
+        try:
+            started = datetime.now()
+            self.service.generate_for_user(user_id, target_date=target_date.isoformat())
+            self.last_run[(user_id, target_date)] = started
+        except Exception as e:
+            logger.warning(f"Pre-generation failed for user {user_id} on {target_date}: {e}")
@@ -0,0 +1,217 @@
+"""
+Process-scoped protocol generation service for No Colon, Still Rollin'
+Keeps a pooled database and warm calculators alive across API requests
+"""
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+import logging
+import threading
+
+from config import DATABASE_POOL_SIZE
+from database import Database, DatabasePool
+from dosing_calculator import DosingCalculator
+from keto_checker import KetoChecker
+from protocol_generator import ProtocolGenerator
+from protocol_scheduler import ProtocolPregenerator
+from protocol_templates import ProtocolTemplateCache
+from protocol_simulator import ProtocolSimulator
+
+logger = logging.getLogger(__name__)
+
+
+class FoodCatalog:
+    """Thread-safe cache of the parsed foods table"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._foods: Optional[List[Dict]] = None
+        self.version = 0
+
+    def get(self, db: Database) -> List[Dict]:
+        """Return all foods, loading them from the database on first use"""
+        with self._lock:
+            if self._foods is None:
+                self._foods = db.get_all_foods()
+            return self._foods
+
+    def invalidate(self):
+        """Drop the cached foods so the next read reloads them"""
+        with self._lock:
+            self._foods = None
+            self.version += 1
+
+
+class ProtocolService:
+    """
+    Shared protocol generator for the API
+
+    Calculators and the food catalog are built once and shared; every call
+    borrows its own pooled connection, so calls from different worker
+    threads never share a sqlite connection.
+    """
+
+    def __init__(self, pool_size: int = DATABASE_POOL_SIZE, db_path: str = None):
+        self.pool = DatabasePool(pool_size, db_path)
+        self.dosing_calc = DosingCalculator()
+        self.keto_checker = KetoChecker()
+        self.catalog = FoodCatalog()
+        self.templates = ProtocolTemplateCache()
+        self.pregenerator = ProtocolPregenerator(self)
+
+    @contextmanager
+    def generator(self):
+        """Yield a ProtocolGenerator bound to a borrowed pooled connection"""
+        with self.pool.connection() as db:
+            yield ProtocolGenerator(
+                db=db,
+                dosing_calc=self.dosing_calc,
+                keto_checker=self.keto_checker,
+                catalog=self.catalog,
+                templates=self.templates,
+            )
+
+    def generate_for_user(self, user_id: int, weight_lbs: Optional[float] = None,
+                          target_date: Optional[str] = None) -> Dict:
+        """
+        Generate and save a daily protocol for a user
+
+        Args:
+            user_id: User ID
+            weight_lbs: Current weight (if None, uses stored weight)
+            target_date: Date for protocol (default: today)
+
+        Returns:
+            Complete daily protocol
+
+        Raises:
+            LookupError: If the user does not exist
+        """
+        with self.generator() as generator:
+            user = generator.db.get_user(user_id=user_id)
+            if not user:
+                raise LookupError(f"User {user_id} not found")
+
+            return generator.generate_daily_protocol(
+                user_name=user['name'],
+                weight_lbs=weight_lbs or user['current_weight_lbs'],
+                target_date=target_date
+            )
+
+    def apply_weight_change(self, user_id: int, weight_lbs: float,
+                            target_date: Optional[str] = None) -> Optional[Dict]:
+        """
+        Incrementally update a saved protocol after a new weigh-in
+
+        Args:
+            user_id: User ID
+            weight_lbs: New weight in pounds
+            target_date: Protocol date to update (default: today)
+
+        Returns:
+            Updated protocol, or None if there is no protocol to update
+        """
+        target_date = target_date or date.today().isoformat()
+        with self.generator() as generator:
+            protocol = generator.db.get_protocol_for_date(user_id, target_date)
+            if not protocol:
+                return None
+
+            updated = generator.update_protocol_for_weight(protocol, weight_lbs)
+            generator.db.save_daily_protocol(updated)
+            return updated
+
+    def apply_food_change(self, food_name: str, target_dates: Optional[List[str]] = None) -> int:
+        """
+        Incrementally update saved protocols after one food was added or edited
+
+        Args:
+            food_name: Name of the food that changed
+            target_dates: Protocol dates to update (default: today and the
+                pre-generated tomorrow)
+
+        Returns:
+            Number of protocols updated
+        """
+        self.catalog.invalidate()
+
+        if target_dates is None:
+            today = date.today()
+            target_dates = [today.isoformat(), (today + timedelta(days=1)).isoformat()]
+
+        updated = 0
+        with self.generator() as generator:
+            for target_date in target_dates:
+                for user_id in generator.db.get_protocol_user_ids(target_date):
+                    protocol = generator.db.get_protocol_for_date(user_id, target_date)
+                    generator.db.save_daily_protocol(generator.update_protocol_for_food(protocol, food_name))
+                    updated += 1
+        return updated
+
+    def simulate_weights(self, user_id: int, weights_lbs: List[float]) -> Dict:
+        """
+        Evaluate a user's protocol at each weight without saving anything
+
+        Args:
+            user_id: User ID
+            weights_lbs: Weights to evaluate, in pounds
+
+        Returns:
+            Columnar simulation results
+        """
+        with self.generator() as generator:
+            return ProtocolSimulator(generator).simulate(user_id, weights_lbs)
+
+    def metrics(self) -> Dict:
+        """Cache metrics for monitoring"""
+        return {
+            "template_cache": self.templates.stats(),
+        }
+
+    def close(self):
+        """Stop background work and release pooled connections"""
+        # The thread checks for stop between protocols; wait out the current
+        # one rather than close the pool underneath it
+        self.pregenerator.stop(timeout=None)
+        self.pool.close()
+
+
+# Process-wide instance, managed by the FastAPI startup/shutdown hooks
+_service: Optional[ProtocolService] = None
+_service_lock = threading.Lock()
+
+
+def start_protocol_service(pool_size: int = DATABASE_POOL_SIZE,
+                           pregenerate: bool = False) -> ProtocolService:
+    """
+    Create the shared service if it is not already running
+
+    Args:
+        pool_size: Number of pooled database connections
+        pregenerate: Also start background pre-generation of protocols
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ProtocolService(pool_size)
+            logger.info("Protocol service started")
+        if pregenerate:
+            _service.pregenerator.start()
+        return _service
+
+
+def get_protocol_service() -> ProtocolService:
+    """Return the shared service, starting it on first use"""
+    if _service is None:
+        return start_protocol_service()
+    return _service
+
+
+def stop_protocol_service():
+    """Close the shared service and its connections"""
+    global _service
+    with _service_lock:
+        if _service is not None:
+            _service.close()
+            _service = None
+            logger.info("Protocol service stopped")
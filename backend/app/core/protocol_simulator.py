@@ -0,0 +1,217 @@
+"""
+Weight-sweep "what-if" simulation for No Colon, Still Rollin'
+Evaluates a user's protocol across many body weights in one vectorized pass
+"""
+from typing import Dict, List
+
+import numpy as np
+
+from protocol_generator import ProtocolGenerator
+
+LBS_TO_KG = 0.453592
+
+
+def _round(values: np.ndarray, digits: int) -> np.ndarray:
+    """
+    round() on every element, as the generator rounds each value
+
+    np.round scales by 10**digits first, which can carry a value across a
+    tie: np.round(0.05, 1) is 0.0 where round(0.05, 1) is 0.1.
+    """
+    values = np.asarray(values, dtype=float)
+    return np.array([round(value, digits) for value in values.ravel().tolist()]).reshape(values.shape)
+
+
+def _sum_foods(values: np.ndarray) -> np.ndarray:
+    """Per-row totals added food by food, in the generator's order (np.sum adds pairwise)"""
+    total = np.zeros(values.shape[0])
+    for j in range(values.shape[1]):
+        total += values[:, j]
+    return total
+
+
+class ProtocolSimulator:
+    """
+    Simulate daily protocols over a range of weights without saving anything
+
+    Food doses, the keto adjustment and keto scoring are computed as
+    (weights x foods) arrays, mirroring ProtocolGenerator step by step.
+    """
+
+    def __init__(self, generator: ProtocolGenerator):
+        self.generator = generator
+        self.keto_checker = generator.keto_checker
+
+    def simulate(self, user_id: int, weights_lbs: List[float]) -> Dict:
+        """
+        Run the protocol pipeline for every weight
+
+        Args:
+            user_id: User ID
+            weights_lbs: Weights to evaluate, in pounds
+
+        Returns:
+            Columnar results: one list per field, indexed like weights_lbs
+
+        Raises:
+            LookupError: If the user does not exist
+        """
+        db = self.generator.db
+        user = db.get_user(user_id=user_id)
+        if not user:
+            raise LookupError(f"User {user_id} not found")
+
+        weights = np.asarray(weights_lbs, dtype=float)
+        weights_kg = weights * LBS_TO_KG
+
+        foods = [
+            f for f in self.generator._get_all_foods()
+            if self.generator._is_relevant(f, user['cancer_type'])
+            and not self.generator._excluded_for_user(f, user)
+        ]
+
+        # Doses: weights x foods, one column per food
+        amounts = np.empty((len(weights), len(foods)))
+        for j, food_data in enumerate(foods):
+            amounts[:, j] = self._dose_column(food_data, weights)
+
+        per_100g = {
+            key: np.array([f[key] for f in foods], dtype=float)
+            for key in ('net_carbs_per_100g', 'protein_per_100g', 'fat_per_100g')
+        }
+
+        net_carbs, protein, fat = self._macros(amounts, per_100g)
+
+        # Keto check on the unadjusted protocol, then the same adjustment the generator applies
+        is_keto, _ = self.keto_checker.score_totals_array(
+            *self._exact_totals(amounts, per_100g), weights_kg
+        )
+        scheduled_amounts = amounts
+        amounts, net_carbs, protein, fat = self._adjust_for_keto(
+            amounts, net_carbs, protein, fat, per_100g, ~is_keto
+        )
+        is_keto, score = self.keto_checker.score_totals_array(
+            *self._exact_totals(amounts, per_100g), weights_kg
+        )
+
+        total_net_carbs = _sum_foods(net_carbs)
+        total_protein = _sum_foods(protein)
+        total_fat = _sum_foods(fat)
+        total_calories = (total_net_carbs * 4) + (total_protein * 4) + (total_fat * 9)
+
+        return {
+            "user_id": user['id'],
+            "weights_lbs": weights.tolist(),
+            "foods": [
+                self._food_columns(food_data['name'], scheduled_amounts[:, j], amounts[:, j])
+                for j, food_data in enumerate(foods)
+            ],
+            "total_net_carbs": _round(total_net_carbs, 1).tolist(),
+            "total_protein": _round(total_protein, 1).tolist(),
+            "total_fat": _round(total_fat, 1).tolist(),
+            "total_calories": _round(total_calories, 0).tolist(),
+            "keto_compatible": is_keto.tolist(),
+            "keto_score": score.tolist(),
+        }
+
+    def _dose_column(self, food_data: Dict, weights: np.ndarray) -> np.ndarray:
+        """
+        Daily grams of one food at every weight, as ProtocolGenerator._calculate_food_dose
+
+        The food's evidence summary is read once. A research-derived dose
+        is the conservative median HED (mg/kg) times body weight, converted
+        to grams of food; otherwise the default dose applies at every weight.
+        """
+        evidence = self.generator._get_dose_evidence(food_data)
+        if evidence:
+            # Same operation order as the generator, so results match exactly
+            dose_mg = evidence['conservative_hed_median_mg_kg'] * weights * LBS_TO_KG
+            grams = (dose_mg / evidence['compound_per_100g']) * 100
+            grams = _round(grams, 1)
+        else:
+            grams = np.full(len(weights), self.generator._get_default_dose(food_data['name']), dtype=float)
+
+        # Check safety
+        return np.minimum(grams, food_data.get('max_daily_amount_grams', 1000))
+
+    @staticmethod
+    def _macros(amounts: np.ndarray, per_100g: Dict[str, np.ndarray]):
+        """Rounded per-food macros, as stored on protocol food entries"""
+        multiplier = amounts / 100
+        return (
+            _round(per_100g['net_carbs_per_100g'] * multiplier, 1),
+            _round(per_100g['protein_per_100g'] * multiplier, 1),
+            _round(per_100g['fat_per_100g'] * multiplier, 1),
+        )
+
+    @staticmethod
+    def _exact_totals(amounts: np.ndarray, per_100g: Dict[str, np.ndarray]):
+        """Unrounded daily totals, as KetoChecker.check_daily_protocol computes them"""
+        multiplier = amounts / 100
+        return (
+            _sum_foods(per_100g['net_carbs_per_100g'] * multiplier),
+            _sum_foods(per_100g['protein_per_100g'] * multiplier),
+            _sum_foods(per_100g['fat_per_100g'] * multiplier),
+        )
+
+    def _adjust_for_keto(self, amounts, net_carbs, protein, fat, per_100g, needs_adjustment):
+        """
+        Vectorized ProtocolGenerator._adjust_for_keto
+
+        Walks foods from highest to lowest carbs, cutting 25% from any food
+        with more than 2g net carbs until each row's overage is covered.
+        """
+        max_carbs = self.keto_checker.max_net_carbs
+        exact_carbs = self._exact_totals(amounts, per_100g)[0]
+        carb_reduction_needed = np.where(
+            needs_adjustment & (_round(exact_carbs, 1) > max_carbs),
+            _round(exact_carbs, 1) - max_carbs,
+            0.0
+        )
+
+        amounts = amounts.copy()
+        rows = np.arange(amounts.shape[0])
+        order = np.argsort(-net_carbs, axis=1, kind='stable')
+
+        for k in range(amounts.shape[1]):
+            cols = order[:, k]
+            current_carbs = net_carbs[rows, cols]
+            reduce = (carb_reduction_needed > 0) & (current_carbs > 2)
+            if not reduce.any():
+                continue
+
+            r, c = rows[reduce], cols[reduce]
+            new_amount = amounts[r, c] * 0.75
+            multiplier = new_amount / 100
+            amounts[r, c] = _round(new_amount, 1)
+            net_carbs[r, c] = _round(per_100g['net_carbs_per_100g'][c] * multiplier, 1)
+            protein[r, c] = _round(per_100g['protein_per_100g'][c] * multiplier, 1)
+            fat[r, c] = _round(per_100g['fat_per_100g'][c] * multiplier, 1)
+
+            carb_reduction_needed[reduce] -= current_carbs[reduce] * 0.25
+
+        return amounts, net_carbs, protein, fat
+
+    def _food_columns(self, food_name: str, scheduled_amounts: np.ndarray,
+                      amounts: np.ndarray) -> Dict:
+        """
+        Dosing schedule columns for one food
+
+        Like the generator, the schedule is picked from the pre-adjustment
+        dose and keto cuts only shrink the serving size. Schedules are
+        computed once per distinct dose.
+        """
+        schedules = {
+            amount: self.generator.dosing_calc.recommend_dosing_schedule(amount, food_name)
+            for amount in np.unique(scheduled_amounts).tolist()
+        }
+        column = [schedules[amount] for amount in scheduled_amounts.tolist()]
+        servings = np.array([s["servings_per_day"] for s in column])
+
+        return {
+            "name": food_name,
+            "amount_grams": amounts.tolist(),
+            "servings_per_day": servings.tolist(),
+            "grams_per_serving": _round(amounts / servings, 1).tolist(),
+            "timing": [s["timing"] for s in column],
+        }
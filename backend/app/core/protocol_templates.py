@@ -0,0 +1,78 @@
+"""
+Shared protocol templates for No Colon, Still Rollin'
+Users with the same cancer type and weight band share one computed food list
+"""
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+import threading
+import time
+
+from config import PROTOCOL_TEMPLATE_CONFIG
+
+# One template item: (food_data, precomputed entry or None if the dose
+# scales with weight, research used for the food)
+TemplateItem = Tuple[Dict, Optional[Dict], List[Dict]]
+
+
+class ProtocolTemplateCache:
+    """
+    Thread-safe LRU cache of protocol templates
+
+    Keys are (cancer_type, weight band, catalog version, food evidence
+    revision, keto config). The evidence revision changes whenever studies
+    are added or removed, in any process; entries also expire after a TTL.
+    """
+
+    def __init__(self, config: Dict = None):
+        config = config or PROTOCOL_TEMPLATE_CONFIG
+        self.weight_band_lbs = config["weight_band_lbs"]
+        self.max_entries = config["max_entries"]
+        self.ttl_seconds = config["ttl_seconds"]
+
+        self._lock = threading.Lock()
+        self._templates: "OrderedDict[Hashable, Tuple[float, List[TemplateItem]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, cancer_type: str, weight_lbs: float, catalog_version: int,
+            keto_config: Tuple, evidence_revision: int = 0) -> Tuple:
+        """Build the cache key, quantizing weight into a band"""
+        band = int(weight_lbs // self.weight_band_lbs)
+        return (cancer_type, band, catalog_version, evidence_revision, keto_config)
+
+    def get_or_build(self, key: Tuple, build: Callable[[], List[TemplateItem]]) -> List[TemplateItem]:
+        """Return the template for key, building and caching it on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._templates.get(key)
+            if cached and now - cached[0] < self.ttl_seconds:
+                self._templates.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        template = build()
+
+        with self._lock:
+            self._templates[key] = (now, template)
+            self._templates.move_to_end(key)
+            while len(self._templates) > self.max_entries:
+                self._templates.popitem(last=False)
+
+        return template
+
+    def clear(self):
+        """Drop every template (e.g. after foods or research change)"""
+        with self._lock:
+            self._templates.clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "size": len(self._templates),
+            }
@@ -0,0 +1,130 @@
+"""
+Concurrent PubMed client for No Colon, Still Rollin'
+Pipelines esearch and efetch across many search terms under the NCBI rate limit
+"""
+from typing import Dict, List, Optional, Union
+import asyncio
+import time
+
+import requests
+
+from config import NCBI_MAX_CONCURRENCY
+from pubmed_client import PubMedClient
+
+
+class AsyncPubMedClient:
+    """
+    asyncio front end for PubMedClient
+
+    Fresh responses come from the shared E-utilities cache. Every other
+    request runs PubMedClient.request (shared token bucket, retries,
+    circuit breaker) in a worker thread, so the event loop never blocks.
+    A semaphore caps the number of requests in flight, so slow responses
+    overlap instead of leaving the rate budget unused.
+    """
+
+    def __init__(self, client: Optional[PubMedClient] = None,
+                 max_concurrency: int = NCBI_MAX_CONCURRENCY):
+        """
+        Args:
+            client: Sync client providing base URL, credentials, rate limiter
+                and parsing (default: PubMedClient())
+            max_concurrency: Maximum simultaneous HTTP requests
+        """
+        self.client = client or PubMedClient()
+        self.max_concurrency = max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def get_raw(self, endpoint: str, params: Dict, timeout: float = 30,
+                      binary: bool = False) -> Union[str, bytes]:
+        """Cached, rate-limited E-utilities GET (same semantics as PubMedClient.get_raw)"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        cache = self.client.cache
+        cached = cache.get(endpoint, params) if cache else None
+        if cached and cached.fresh:
+            return self.client._body(cached.body, binary)
+
+        async with self._semaphore:
+            try:
+                # Rate limiting, retries and the circuit breaker happen in the worker thread
+                body = await asyncio.to_thread(self.client.request, endpoint, params, timeout, binary)
+            except requests.RequestException:
+                if cached:
+                    return self.client._body(cache.serve_stale(cached), binary)
+                raise
+
+        if cache:
+            cache.put(endpoint, params, body)
+        return body
+
+    async def search_studies(self, query: str, max_results: int = 20) -> List[str]:
+        """Search PubMed and return list of PubMed IDs"""
+        params = self.client.search_params(query, max_results)
+
+        try:
+            return self.client._parse_search_json(await self.get_raw("esearch.fcgi", params, timeout=10))
+        except Exception as e:
+            print(f"Error searching PubMed: {e}")
+            return []
+
+    async def fetch_study_details(self, pubmed_ids: List[str]) -> List[Dict]:
+        """Fetch detailed information for given PubMed IDs"""
+        if not pubmed_ids:
+            return []
+
+        params = self.client.fetch_params(pubmed_ids)
+
+        try:
+            xml_text = await self.get_raw("efetch.fcgi", params, timeout=30)
+            return await asyncio.to_thread(self.client._parse_pubmed_xml, xml_text)
+        except Exception as e:
+            print(f"Error fetching PubMed details: {e}")
+            return []
+
+    async def search_and_fetch(self, query: str, max_results: int = 20) -> List[Dict]:
+        """Search, then fetch details for the hits"""
+        pubmed_ids = await self.search_studies(query, max_results)
+        if not pubmed_ids:
+            return []
+        return await self.fetch_study_details(pubmed_ids)
+
+    async def search_and_fetch_many(self, queries: List[str],
+                                    max_results: int = 20) -> Dict[str, List[Dict]]:
+        """
+        Search and fetch for every query concurrently
+
+        Each query's efetch starts as soon as its own esearch returns, so
+        searches for later terms overlap with fetches for earlier ones.
+
+        Args:
+            queries: Search queries
+            max_results: Maximum results per query
+
+        Returns:
+            Study details keyed by query
+        """
+        results = await asyncio.gather(
+            *(self.search_and_fetch(query, max_results) for query in queries)
+        )
+        return dict(zip(queries, results))
+
+
+def search_and_fetch_many(queries: List[str], max_results: int = 20,
+                          client: Optional[PubMedClient] = None) -> Dict[str, List[Dict]]:
+    """Blocking wrapper around AsyncPubMedClient.search_and_fetch_many for scripts"""
+    return asyncio.run(AsyncPubMedClient(client).search_and_fetch_many(queries, max_results))
+
+
+if __name__ == "__main__":
+    from config import CANCER_SEARCH_TERMS
+
+    start = time.perf_counter()
+    results = search_and_fetch_many(CANCER_SEARCH_TERMS, max_results=5)
+    elapsed = time.perf_counter() - start
+
+    for query, studies in results.items():
+        print(f"{len(studies):3d}  {query}")
+    print(f"\n{sum(len(s) for s in results.values())} studies from "
+          f"{len(results)} searches in {elapsed:.1f}s")
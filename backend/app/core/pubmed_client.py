@@ -1,19 +1,170 @@
 """
 PubMed API client for fetching cancer research studies
 """
+import json
+import random
+import time
 import requests
-from typing import List, Dict, Optional
-from config import NCBI_EMAIL, NCBI_API_KEY
+from typing import List, Dict, Optional, Union
+from circuit_breaker import CircuitBreaker, CircuitOpenError, get_ncbi_circuit_breaker
+from config import NCBI_EMAIL, NCBI_API_KEY, NCBI_EUTILS_BASE_URL, NCBI_HTTP_CONFIG
+from eutils_cache import EUtilsCache, get_eutils_cache
+from http_session import RETRY_STATUSES, backoff_delay, get_ncbi_session, retry_after_seconds
+from pubmed_xml import iter_pubmed_articles
+from rate_limiter import TokenBucket, get_ncbi_rate_limiter
+
+
+class PubMedUnavailableError(requests.RequestException):
+    """NCBI could not be reached: circuit open or retries exhausted"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
 
 
 class PubMedClient:
     """Client for interacting with NCBI PubMed API"""
 
-    BASE_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
+    BASE_URL = NCBI_EUTILS_BASE_URL
 
-    def __init__(self, email: str = NCBI_EMAIL, api_key: str = NCBI_API_KEY):
+    def __init__(self, email: str = NCBI_EMAIL, api_key: str = NCBI_API_KEY,
+                 base_url: Optional[str] = None,
+                 rate_limiter: Optional[TokenBucket] = None,
+                 cache: Optional[EUtilsCache] = None,
+                 session: Optional[requests.Session] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 max_retries: int = NCBI_HTTP_CONFIG["max_retries"]):
         self.email = email
         self.api_key = api_key
+        self.base_url = (base_url or self.BASE_URL).rstrip("/")
+        self.rate_limiter = rate_limiter or get_ncbi_rate_limiter()
+        self.cache = cache or get_eutils_cache()
+        self.session = session or get_ncbi_session()
+        self.circuit_breaker = circuit_breaker or get_ncbi_circuit_breaker()
+        self.max_retries = max_retries
+
+    def _params(self, params: Dict) -> Dict:
+        """Add the database, contact email and API key to request parameters"""
+        params = {'db': 'pubmed', **params, 'email': self.email}
+        if self.api_key:
+            params['api_key'] = self.api_key
+        return params
+
+    def _request(self, endpoint: str, params: Dict, timeout: float,
+                 binary: bool = False) -> Union[str, bytes]:
+        """Perform one E-utilities GET (no rate limiting or retries) and return the body"""
+        response = self.session.get(
+            f"{self.base_url}/{endpoint}", params=self._params(params), timeout=timeout
+        )
+        response.raise_for_status()
+        return response.content if binary else response.text
+
+    @staticmethod
+    def _body(body: Union[str, bytes], binary: bool) -> Union[str, bytes]:
+        """A response body as bytes or text, whichever form it was cached in"""
+        if binary:
+            return body.encode("utf-8") if isinstance(body, str) else body
+        return body.decode("utf-8") if isinstance(body, bytes) else body
+
+    def request(self, endpoint: str, params: Dict, timeout: float = 30,
+                binary: bool = False) -> Union[str, bytes]:
+        """
+        Rate-limited E-utilities GET with retries (no cache)
+
+        429s and 5xx responses, timeouts and connection errors are retried
+        with exponential backoff and jitter, waiting at least as long as any
+        Retry-After header asks. Failures other than 429 count against the
+        circuit breaker; while it is open, calls fail immediately.
+
+        Raises:
+            PubMedUnavailableError: Circuit open, or every attempt failed
+            requests.HTTPError: Non-retryable response (e.g. 400)
+        """
+        backoff_max = NCBI_HTTP_CONFIG["backoff_max_seconds"]
+        last_error = None
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.circuit_breaker.before_call()
+            except CircuitOpenError as e:
+                raise PubMedUnavailableError(str(e), retry_after=e.retry_after) from last_error
+
+            self.rate_limiter.acquire()
+            hinted = None
+            try:
+                body = self._request(endpoint, params, timeout, binary)
+            except requests.HTTPError as e:
+                status = e.response.status_code if e.response is not None else None
+                if status not in RETRY_STATUSES:
+                    # NCBI answered; the request itself is bad
+                    self.circuit_breaker.record_success()
+                    raise
+                if status == 429:
+                    # Rate limited, not unhealthy
+                    self.circuit_breaker.record_success()
+                else:
+                    self.circuit_breaker.record_failure()
+                hinted = retry_after_seconds(e.response)
+                last_error = e
+            except requests.RequestException as e:
+                self.circuit_breaker.record_failure()
+                last_error = e
+            else:
+                self.circuit_breaker.record_success()
+                return body
+
+            if attempt == self.max_retries:
+                break
+            if hinted is not None and hinted > backoff_max:
+                # Not worth holding a worker thread that long
+                raise PubMedUnavailableError(
+                    f"{endpoint} asked to retry in {hinted:.0f}s", retry_after=hinted
+                ) from last_error
+
+            if hinted is not None:
+                time.sleep(hinted + random.uniform(0, NCBI_HTTP_CONFIG["backoff_base_seconds"]))
+            else:
+                time.sleep(backoff_delay(attempt))
+
+        raise PubMedUnavailableError(
+            f"{endpoint} failed after {self.max_retries + 1} attempts: {last_error}",
+            retry_after=self.circuit_breaker.retry_after() or None,
+        ) from last_error
+
+    def get_raw(self, endpoint: str, params: Dict, timeout: float = 30,
+                binary: bool = False) -> Union[str, bytes]:
+        """
+        Cached, rate-limited E-utilities GET
+
+        Fresh cached responses are returned without a request. Otherwise
+        the request goes through request() (retries, circuit breaker); if
+        it still fails and an expired cached response exists, that is
+        returned instead.
+
+        Args:
+            endpoint: E-utility name (e.g. "esearch.fcgi")
+            params: Query parameters (db, email and api_key are added)
+            timeout: Request timeout in seconds
+            binary: Return the undecoded bytes (for XML parsers), skipping
+                a decoded copy of large efetch bodies
+
+        Returns:
+            Response body text, or bytes if `binary`
+        """
+        cached = self.cache.get(endpoint, params) if self.cache else None
+        if cached and cached.fresh:
+            return self._body(cached.body, binary)
+
+        try:
+            body = self.request(endpoint, params, timeout, binary)
+        except requests.RequestException:
+            if cached:
+                return self._body(self.cache.serve_stale(cached), binary)
+            raise
+
+        if self.cache:
+            self.cache.put(endpoint, params, body)
+        return body
 
     def search_studies(self, query: str, max_results: int = 20) -> List[str]:
         """
@@ -26,24 +177,12 @@ class PubMedClient:
         Returns:
             List of PubMed IDs
         """
-        params = {
-            'db': 'pubmed',
-            'term': query,
-            'retmax': max_results,
-            'retmode': 'json',
-            'sort': 'relevance',
-            'email': self.email,
-        }
-
-        if self.api_key:
-            params['api_key'] = self.api_key
+        params = self.search_params(query, max_results)
 
         try:
-            response = requests.get(f"{self.BASE_URL}/esearch.fcgi", params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-
-            return data.get('esearchresult', {}).get('idlist', [])
+            return self._parse_search_json(self.get_raw("esearch.fcgi", params, timeout=10))
+        except PubMedUnavailableError:
+            raise
         except Exception as e:
             print(f"Error searching PubMed: {e}")
             return []
@@ -61,23 +200,13 @@ class PubMedClient:
         if not pubmed_ids:
             return []
 
-        params = {
-            'db': 'pubmed',
-            'id': ','.join(pubmed_ids),
-            'retmode': 'xml',
-            'email': self.email,
-        }
-
-        if self.api_key:
-            params['api_key'] = self.api_key
+        params = self.fetch_params(pubmed_ids)
 
         try:
-            response = requests.get(f"{self.BASE_URL}/efetch.fcgi", params=params, timeout=30)
-            response.raise_for_status()
-
             # Parse XML response
-            studies = self._parse_pubmed_xml(response.text)
-            return studies
+            return self._parse_pubmed_xml(self.get_raw("efetch.fcgi", params, timeout=30))
+        except PubMedUnavailableError:
+            raise
         except Exception as e:
             print(f"Error fetching PubMed details: {e}")
             return []
@@ -98,6 +227,30 @@ class PubMedClient:
             return []
         return self.fetch_study_details(pubmed_ids)
 
+    @staticmethod
+    def search_params(query: str, max_results: int) -> Dict:
+        """esearch parameters for a relevance-sorted ID search"""
+        return {
+            'term': query,
+            'retmax': max_results,
+            'retmode': 'json',
+            'sort': 'relevance',
+        }
+
+    @staticmethod
+    def fetch_params(pubmed_ids: List[str]) -> Dict:
+        """efetch parameters for full article records"""
+        return {
+            'id': ','.join(pubmed_ids),
+            'retmode': 'xml',
+        }
+
+    @staticmethod
+    def _parse_search_json(json_text: str) -> List[str]:
+        """Extract the PubMed IDs from an esearch JSON response"""
+        data = json.loads(json_text)
+        return data.get('esearchresult', {}).get('idlist', [])
+
     def _parse_pubmed_xml(self, xml_text: str) -> List[Dict]:
         """
         Parse PubMed XML response into structured data
@@ -108,78 +261,11 @@ class PubMedClient:
         Returns:
             List of parsed study dictionaries
         """
-        import xml.etree.ElementTree as ET
-
         studies = []
         try:
-            root = ET.fromstring(xml_text)
-
-            for article in root.findall('.//PubmedArticle'):
-                study = {}
-
-                # PubMed ID
-                pmid = article.find('.//PMID')
-                if pmid is not None:
-                    study['pubmed_id'] = pmid.text
-
-                # Title
-                title = article.find('.//ArticleTitle')
-                if title is not None:
-                    study['title'] = title.text or ""
-
-                # Abstract
-                abstract_parts = article.findall('.//AbstractText')
-                if abstract_parts:
-                    abstract = ' '.join([a.text or "" for a in abstract_parts])
-                    study['abstract'] = abstract
-                else:
-                    study['abstract'] = ""
-
-                # Authors
-                authors = article.findall('.//Author')
-                author_list = []
-                for author in authors[:5]:  # First 5 authors
-                    last = author.find('.//LastName')
-                    first = author.find('.//ForeName')
-                    if last is not None:
-                        name = last.text or ""
-                        if first is not None:
-                            name = f"{first.text} {name}"
-                        author_list.append(name)
-                study['authors'] = ', '.join(author_list) if author_list else ""
-
-                # Journal
-                journal = article.find('.//Journal/Title')
-                if journal is not None:
-                    study['journal'] = journal.text or ""
-                else:
-                    study['journal'] = ""
-
-                # Year
-                year = article.find('.//PubDate/Year')
-                if year is not None:
-                    try:
-                        study['year'] = int(year.text)
-                    except:
-                        study['year'] = None
-                else:
-                    study['year'] = None
-
-                # DOI
-                doi_elem = article.find('.//ArticleId[@IdType="doi"]')
-                if doi_elem is not None:
-                    study['doi'] = doi_elem.text
-                else:
-                    study['doi'] = ""
-
-                # URL
-                if study.get('pubmed_id'):
-                    study['url'] = f"https://pubmed.ncbi.nlm.nih.gov/{study['pubmed_id']}/"
-                else:
-                    study['url'] = ""
-
+            # First 5 authors, "First Last"
+            for study in iter_pubmed_articles(xml_text, max_authors=5, author_style="full"):
                 studies.append(study)
-
         except Exception as e:
             print(f"Error parsing PubMed XML: {e}")
 
@@ -2,70 +2,162 @@
 PubMed research fetcher for No Colon, Still Rollin'
 Fetches anti-cancer food research from PubMed/NCBI
 """
+from typing import Iterator, List, Dict, Optional, Tuple
+from datetime import datetime, timedelta
+import json
 import time
-from typing import List, Dict, Optional
-from datetime import datetime
-import re
 
-try:
-    from Bio import Entrez
-except ImportError:
-    print("⚠️  Biopython not installed. Run: pip install biopython")
-    Entrez = None
-
-from config import NCBI_EMAIL, NCBI_API_KEY, CANCER_SEARCH_TERMS
+from config import (
+    NCBI_EMAIL, NCBI_API_KEY, CANCER_SEARCH_TERMS, EFETCH_BATCH_SIZE, ESEARCH_PAGE_SIZE,
+    RESEARCH_SYNC_YEARS
+)
 from database import Database
+from dose_extraction import dosing_fields
+from pubmed_client import PubMedClient
+from pubmed_xml import iter_pubmed_articles
+from research_indexing import on_studies_added
+from research_keywords import tag_study
 
+# Studies buffered before each bulk insert while streaming an efetch response
+INSERT_CHUNK_SIZE = 200
 
-class PubMedFetcher:
-    """Fetch and parse research from PubMed"""
+# esearch returns at most this many records per query, however it is paged
+ESEARCH_MAX_RECORDS = 10000
+
+
+def extract_dosing_info(abstract: str) -> Dict:
+    """
+    Extract dosing information from an abstract (see dose_extraction)
+
+    Args:
+        abstract: Article abstract text
+
+    Returns:
+        Dictionary with dose_amount, dose_unit, dose_frequency,
+        subject_weight_kg, subject_species and dose_mentions
+    """
+    return dosing_fields(abstract)
+
+
+def build_study_record(article: Dict, tags: Optional[Dict] = None) -> Dict:
+    """
+    Add study type, food/compound, dosing and cancer type to an article
+
+    Study type, food, compound and cancer type all come from a single
+    keyword scan of the title and abstract. Module-level so process-pool
+    workers can run it (see research_pipeline).
 
-    def __init__(self, email: str = NCBI_EMAIL, api_key: str = NCBI_API_KEY):
-        if not Entrez:
-            raise ImportError("Biopython required for PubMed access")
+    Args:
+        article: Article dictionary from fetch_articles
+        tags: tag_study() result if the caller already has it
 
-        Entrez.email = email
-        if api_key:
-            Entrez.api_key = api_key
+    Returns:
+        Row for research_studies
+    """
+    dosing_info = extract_dosing_info(article["abstract"])
+    tags = tags or tag_study(article["title"], article["abstract"])
 
+    return {
+        **article,
+        **dosing_info,
+        "study_type": tags["study_type"],
+        "food_studied": tags["food"] or "",
+        "compound_studied": tags["compound"] or "",
+        "cancer_type": tags["cancer_type"],
+    }
+
+
+class PubMedFetcher:
+    """Fetch and parse research from PubMed"""
+
+    def __init__(self, email: str = NCBI_EMAIL, api_key: str = NCBI_API_KEY,
+                 client: Optional[PubMedClient] = None):
+        # Requests go through PubMedClient (rate limit, cache, base URL)
+        self.client = client or PubMedClient(email, api_key)
         self.db = Database()
 
     def search_pubmed(self, query: str, max_results: int = 50,
-                      years: int = 10) -> List[str]:
+                      years: int = RESEARCH_SYNC_YEARS,
+                      since: Optional[str] = None,
+                      until: Optional[str] = None) -> List[str]:
         """
         Search PubMed and return list of PubMed IDs
 
         Args:
             query: Search query
             max_results: Maximum number of results
-            years: How many years back to search
+            years: How many years back to search (publication date)
+            since: Only articles added to PubMed on or after this date (YYYY/MM/DD)
+            until: Only articles added on or before this date (default: today)
 
         Returns:
             List of PubMed IDs
         """
-        print(f"🔍 Searching PubMed: {query}")
+        try:
+            return self._search(query, max_results, years, since, until)
+        except Exception as e:
+            print(f"  ❌ Error searching: {e}")
+            return []
+
+    def _search(self, query: str, max_results: int, years: int,
+                since: Optional[str] = None, until: Optional[str] = None) -> List[str]:
+        """search_pubmed without error handling, so callers can tell failure from no results"""
+        print(f"🔍 Searching PubMed: {query}" + (f" (added since {since})" if since else ""))
 
+        pmids, _ = self._search_page(query, max_results, years, since, until)
+        print(f"  Found {len(pmids)} articles")
+        return pmids
+
+    def _search_page(self, query: str, max_results: int, years: int,
+                     since: Optional[str] = None, until: Optional[str] = None,
+                     retstart: int = 0) -> Tuple[List[str], int]:
+        """One esearch request; returns (PMIDs, total matches)"""
         # Add date filter for recent research
         date_filter = f" AND {datetime.now().year - years}[PDAT]:{datetime.now().year}[PDAT]"
-        full_query = query + date_filter
+        params = self.client.search_params(query + date_filter, max_results)
+        if retstart:
+            params['retstart'] = retstart
+
+        # Entrez date window for incremental syncs
+        if since:
+            params.update({
+                'datetype': 'edat',
+                'mindate': since,
+                'maxdate': until or datetime.now().strftime("%Y/%m/%d"),
+            })
+
+        result = json.loads(
+            self.client.get_raw("esearch.fcgi", params, timeout=10)
+        ).get('esearchresult', {})
+        pmids = result.get('idlist', [])
+        return pmids, int(result.get('count', len(pmids)))
+
+    def _search_since(self, query: str, years: int, since: str, until: str) -> List[str]:
+        """
+        Every PMID added to PubMed between `since` and `until` (inclusive)
 
-        try:
-            handle = Entrez.esearch(
-                db="pubmed",
-                term=full_query,
-                retmax=max_results,
-                sort="relevance"
+        Incremental syncs advance the watermark past this window, so nothing
+        in it may be left out: esearch is paged until its count is used up,
+        and windows over ESEARCH_MAX_RECORDS are split in half by date.
+        """
+        pmids, count = self._search_page(query, ESEARCH_PAGE_SIZE, years, since, until)
+        if count > ESEARCH_MAX_RECORDS and since != until:
+            start = datetime.strptime(since, "%Y/%m/%d")
+            middle = start + (datetime.strptime(until, "%Y/%m/%d") - start) / 2
+            first = self._search_since(query, years, since, middle.strftime("%Y/%m/%d"))
+            second = self._search_since(
+                query, years, (middle + timedelta(days=1)).strftime("%Y/%m/%d"), until
             )
-            record = Entrez.read(handle)
-            handle.close()
-
-            pmids = record.get("IdList", [])
-            print(f"  Found {len(pmids)} articles")
-            return pmids
+            return list(dict.fromkeys(first + second))
 
-        except Exception as e:
-            print(f"  ❌ Error searching: {e}")
-            return []
+        while len(pmids) < min(count, ESEARCH_MAX_RECORDS):
+            page, count = self._search_page(
+                query, ESEARCH_PAGE_SIZE, years, since, until, retstart=len(pmids)
+            )
+            if not page:
+                break
+            pmids.extend(page)
+        return list(dict.fromkeys(pmids))
 
     def fetch_article_details(self, pmid: str) -> Optional[Dict]:
         """
@@ -77,77 +169,46 @@ class PubMedFetcher:
         Returns:
             Dictionary with article details
         """
-        try:
-            handle = Entrez.efetch(
-                db="pubmed",
-                id=pmid,
-                rettype="medline",
-                retmode="xml"
-            )
-            records = Entrez.read(handle)
-            handle.close()
-
-            if not records.get("PubmedArticle"):
-                return None
-
-            article = records["PubmedArticle"][0]
-            medline = article.get("MedlineCitation", {})
-            pubmed_data = article.get("PubmedData", {})
-
-            # Extract basic info
-            article_data = medline.get("Article", {})
-            title = article_data.get("ArticleTitle", "")
-            abstract_parts = article_data.get("Abstract", {}).get("AbstractText", [])
-
-            # Handle abstract (can be list or string)
-            if isinstance(abstract_parts, list):
-                abstract = " ".join(str(part) for part in abstract_parts)
-            else:
-                abstract = str(abstract_parts)
-
-            # Authors
-            authors_list = article_data.get("AuthorList", [])
-            authors = ", ".join(
-                f"{a.get('LastName', '')} {a.get('Initials', '')}"
-                for a in authors_list[:3]  # First 3 authors
-            )
-            if len(authors_list) > 3:
-                authors += " et al."
-
-            # Journal
-            journal = article_data.get("Journal", {})
-            journal_title = journal.get("Title", "")
-
-            # Year
-            pub_date = journal.get("JournalIssue", {}).get("PubDate", {})
-            year = pub_date.get("Year", "")
-            if not year:
-                # Try MedlineDate
-                medline_date = pub_date.get("MedlineDate", "")
-                year_match = re.search(r"\d{4}", medline_date)
-                year = year_match.group(0) if year_match else ""
-
-            # DOI
-            doi = ""
-            for id_data in pubmed_data.get("ArticleIdList", []):
-                if id_data.attributes.get("IdType") == "doi":
-                    doi = str(id_data)
-                    break
-
-            return {
-                "pubmed_id": pmid,
-                "title": title,
-                "authors": authors,
-                "journal": journal_title,
-                "year": int(year) if year else None,
-                "abstract": abstract,
-                "doi": doi,
-                "url": f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/",
-            }
+        articles = self.fetch_articles([pmid])
+        return articles[0] if articles else None
 
-        except Exception as e:
-            print(f"  ❌ Error fetching article {pmid}: {e}")
-            return None
+    def fetch_articles(self, pmids: List[str],
+                       batch_size: int = EFETCH_BATCH_SIZE) -> List[Dict]:
+        """
+        Fetch article details with one efetch request per batch of PMIDs
+
+        Args:
+            pmids: PubMed IDs
+            batch_size: PMIDs per efetch request
+
+        Returns:
+            Article dictionaries (articles that fail to fetch are skipped)
+        """
+        articles = []
+        for start in range(0, len(pmids), batch_size):
+            batch = pmids[start:start + batch_size]
+            try:
+                articles.extend(self._iter_batch(batch))
+            except Exception as e:
+                print(f"  ❌ Error fetching {len(batch)} articles: {e}")
+
+        return articles
+
+    def _iter_batch(self, pmids: List[str]) -> Iterator[Dict]:
+        """
+        Stream the articles of one efetch request, parsed one at a time
+
+        Raises on request or parse failure, so callers can tell a failed
+        batch from an empty one.
+        """
+        xml = self.client.get_raw(
+            "efetch.fcgi",
+            {'id': ','.join(pmids), 'rettype': 'medline', 'retmode': 'xml'},
+            timeout=60, binary=True
+        )
+        for article in iter_pubmed_articles(xml):
+            if article["pubmed_id"]:
+                yield article
 
     def extract_dosing_info(self, abstract: str) -> Dict:
         """
@@ -159,39 +220,7 @@ class PubMedFetcher:
         Returns:
             Dictionary with dose_amount, dose_unit, etc.
         """
-        dosing_info = {
-            "dose_amount": None,
-            "dose_unit": "",
-            "dose_frequency": "",
-            "subject_weight_kg": None,
-        }
-
-        # Common patterns for dosing
-        # e.g., "100 mg/kg", "5 g daily", "500 mg twice daily"
-        dose_pattern = r"(\d+\.?\d*)\s*(mg|g|μg|ug|mcg|ml)(?:/kg)?(?:\s+(?:per|/)?\s*(?:day|daily|twice|three times))?"
-        matches = re.findall(dose_pattern, abstract.lower())
-
-        if matches:
-            amount, unit = matches[0][:2]
-            dosing_info["dose_amount"] = float(amount)
-            dosing_info["dose_unit"] = unit
-
-            # Check for frequency
-            if "twice" in abstract.lower():
-                dosing_info["dose_frequency"] = "twice daily"
-            elif "three times" in abstract.lower():
-                dosing_info["dose_frequency"] = "three times daily"
-            elif "daily" in abstract.lower() or "per day" in abstract.lower():
-                dosing_info["dose_frequency"] = "daily"
-
-        # Look for subject weights (mice are usually 20-30g)
-        weight_pattern = r"(\d+)\s*g\s+(?:mice|mouse|rats?)"
-        weight_match = re.search(weight_pattern, abstract.lower())
-        if weight_match:
-            weight_g = float(weight_match.group(1))
-            dosing_info["subject_weight_kg"] = weight_g / 1000
-
-        return dosing_info
+        return extract_dosing_info(abstract)
 
     def classify_study_type(self, abstract: str, title: str) -> str:
         """
@@ -204,149 +233,205 @@ class PubMedFetcher:
         Returns:
             Study type (in_vitro, animal, human_observational, etc.)
         """
-        text = (abstract + " " + title).lower()
-
-        if any(term in text for term in ["clinical trial", "randomized", "placebo"]):
-            return "human_clinical"
-        elif any(term in text for term in ["meta-analysis", "systematic review"]):
-            return "meta_analysis"
-        elif any(term in text for term in ["cohort", "case-control", "observational", "epidemiologic"]):
-            return "human_observational"
-        elif any(term in text for term in ["mice", "mouse", "rats", "rat", "animal"]):
-            return "animal"
-        elif any(term in text for term in ["in vitro", "cell line", "cell culture", "petri"]):
-            return "in_vitro"
-        else:
-            return "in_vitro"  # Default
+        return tag_study(title, abstract)["study_type"]
 
     def extract_food_and_compound(self, title: str, abstract: str) -> tuple:
         """
         Extract food/compound being studied
 
+        The most frequently mentioned food wins; a compound named without
+        its food (e.g. "curcumin") implies the food.
+
         Returns:
             (food_name, compound_name)
         """
-        text = (title + " " + abstract).lower()
-
-        # Common foods and their compounds
-        food_compounds = {
-            "ginger": ["gingerol", "shogaol", "zingerone"],
-            "garlic": ["allicin", "alliin", "s-allyl cysteine"],
-            "turmeric": ["curcumin", "curcuminoid"],
-            "broccoli": ["sulforaphane", "glucosinolate", "isothiocyanate"],
-            "cauliflower": ["sulforaphane", "glucosinolate"],
-            "kale": ["sulforaphane", "glucosinolate"],
-            "brussels sprouts": ["sulforaphane", "glucosinolate"],
-            "green tea": ["egcg", "catechin", "epigallocatechin"],
-            "berries": ["anthocyanin", "ellagic acid"],
-            "fish oil": ["omega-3", "epa", "dha"],
-        }
+        tags = tag_study(title, abstract)
+        return tags["food"], tags["compound"]
 
-        found_food = None
-        found_compound = None
+    def build_study_record(self, article: Dict) -> Dict:
+        """
+        Add study type, food/compound, dosing and cancer type to an article
 
-        for food, compounds in food_compounds.items():
-            if food in text:
-                found_food = food
-                for compound in compounds:
-                    if compound in text:
-                        found_compound = compound
-                        break
-                break
+        Args:
+            article: Article dictionary from fetch_articles
 
-        return found_food, found_compound
+        Returns:
+            Row for research_studies
+        """
+        return build_study_record(article)
 
     def update_research_database(self, search_terms: List[str] = None,
-                                 max_per_search: int = 20):
+                                 max_per_search: int = 20,
+                                 full: bool = False) -> Dict:
         """
         Update database with latest research
 
+        Incremental and resumable. Each search term has a watermark in
+        research_sync_state; only articles added to PubMed since then are
+        searched. The PMIDs a search finds are checkpointed before they are
+        fetched, so an interrupted run picks up the same PMIDs next time
+        instead of searching again. Studies are inserted one efetch batch
+        at a time, and a term's watermark advances once all of its PMIDs
+        are stored.
+
         Args:
             search_terms: List of search queries (default: from config)
             max_per_search: Max results per search term
+            full: Ignore watermarks and search the whole publication window
+
+        Returns:
+            Counts of added and skipped studies and elapsed seconds
         """
         if search_terms is None:
             search_terms = CANCER_SEARCH_TERMS
 
         print("🔬 Updating research database from PubMed...\n")
+        start = time.perf_counter()
+
+        # 1. PMIDs per term: resume an unfinished checkpoint or search since the watermark
+        term_pmids = self.collect_pmids(search_terms, max_per_search, full)
+
+        found = [pmid for pmids in term_pmids.values() for pmid in pmids]
+        new_pmids = self.new_pmids(term_pmids)
+        print(f"\n📚 {len(new_pmids)} new of {len(set(found))} unique articles")
+
+        # 2 + 3. Fetch details in batches, streaming each response into bulk inserts
         total_added = 0
-        total_skipped = 0
+        total_stored = 0
+        failed = set()
+        for batch_start in range(0, len(new_pmids), EFETCH_BATCH_SIZE):
+            batch = new_pmids[batch_start:batch_start + EFETCH_BATCH_SIZE]
+            try:
+                added, stored = self._store_stream(self._iter_batch(batch))
+            except Exception as e:
+                print(f"  ❌ Error fetching {len(batch)} articles: {e}")
+                failed.update(batch)
+                continue
+
+            total_added += added
+            total_stored += stored
+
+        self.complete_sync(term_pmids, failed)
+        if total_added:
+            on_studies_added(self.db)
+
+        total_skipped = (len(found) - len(new_pmids)) + (total_stored - total_added)
+        elapsed = time.perf_counter() - start
+
+        print(f"\n✅ Research update complete in {elapsed:.1f}s!")
+        print(f"   Added: {total_added} new studies")
+        print(f"   Skipped: {total_skipped} existing studies")
+        if failed:
+            print(f"   ⚠️  {len(failed)} articles could not be fetched; run again to resume")
+
+        return {"added": total_added, "skipped": total_skipped, "elapsed_seconds": elapsed}
+
+    def collect_pmids(self, search_terms: List[str], max_per_search: int,
+                      full: bool = False) -> Dict[str, List[str]]:
+        """
+        PMIDs to sync for each search term, checkpointed before fetching
+
+        Terms with an unfinished checkpoint reuse it; other terms get every
+        article added since their watermark, or the `max_per_search` most
+        relevant in the full window on a first or `full` sync. Terms whose
+        search fails are left out.
+        """
+        today = datetime.now().strftime("%Y/%m/%d")
+        term_pmids: Dict[str, List[str]] = {}
 
         for search_term in search_terms:
-            # Search PubMed
-            pmids = self.search_pubmed(search_term, max_results=max_per_search)
-
-            for pmid in pmids:
-                # Check if already in database
-                existing = self.db.conn.execute(
-                    "SELECT id FROM research_studies WHERE pubmed_id = ?",
-                    (pmid,)
-                ).fetchone()
-
-                if existing:
-                    total_skipped += 1
-                    continue
-
-                # Fetch article details
-                article = self.fetch_article_details(pmid)
-                if not article:
-                    continue
-
-                # Extract additional info
-                dosing_info = self.extract_dosing_info(article["abstract"])
-                study_type = self.classify_study_type(article["abstract"], article["title"])
-                food, compound = self.extract_food_and_compound(article["title"], article["abstract"])
-
-                # Determine cancer type
-                cancer_type = "general"
-                text_lower = (article["title"] + " " + article["abstract"]).lower()
-                if "colon" in text_lower or "colorectal" in text_lower:
-                    cancer_type = "colon"
-                elif "breast" in text_lower:
-                    cancer_type = "breast"
-                elif "prostate" in text_lower:
-                    cancer_type = "prostate"
-                elif "lung" in text_lower:
-                    cancer_type = "lung"
-
-                # Save to database
-                study_data = {
-                    **article,
-                    **dosing_info,
-                    "study_type": study_type,
-                    "food_studied": food or "",
-                    "compound_studied": compound or "",
-                    "cancer_type": cancer_type,
-                }
-
-                result = self.db.add_research_study(study_data)
-                if result > 0:
-                    print(f"  ✅ Added: {article['title'][:60]}...")
-                    total_added += 1
+            state = self.db.get_research_sync_state(search_term)
+            if state and state['checkpoint'] is not None and not full:
+                print(f"⏯️  Resuming: {search_term} ({len(state['checkpoint'])} articles)")
+                term_pmids[search_term] = state['checkpoint']
+                continue
+
+            since = state['last_synced_date'] if state and not full else None
+            try:
+                if since:
+                    print(f"🔍 Searching PubMed: {search_term} (added since {since})")
+                    pmids = self._search_since(search_term, RESEARCH_SYNC_YEARS, since, today)
+                    print(f"  Found {len(pmids)} articles")
                 else:
-                    total_skipped += 1
+                    pmids = self._search(search_term, max_per_search, RESEARCH_SYNC_YEARS)
+            except Exception as e:
+                print(f"  ❌ Error searching: {e}")
+                continue
 
-                # Be nice to NCBI servers
-                time.sleep(0.5 if NCBI_API_KEY else 1)
+            self.db.save_research_sync_checkpoint(search_term, pmids, today)
+            term_pmids[search_term] = pmids
 
-            print()  # Blank line between search terms
+        return term_pmids
 
-        print(f"\n✅ Research update complete!")
-        print(f"   Added: {total_added} new studies")
-        print(f"   Skipped: {total_skipped} existing studies")
+    def new_pmids(self, term_pmids: Dict[str, List[str]]) -> List[str]:
+        """Unique PMIDs across terms that are not stored yet"""
+        pmids = list(dict.fromkeys(pmid for pmids in term_pmids.values() for pmid in pmids))
+        existing = self.db.get_existing_pubmed_ids(pmids)
+        return [pmid for pmid in pmids if pmid not in existing]
+
+    def complete_sync(self, term_pmids: Dict[str, List[str]], failed: set):
+        """Advance watermarks for terms whose PMIDs were all fetched"""
+        for search_term, pmids in term_pmids.items():
+            if failed.isdisjoint(pmids):
+                self.db.complete_research_sync(search_term)
+
+    def _store_stream(self, articles: Iterator[Dict]) -> tuple:
+        """
+        Extract and bulk-insert streamed articles INSERT_CHUNK_SIZE at a time
+
+        Returns:
+            (studies inserted, studies processed)
+        """
+        added = 0
+        stored = 0
+        chunk = []
+
+        def flush():
+            nonlocal added, stored
+            # Report only the rows INSERT OR IGNORE will write: not stored
+            # yet, and the first of any repeats within the chunk
+            seen = self.db.get_existing_pubmed_ids([study['pubmed_id'] for study in chunk])
+            new = []
+            for study in chunk:
+                if study['pubmed_id'] not in seen:
+                    seen.add(study['pubmed_id'])
+                    new.append(study)
+            added += self.db.add_research_studies(chunk)
+            stored += len(chunk)
+            for study in new:
+                print(f"  ✅ Added: {study['title'][:60]}...")
+            chunk.clear()
+
+        for article in articles:
+            chunk.append(build_study_record(article))
+            if len(chunk) >= INSERT_CHUNK_SIZE:
+                flush()
+        if chunk:
+            flush()
+
+        return added, stored
 
     def get_research_summary(self) -> Dict:
-        """Get summary statistics of research database"""
+        """
+        Get summary statistics of research database
+
+        Near-duplicates (research_studies.duplicate_of set) are counted
+        once, under the first study of their cluster.
+        """
         cursor = self.db.conn.cursor()
 
         # Total studies
-        cursor.execute("SELECT COUNT(*) FROM research_studies")
+        cursor.execute("SELECT COUNT(*) FROM research_studies WHERE duplicate_of IS NULL")
         total = cursor.fetchone()[0]
 
+        cursor.execute("SELECT COUNT(*) FROM research_studies WHERE duplicate_of IS NOT NULL")
+        duplicates = cursor.fetchone()[0]
+
         # By study type
         cursor.execute("""
             SELECT study_type, COUNT(*)
             FROM research_studies
+            WHERE duplicate_of IS NULL
             GROUP BY study_type
         """)
         by_type = dict(cursor.fetchall())
@@ -355,6 +440,7 @@ class PubMedFetcher:
         cursor.execute("""
             SELECT cancer_type, COUNT(*)
             FROM research_studies
+            WHERE duplicate_of IS NULL
             GROUP BY cancer_type
         """)
         by_cancer = dict(cursor.fetchall())
@@ -363,7 +449,7 @@ class PubMedFetcher:
         cursor.execute("""
             SELECT food_studied, COUNT(*)
             FROM research_studies
-            WHERE food_studied != ''
+            WHERE food_studied != '' AND duplicate_of IS NULL
             GROUP BY food_studied
             ORDER BY COUNT(*) DESC
             LIMIT 10
@@ -372,6 +458,7 @@ class PubMedFetcher:
 
         return {
             "total_studies": total,
+            "near_duplicates": duplicates,
             "by_study_type": by_type,
             "by_cancer_type": by_cancer,
             "top_foods": top_foods,
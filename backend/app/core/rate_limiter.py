@@ -0,0 +1,86 @@
+"""
+Token-bucket rate limiting for No Colon, Still Rollin'
+Keeps NCBI E-utilities traffic at the allowed request rate
+"""
+from typing import Optional
+import threading
+import time
+
+from config import NCBI_REQUESTS_PER_SECOND
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket (asyncio callers acquire from worker threads,
+    see pubmed_async)
+
+    Tokens refill continuously at `rate` per second up to `capacity`.
+    Each request reserves a token up front; if the bucket is empty the
+    caller is told how long to wait, so concurrent callers queue up in
+    arrival order instead of polling.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum burst size (default: one second's worth)
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waited_seconds = 0.0
+
+    def _reserve(self, tokens: float) -> float:
+        """Take tokens (possibly going into debt) and return the wait needed"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+            self.acquired += 1
+            self.waited_seconds += wait
+            return wait
+
+    def acquire(self, tokens: float = 1):
+        """Block the calling thread until tokens are available"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    def stats(self) -> dict:
+        """Usage counters for monitoring"""
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "acquired": self.acquired,
+                "waited_seconds": round(self.waited_seconds, 3),
+            }
+
+
+# NCBI limits are per client, so every PubMed caller in the process shares one bucket
+_ncbi_bucket: Optional[TokenBucket] = None
+_ncbi_bucket_lock = threading.Lock()
+
+
+def get_ncbi_rate_limiter() -> TokenBucket:
+    """
+    Return the process-wide E-utilities rate limiter
+
+    Capacity is one token, so requests are evenly spaced and no
+    one-second window ever exceeds NCBI_REQUESTS_PER_SECOND.
+    """
+    global _ncbi_bucket
+    with _ncbi_bucket_lock:
+        if _ncbi_bucket is None:
+            _ncbi_bucket = TokenBucket(NCBI_REQUESTS_PER_SECOND, capacity=1)
+        return _ncbi_bucket
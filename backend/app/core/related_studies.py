@@ -0,0 +1,537 @@
+"""
+Related studies for No Colon, Still Rollin'
+TF-IDF vectors over abstracts and precomputed top-k neighbor lists, so
+"studies like this one" is a primary-key lookup
+
+Vectors are sparse rows (term ids + weights, sublinear tf x idf, L2
+normalized, pruned to each study's MAX_TERMS strongest terms) held in
+CSR arrays; similarities are computed blockwise through an inverted index
+with NumPy. New studies are scored against the stored vectors and
+spliced into their neighbors' lists; once the library has grown by
+REBUILD_GROWTH, a full rebuild is due (research_indexing runs it off the
+request path).
+
+    python src/main.py build-related
+"""
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import re
+import threading
+import time
+
+import numpy as np
+
+from config import RELATED_STUDIES_CONFIG
+
+TOP_K = RELATED_STUDIES_CONFIG["k"]
+MAX_TERMS = RELATED_STUDIES_CONFIG["max_terms"]
+MAX_DF_RATIO = RELATED_STUDIES_CONFIG["max_df_ratio"]
+REBUILD_GROWTH = RELATED_STUDIES_CONFIG["rebuild_growth"]
+
+# Query studies per similarity block; the block's score matrix is BLOCK x library floats
+_BLOCK = 64
+
+# Below this many new studies, score each against the matrix directly
+# rather than building the inverted index
+_DIRECT_QUERIES = 16
+
+_TOKEN = re.compile(r"[a-z][a-z0-9-]{2,}")
+_STOPWORDS = frozenset("""
+    the and for with from that this were was are been has have had not but its into than
+    which these those their there also after before between during while our all can may
+    more most other such both each per via using used use study studies results result
+    conclusion conclusions background methods method objective aim aims however compared
+    significantly significant associated including increased decreased reduced observed
+""".split())
+
+
+def tokenize(title: Optional[str], abstract: Optional[str]) -> List[str]:
+    return [t for t in _TOKEN.findall(f"{title or ''} {abstract or ''}".lower()) if t not in _STOPWORDS]
+
+
+class Matrix(NamedTuple):
+    """Stored vectors in CSR form; row i belongs to study ids[i]"""
+    ids: np.ndarray        # int64
+    indptr: np.ndarray     # int64, len(ids) + 1
+    indices: np.ndarray    # int32 term ids
+    data: np.ndarray       # float32 weights
+
+
+def _vector(counts: Counter, term_ids: Dict[str, int], idf: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Sublinear tf x idf over known terms, top MAX_TERMS, L2 normalized"""
+    ids = np.fromiter((term_ids[t] for t in counts if t in term_ids), dtype=np.int32)
+    if not len(ids):
+        return ids, np.empty(0, dtype=np.float32)
+    tf = np.fromiter((counts[t] for t in counts if t in term_ids), dtype=np.float32)
+    weights = (1 + np.log(tf)) * idf[ids]
+    keep = weights > 0
+    ids, weights = ids[keep], weights[keep]
+    if len(ids) > MAX_TERMS:
+        top = np.argpartition(-weights, MAX_TERMS)[:MAX_TERMS]
+        ids, weights = ids[top], weights[top]
+    norm = np.linalg.norm(weights)
+    return ids, (weights / norm if norm else weights).astype(np.float32)
+
+
+def _idf(doc_freq: np.ndarray, documents: int) -> np.ndarray:
+    """Smoothed idf; terms in one study or in over MAX_DF_RATIO of them get 0"""
+    idf = np.log((1 + documents) / (1 + doc_freq)) + 1
+    idf[(doc_freq < 2) | (doc_freq > max(2, MAX_DF_RATIO * documents))] = 0
+    return idf.astype(np.float32)
+
+
+def _csr(ids: List[int], vectors: List[Tuple[np.ndarray, np.ndarray]]) -> Matrix:
+    lengths = [len(v[0]) for v in vectors]
+    return Matrix(
+        ids=np.asarray(ids, dtype=np.int64),
+        indptr=np.concatenate(([0], np.cumsum(lengths))).astype(np.int64),
+        indices=np.concatenate([v[0] for v in vectors]) if vectors else np.empty(0, np.int32),
+        data=np.concatenate([v[1] for v in vectors]) if vectors else np.empty(0, np.float32),
+    )
+
+
+def _inverted(matrix: Matrix, vocabulary_size: int):
+    """Column (term) index over the matrix: postings of row numbers and weights"""
+    rows = np.repeat(np.arange(len(matrix.ids), dtype=np.int64), np.diff(matrix.indptr))
+    order = np.argsort(matrix.indices, kind="stable")
+    starts = np.zeros(vocabulary_size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(matrix.indices, minlength=vocabulary_size), out=starts[1:])
+    return starts, rows[order], matrix.data[order]
+
+
+def _block_scores(query: Matrix, inverted, library_size: int) -> np.ndarray:
+    """(len(query), library_size) dot products via the inverted index"""
+    starts, posting_rows, posting_data = inverted
+    entry_rows = np.repeat(np.arange(len(query.ids)), np.diff(query.indptr))
+    lengths = starts[query.indices + 1] - starts[query.indices]
+    total = int(lengths.sum())
+    if not total:
+        return np.zeros((len(query.ids), library_size))
+    # Ragged gather of every posting list the block touches
+    offsets = np.repeat(starts[query.indices] - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    gathered = offsets + np.arange(total)
+    keys = np.repeat(entry_rows * library_size, lengths) + posting_rows[gathered]
+    weights = np.repeat(query.data, lengths) * posting_data[gathered]
+    scores = np.bincount(keys, weights=weights, minlength=len(query.ids) * library_size)
+    return scores.reshape(len(query.ids), library_size)
+
+
+def _direct_scores(query: Matrix, matrix: Matrix, vocabulary_size: int) -> np.ndarray:
+    """Same as _block_scores, one dense query vector at a time (no index to build)"""
+    scores = np.zeros((len(query.ids), len(matrix.ids)), dtype=np.float64)
+    nonempty = np.diff(matrix.indptr) > 0
+    for i in range(len(query.ids)):
+        dense = np.zeros(vocabulary_size, dtype=np.float32)
+        lo, hi = query.indptr[i], query.indptr[i + 1]
+        dense[query.indices[lo:hi]] = query.data[lo:hi]
+        products = dense[matrix.indices] * matrix.data
+        if len(products):
+            scores[i, nonempty] = np.add.reduceat(products, matrix.indptr[:-1][nonempty])
+    return scores
+
+
+def _top_k(scores: np.ndarray, query_ids: np.ndarray, library_ids: np.ndarray,
+           k: int = TOP_K) -> List[Tuple[int, int, float]]:
+    """(study_id, related_id, score) rows for each query's k best matches"""
+    positions = np.searchsorted(library_ids, query_ids)
+    found = positions < len(library_ids)
+    found[found] = library_ids[positions[found]] == query_ids[found]
+    scores[np.flatnonzero(found), positions[found]] = 0   # never its own neighbor
+    k = min(k, scores.shape[1])
+    if not k:
+        return []
+    np.negative(scores, out=scores)
+    best = np.argpartition(scores, k - 1, axis=1)[:, :k]
+    best_scores = -np.take_along_axis(scores, best, axis=1)
+    order = np.argsort(-best_scores, axis=1)
+    best, best_scores = np.take_along_axis(best, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+    return [
+        (int(query_ids[i]), int(library_ids[j]), round(float(score), 5))
+        for i, (columns, row_scores) in enumerate(zip(best, best_scores))
+        for j, score in zip(columns, row_scores) if score > 0
+    ]
+
+
+def _pack(ids: np.ndarray, weights: np.ndarray) -> Tuple[bytes, bytes]:
+    return ids.astype(np.int32).tobytes(), weights.astype(np.float32).tobytes()
+
+
+def build_related_index(db=None, batch_size: int = 5000) -> Dict:
+    """
+    Rebuild vocabulary, vectors and every neighbor list from scratch
+
+    Returns:
+        Counts and timings
+    """
+    from database import Database
+
+    db = db or Database()
+    start = time.perf_counter()
+
+    # 1. Tokens and document frequencies
+    ids: List[int] = []
+    counts: List[Counter] = []
+    doc_freq: Counter = Counter()
+    last_id = 0
+    while True:
+        rows = db.conn.execute(
+            "SELECT id, title, abstract FROM research_studies WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, batch_size)
+        ).fetchall()
+        if not rows:
+            break
+        for study_id, title, abstract in rows:
+            tokens = Counter(tokenize(title, abstract))
+            ids.append(study_id)
+            counts.append(tokens)
+            doc_freq.update(tokens.keys())
+        last_id = rows[-1][0]
+
+    terms = list(doc_freq)
+    term_ids = {term: i for i, term in enumerate(terms)}
+    idf = _idf(np.array([doc_freq[t] for t in terms], dtype=np.float64), len(ids))
+
+    # 2. Vectors
+    vectors = [_vector(c, term_ids, idf) for c in counts]
+    del counts
+    matrix = _csr(ids, vectors)
+    vectorized = time.perf_counter()
+
+    # 3. Neighbors, a block of studies at a time
+    inverted = _inverted(matrix, len(terms))
+    neighbors: List[Tuple[int, int, float]] = []
+    for block_start in range(0, len(ids), _BLOCK):
+        lo, hi = block_start, min(block_start + _BLOCK, len(ids))
+        block = Matrix(matrix.ids[lo:hi], matrix.indptr[lo:hi + 1] - matrix.indptr[lo],
+                       matrix.indices[matrix.indptr[lo]:matrix.indptr[hi]],
+                       matrix.data[matrix.indptr[lo]:matrix.indptr[hi]])
+        neighbors.extend(_top_k(_block_scores(block, inverted, len(ids)), block.ids, matrix.ids))
+    scored = time.perf_counter()
+
+    with db.conn:
+        generation = _generation(db) + 1
+        for table in ("tfidf_terms", "tfidf_vectors", "study_related", "tfidf_corpus"):
+            db.conn.execute(f"DELETE FROM {table}")
+        db.conn.executemany("INSERT INTO tfidf_terms (term, term_id, doc_freq) VALUES (?, ?, ?)",
+                            [(term, i, doc_freq[term]) for i, term in enumerate(terms)])
+        db.conn.executemany("INSERT INTO tfidf_vectors (study_id, term_ids, weights) VALUES (?, ?, ?)",
+                            [(study_id, *_pack(*vector)) for study_id, vector in zip(ids, vectors)])
+        db.conn.executemany("INSERT INTO study_related (study_id, related_id, score) VALUES (?, ?, ?)",
+                            neighbors)
+        db.conn.execute("INSERT INTO tfidf_corpus (id, documents, built_documents, generation) VALUES (1, ?, ?, ?)",
+                        (len(ids), len(ids), generation))
+
+    return {
+        "studies": len(ids),
+        "terms": len(terms),
+        "neighbor_rows": len(neighbors),
+        "vector_seconds": round(vectorized - start, 2),
+        "similarity_seconds": round(scored - vectorized, 2),
+        "elapsed_seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+# Stored vectors per database, extended as studies are added and reloaded
+# whenever the stored generation moves on (a rebuild, removal or re-index,
+# possibly by another process)
+_matrices: Dict[str, Tuple[int, Matrix]] = {}
+_matrices_lock = threading.Lock()
+
+
+def _generation(db) -> int:
+    row = db.conn.execute("SELECT generation FROM tfidf_corpus WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+def _load_matrix(db) -> Matrix:
+    """Stored vectors as CSR, reading only rows added since the last load of this generation"""
+    generation = _generation(db)
+    with _matrices_lock:
+        entry = _matrices.get(db.db_path)
+        cached = entry[1] if entry is not None and entry[0] == generation else None
+        last_id = int(cached.ids[-1]) if cached is not None and len(cached.ids) else 0
+        rows = db.conn.execute(
+            "SELECT study_id, term_ids, weights FROM tfidf_vectors WHERE study_id > ? ORDER BY study_id",
+            (last_id,)
+        ).fetchall()
+        added = _csr([row[0] for row in rows],
+                     [(np.frombuffer(row[1], dtype=np.int32), np.frombuffer(row[2], dtype=np.float32))
+                      for row in rows])
+        if cached is None:
+            matrix = added
+        else:
+            matrix = Matrix(
+                np.concatenate((cached.ids, added.ids)),
+                np.concatenate((cached.indptr, added.indptr[1:] + cached.indptr[-1])),
+                np.concatenate((cached.indices, added.indices)),
+                np.concatenate((cached.data, added.data)),
+            )
+        _matrices[db.db_path] = (generation, matrix)
+        return matrix
+
+
+def _add_studies(db, rows: List[Tuple[int, str, str]]) -> int:
+    """
+    Vectorize studies, give them neighbor lists, and splice them into others' lists
+
+    Similarity is symmetric, so a stored study's top-k can only change
+    by gaining one of the new studies; each list is updated from the new
+    studies' scores alone. The caller holds the transaction.
+    """
+    counts = [Counter(tokenize(title, abstract)) for _, title, abstract in rows]
+    documents = db.conn.execute("SELECT COALESCE(MAX(documents), 0) FROM tfidf_corpus").fetchone()[0]
+    documents += len(rows)
+
+    # Document frequencies, with new terms given the next ids
+    new_terms = Counter(term for c in counts for term in c)
+    known = dict(db.conn.execute(
+        f"SELECT term, term_id FROM tfidf_terms WHERE term IN ({','.join('?' for _ in new_terms)})",
+        list(new_terms)
+    ).fetchall()) if new_terms else {}
+    next_id = db.conn.execute("SELECT COALESCE(MAX(term_id), -1) + 1 FROM tfidf_terms").fetchone()[0]
+    for term in new_terms:
+        if term not in known:
+            known[term] = next_id
+            next_id += 1
+    db.conn.executemany("""
+        INSERT INTO tfidf_terms (term, term_id, doc_freq) VALUES (?, ?, ?)
+        ON CONFLICT(term) DO UPDATE SET doc_freq = doc_freq + excluded.doc_freq
+    """, [(term, known[term], n) for term, n in new_terms.items()])
+    db.conn.execute("""
+        INSERT INTO tfidf_corpus (id, documents, built_documents) VALUES (1, ?, 0)
+        ON CONFLICT(id) DO UPDATE SET documents = excluded.documents
+    """, (documents,))
+
+    term_ids = list(known.items())
+    doc_freq = dict(db.conn.execute(
+        f"SELECT term_id, doc_freq FROM tfidf_terms WHERE term_id IN ({','.join('?' for _ in term_ids)})",
+        [i for _, i in term_ids]
+    ).fetchall()) if term_ids else {}
+    vocabulary_size = next_id
+    freq = np.zeros(vocabulary_size, dtype=np.float64)
+    freq[list(doc_freq)] = list(doc_freq.values())
+    idf = _idf(freq, documents)
+
+    ids = [row[0] for row in rows]
+    vectors = [_vector(c, known, idf) for c in counts]
+    db.conn.executemany("INSERT OR REPLACE INTO tfidf_vectors (study_id, term_ids, weights) VALUES (?, ?, ?)",
+                        [(study_id, *_pack(*vector)) for study_id, vector in zip(ids, vectors)])
+
+    query = _csr(ids, vectors)
+    matrix = _load_matrix(db)
+    if len(query.ids) <= _DIRECT_QUERIES:
+        scores = _direct_scores(query, matrix, vocabulary_size)
+    else:
+        inverted = _inverted(matrix, vocabulary_size)
+        scores = np.vstack([
+            _block_scores(Matrix(query.ids[lo:lo + _BLOCK],
+                                 query.indptr[lo:lo + _BLOCK + 1] - query.indptr[lo],
+                                 query.indices[query.indptr[lo]:query.indptr[min(lo + _BLOCK, len(ids))]],
+                                 query.data[query.indptr[lo]:query.indptr[min(lo + _BLOCK, len(ids))]]),
+                          inverted, len(matrix.ids))
+            for lo in range(0, len(ids), _BLOCK)
+        ])
+
+    neighbors = _top_k(scores, query.ids, matrix.ids)
+    marks = ','.join('?' for _ in ids)
+    db.conn.execute(f"DELETE FROM study_related WHERE study_id IN ({marks})", ids)
+    db.conn.executemany("INSERT OR REPLACE INTO study_related (study_id, related_id, score) VALUES (?, ?, ?)",
+                        neighbors)
+
+    # Reverse edges: a new study enters a stored study's list if it beats the k-th entry
+    new = set(ids)
+    for study_id, related_id, score in neighbors:
+        if related_id in new:
+            continue
+        current = db.conn.execute(
+            "SELECT related_id, score FROM study_related WHERE study_id = ? ORDER BY score DESC",
+            (related_id,)
+        ).fetchall()
+        if len(current) < TOP_K or score > current[-1][1]:
+            db.conn.execute("INSERT OR REPLACE INTO study_related (study_id, related_id, score) VALUES (?, ?, ?)",
+                            (related_id, study_id, score))
+            if len(current) >= TOP_K:
+                db.conn.execute("DELETE FROM study_related WHERE study_id = ? AND related_id = ?",
+                                (related_id, current[-1][0]))
+    return len(ids)
+
+
+def needs_refresh(db) -> bool:
+    """Nothing is indexed yet, or the library has grown by REBUILD_GROWTH since the last build"""
+    if db.conn.execute("SELECT 1 FROM tfidf_vectors LIMIT 1").fetchone() is None:
+        return db.conn.execute("SELECT 1 FROM research_studies LIMIT 1").fetchone() is not None
+    row = db.conn.execute("SELECT documents, built_documents FROM tfidf_corpus WHERE id = 1").fetchone()
+    return row is not None and row[1] > 0 and row[0] - row[1] > row[1] * REBUILD_GROWTH
+
+
+def refresh(db) -> Dict:
+    """Full rebuild (research_indexing.refresh_stale_indexes)"""
+    return build_related_index(db)
+
+
+def index_new_studies(db, batch_size: int = 2000) -> int:
+    """
+    Vectorize and link studies added since the last call
+
+    New studies are weighted with the current document frequencies and
+    compared with every stored vector. Until the first full build there
+    are no vectors to compare with, so nothing is added; needs_refresh
+    reports that build, and the one due after REBUILD_GROWTH.
+
+    Returns:
+        Number of studies added
+    """
+    last_id = db.conn.execute("SELECT COALESCE(MAX(study_id), 0) FROM tfidf_vectors").fetchone()[0]
+    if not last_id:
+        return 0
+
+    added = 0
+    while True:
+        rows = db.conn.execute(
+            "SELECT id, title, abstract FROM research_studies WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, batch_size)
+        ).fetchall()
+        if not rows:
+            break
+        with db.conn:
+            added += _add_studies(db, [tuple(row) for row in rows])
+        last_id = rows[-1][0]
+    return added
+
+
+def remove_studies(db, study_ids: Iterable[int]):
+    """
+    Drop studies from the vectors and every neighbor list
+
+    Lists that lose an entry run one short until the next rebuild.
+    Document frequencies are not decremented (vectors keep only their
+    strongest terms); the next rebuild recounts them.
+    """
+    study_ids = list(study_ids)
+    if not study_ids:
+        return
+    with db.conn:
+        for start in range(0, len(study_ids), 500):
+            chunk = study_ids[start:start + 500]
+            marks = ','.join('?' for _ in chunk)
+            db.conn.execute(f"DELETE FROM tfidf_vectors WHERE study_id IN ({marks})", chunk)
+            db.conn.execute(f"DELETE FROM study_related WHERE study_id IN ({marks})", chunk)
+            db.conn.execute(f"DELETE FROM study_related WHERE related_id IN ({marks})", chunk)
+        db.conn.execute("""
+            UPDATE tfidf_corpus SET documents = MAX(0, documents - ?), generation = generation + 1
+            WHERE id = 1
+        """, (len(study_ids),))
+
+
+def reindex_studies(db, study_ids: Iterable[int]) -> int:
+    """Re-vectorize studies whose text changed and recompute their neighbors"""
+    watermark = db.conn.execute("SELECT COALESCE(MAX(study_id), 0) FROM tfidf_vectors").fetchone()[0]
+    study_ids = [study_id for study_id in study_ids if study_id <= watermark]
+    if not study_ids:
+        return 0
+    remove_studies(db, study_ids)
+
+    rows = []
+    for start in range(0, len(study_ids), 500):
+        chunk = study_ids[start:start + 500]
+        rows += db.conn.execute(
+            f"SELECT id, title, abstract FROM research_studies WHERE id IN ({','.join('?' for _ in chunk)}) "
+            f"ORDER BY id",
+            chunk
+        ).fetchall()
+    # remove_studies moved the generation on, so the re-vectorized rows
+    # (out of id order for the cached matrix) are picked up by a full reload
+    with db.conn:
+        _add_studies(db, [tuple(row) for row in rows])
+    return len(rows)
+
+
+def get_related(db, study_id: int, limit: int = TOP_K) -> List[Dict]:
+    """A study's most similar saved studies, best first (near-duplicates of it left out)"""
+    rows = db.conn.execute("""
+        SELECT r.id, r.pubmed_id, r.title, r.year, r.study_type, r.food_studied, s.score
+        FROM study_related s
+        JOIN research_studies r ON r.id = s.related_id
+        JOIN research_studies self ON self.id = s.study_id
+        WHERE s.study_id = ?
+          AND COALESCE(r.duplicate_of, r.id) != COALESCE(self.duplicate_of, self.id)
+        ORDER BY s.score DESC
+        LIMIT ?
+    """, (study_id, limit)).fetchall()
+    return [dict(row) for row in rows]
+
+
+def _topic_library(count: int, topics: int = 400, seed: int = 3):
+    """
+    Synthetic abstracts drawn from topics over a Zipf-distributed vocabulary
+
+    Returns:
+        (rows for research_studies, topic of each row)
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"term{i}" for i in range(40000)])
+    background = 1 / np.arange(1, len(vocabulary) + 1)
+    background /= background.sum()
+    topic_words = [rng.choice(len(vocabulary), 60, replace=False) for _ in range(topics)]
+
+    studies, labels = [], []
+    for i in range(count):
+        topic = int(rng.integers(0, topics))
+        length = int(rng.integers(120, 260))
+        own = rng.choice(topic_words[topic], int(length * 0.3))
+        words = np.concatenate((own, rng.choice(len(vocabulary), length - len(own), p=background)))
+        rng.shuffle(words)
+        studies.append({"pubmed_id": str(20_000_000 + i), "title": f"Study {i}",
+                        "abstract": " ".join(vocabulary[words]), "cancer_type": "colon"})
+        labels.append(topic)
+    return studies, labels
+
+
+if __name__ == "__main__":
+    # Benchmark: build at library scale, add studies incrementally, compare query paths
+    import sys
+    import tempfile
+    from pathlib import Path
+    from database import Database
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    workdir = Path(tempfile.mkdtemp(prefix="related-studies-"))
+    bench_db = Database(str(workdir / "library.db"))
+
+    studies, labels = _topic_library(count + 500)
+    bench_db.add_research_studies(studies[:count])
+
+    result = build_related_index(bench_db)
+    print(f"build_related_index: {result}")
+
+    id_of = bench_db.get_research_study_ids([s["pubmed_id"] for s in studies])
+    topic_of = {id_of[s["pubmed_id"]]: label for s, label in zip(studies, labels) if s["pubmed_id"] in id_of}
+    sample = list(topic_of)[:2000]
+    same_topic = [topic_of[r["id"]] == topic_of[study_id]
+                  for study_id in sample for r in get_related(bench_db, study_id)]
+    print(f"  same-topic precision@{TOP_K}: {np.mean(same_topic):.3f}")
+
+    t = time.perf_counter()
+    for study_id in sample[:1000]:
+        get_related(bench_db, study_id)
+    print(f"get_related (stored lists): {(time.perf_counter() - t) / 1000 * 1000:.3f} ms per query")
+
+    matrix = _load_matrix(bench_db)
+    vocabulary_size = bench_db.conn.execute("SELECT MAX(term_id) + 1 FROM tfidf_terms").fetchone()[0]
+    t = time.perf_counter()
+    for i in range(20):
+        row = Matrix(matrix.ids[i:i + 1], matrix.indptr[i:i + 2] - matrix.indptr[i],
+                     matrix.indices[matrix.indptr[i]:matrix.indptr[i + 1]],
+                     matrix.data[matrix.indptr[i]:matrix.indptr[i + 1]])
+        _top_k(_direct_scores(row, matrix, vocabulary_size), row.ids, matrix.ids)
+    print(f"scoring on request (vectors already in memory): {(time.perf_counter() - t) / 20 * 1000:.1f} ms per query")
+
+    bench_db.add_research_studies(studies[count:count + 1])
+    t = time.perf_counter()
+    index_new_studies(bench_db)
+    print(f"index_new_studies: 1 new study in {(time.perf_counter() - t) * 1000:.0f} ms")
+
+    bench_db.add_research_studies(studies[count + 1:])
+    t = time.perf_counter()
+    added = index_new_studies(bench_db)
+    print(f"index_new_studies: {added} new studies in {time.perf_counter() - t:.2f}s")
@@ -0,0 +1,194 @@
+"""
+Offline research ingestion benchmarks for No Colon, Still Rollin'
+Drives PubMedClient, PubMedFetcher, the ingest pipeline and /api/library/search
+against a local mock E-utilities server and reports articles/s and peak memory
+
+    python research_benchmark.py --queries 20 --max-results 200 --latency 0.05
+"""
+from pathlib import Path
+from typing import Callable, Dict, List
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import requests
+
+from mock_eutils import start_mock_server_process
+
+
+def _configure_environment(base_url: str, workdir: str, args) -> None:
+    """
+    Point the app's config at the mock server and a scratch database
+
+    config.py reads the environment at import, so this runs before any
+    app module is imported.
+    """
+    os.environ["NCBI_EUTILS_BASE_URL"] = base_url
+    os.environ["DATABASE_PATH"] = str(Path(workdir) / "benchmark.db")
+    os.environ["EUTILS_CACHE_PATH"] = str(Path(workdir) / "eutils_cache.db")
+    os.environ["EUTILS_CACHE_ENABLED"] = "true" if args.cache else "false"
+    os.environ["NCBI_REQUESTS_PER_SECOND"] = str(args.rate)
+    os.environ.setdefault("NCBI_EMAIL", "benchmark@example.com")
+    # Make "app.api..." importable for the API scenario
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+
+def _reset_research_tables():
+    from database import Database
+
+    db = Database()
+    db.conn.execute("DELETE FROM research_studies")
+    db.conn.execute("DELETE FROM research_sync_state")
+    db.conn.commit()
+    db.close()
+
+
+def _measure(run: Callable[[], int], trace_memory: bool) -> Dict:
+    """Run one scenario; returns articles, seconds and (optionally) peak traced memory"""
+    _reset_research_tables()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        articles = run()
+    elapsed = time.perf_counter() - start
+    result = {"articles": articles, "seconds": elapsed}
+    if trace_memory:
+        result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return result
+
+
+def build_scenarios(terms: List[str], max_results: int, concurrency: int) -> Dict[str, Callable[[], int]]:
+    """Benchmark scenarios; each returns the number of articles it handled"""
+    from pubmed_client import PubMedClient
+    from pubmed_fetcher import PubMedFetcher
+
+    def client_search_and_fetch():
+        client = PubMedClient()
+        return sum(len(client.search_and_fetch(term, max_results)) for term in terms)
+
+    def fetcher_sync():
+        fetcher = PubMedFetcher()
+        result = fetcher.update_research_database(terms, max_per_search=max_results, full=True)
+        fetcher.db.close()
+        return result["added"]
+
+    def pipeline_sync():
+        from research_pipeline import run_research_sync
+
+        fetcher = PubMedFetcher()
+        result = run_research_sync(terms, max_per_search=max_results, full=True, fetcher=fetcher)
+        fetcher.db.close()
+        return result["added"]
+
+    scenarios = {
+        "PubMedClient.search_and_fetch": client_search_and_fetch,
+        "PubMedFetcher.update_research_database": fetcher_sync,
+        "research_pipeline.run_research_sync": pipeline_sync,
+    }
+
+    try:
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+    except ImportError:  # TestClient needs httpx
+        print("fastapi.testclient unavailable; skipping /api/library/search\n")
+        return scenarios
+
+    from concurrent.futures import ThreadPoolExecutor
+    from app.api import library
+
+    app = FastAPI()
+    app.include_router(library.router, prefix="/api/library")
+    http = TestClient(app)
+
+    def library_search():
+        def search(term):
+            response = http.get("/api/library/search", params={"query": term, "max_results": max_results})
+            response.raise_for_status()
+            return len(response.json())
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return sum(pool.map(search, terms))
+
+    scenarios["GET /api/library/search"] = library_search
+    return scenarios
+
+
+def run_benchmarks(args) -> Dict[str, Dict]:
+    """Start the mock server, run every scenario, and print a summary table"""
+    process, base_url = start_mock_server_process(
+        latency=args.latency, jitter=args.jitter,
+        rate_limit_rate=args.rate_limit_rate, error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate, hang_seconds=args.hang_seconds,
+        fixtures_dir=args.fixtures_dir, seed=args.seed,
+    )
+    workdir = tempfile.mkdtemp(prefix="research-benchmark-")
+    _configure_environment(base_url, workdir, args)
+
+    terms = [f"cancer AND benchmark term {i}" for i in range(args.queries)]
+    print(f"Mock E-utilities at {base_url} (latency {args.latency}s, "
+          f"429 {args.rate_limit_rate:.0%}, 5xx {args.error_rate:.0%}, timeouts {args.timeout_rate:.0%})")
+    print(f"{args.queries} queries x {args.max_results} results, "
+          f"{args.rate:g} req/s client limit, cache {'on' if args.cache else 'off'}\n")
+
+    results = {}
+    try:
+        for name, run in build_scenarios(terms, args.max_results, args.concurrency).items():
+            if args.only and args.only not in name:
+                continue
+            timing = _measure(run, trace_memory=False)
+            memory = _measure(run, trace_memory=True) if args.memory else {}
+            results[name] = {
+                "articles": timing["articles"],
+                "seconds": round(timing["seconds"], 3),
+                "articles_per_second": round(timing["articles"] / timing["seconds"], 1),
+                "peak_mb": round(memory["peak_mb"], 1) if memory else None,
+            }
+            peak = f"{memory['peak_mb']:8.1f} MB" if memory else "       -"
+            print(f"{name:42s} {timing['articles']:7d} articles  {timing['seconds']:7.2f}s  "
+                  f"{results[name]['articles_per_second']:9.1f}/s  peak {peak}")
+
+        server_stats = requests.get(f"{base_url}/_stats", timeout=5).json()
+        print(f"\nServer: {json.dumps(server_stats)}")
+    finally:
+        process.terminate()
+
+    return results
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmark research ingestion against mock E-utilities")
+    parser.add_argument("--queries", type=int, default=20, help="Distinct search terms")
+    parser.add_argument("--max-results", type=int, default=200, help="Results per search")
+    parser.add_argument("--rate", type=float, default=10, help="Client request rate limit (req/s)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Parallel API searches")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock response latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency (s)")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction answered 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction answered 5xx")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="Fraction that hang")
+    parser.add_argument("--hang-seconds", type=float, default=60.0, help="Hang length for timeouts")
+    parser.add_argument("--fixtures-dir", help="Recorded <pmid>.xml articles to serve")
+    parser.add_argument("--cache", action="store_true", help="Enable the E-utilities cache")
+    parser.add_argument("--no-memory", dest="memory", action="store_false",
+                        help="Skip the tracemalloc pass")
+    parser.add_argument("--only", help="Run scenarios whose name contains this text")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    main()
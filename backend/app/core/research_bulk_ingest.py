@@ -0,0 +1,172 @@
+"""
+Offline bulk ingest of PubMed baseline/update dumps for No Colon, Still Rollin'
+Streams local pubmedNNnXXXX.xml.gz files, keeps articles about our foods and
+cancer, and bulk-loads them into research_studies without touching the network
+
+    python src/main.py ingest-dumps ~/pubmed/baseline ~/pubmed/updatefiles --workers 8
+"""
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+import gzip
+import multiprocessing
+import os
+import time
+
+from database import Database
+from pubmed_fetcher import build_study_record
+from pubmed_xml import iter_pubmed_articles
+from research_indexing import on_studies_added, on_studies_removed, on_studies_updated
+from research_keywords import is_relevant, tag_study
+
+DUMP_PATTERNS = ("*.xml.gz", "*.xml")
+
+
+def find_dump_files(paths: Iterable[str]) -> List[Path]:
+    """
+    Expand files and directories into dump files, in PubMed file order
+
+    Baseline and update files are numbered, so sorting by name applies
+    updates after the baseline and in release order.
+    """
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            for pattern in DUMP_PATTERNS:
+                files.extend(path.glob(pattern))
+        elif path.exists():
+            files.append(path)
+        else:
+            raise FileNotFoundError(f"No such dump file or directory: {path}")
+    return sorted(set(files), key=lambda p: p.name)
+
+
+def ingest_dump_file(path: str) -> Dict:
+    """
+    Parse one dump file and build rows for the relevant articles
+
+    Runs in a worker process: the file is decompressed and parsed as a
+    stream, and only matching rows (a small fraction) are sent back.
+
+    Returns:
+        Dict with file_name, rows, deleted PMIDs and counts
+    """
+    start = time.perf_counter()
+    opener = gzip.open if str(path).endswith(".gz") else open
+    rows: List[Dict] = []
+    deleted: List[str] = []
+    articles = 0
+
+    with opener(path, "rb") as source:
+        for article in iter_pubmed_articles(source, deleted=deleted):
+            articles += 1
+            if not article["pubmed_id"]:
+                continue
+            tags = tag_study(article["title"], article["abstract"])
+            if is_relevant(tags):
+                rows.append(build_study_record(article, tags))
+
+    return {
+        "file_name": Path(path).name,
+        "rows": rows,
+        "deleted": deleted,
+        "articles": articles,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def bulk_ingest(paths: Iterable[str], workers: Optional[int] = None, force: bool = False,
+                db: Optional[Database] = None, write_chunk: int = 5000) -> Dict:
+    """
+    Ingest dump files in parallel and load the matches into research_studies
+
+    Files are parsed concurrently in a process pool; results are written
+    by this process in file order, so a citation revised in a later update
+    file overwrites the earlier version and DeleteCitation entries remove
+    it. Each file is recorded once written, so an interrupted run picks
+    up where it stopped.
+
+    Args:
+        paths: Dump files and/or directories of them
+        workers: Parser processes (default: CPU count)
+        force: Re-ingest files that were already loaded
+        db: Database to write to (default: Database())
+        write_chunk: Rows per upsert transaction
+
+    Returns:
+        Totals: files, articles, matched, deleted, elapsed_seconds
+    """
+    db = db or Database()
+    files = find_dump_files(paths)
+    if not force:
+        done = db.get_ingested_dump_files()
+        skipped = [f for f in files if f.name in done]
+        files = [f for f in files if f.name not in done]
+        if skipped:
+            print(f"⏭️  Skipping {len(skipped)} files already ingested (use --force to reload)")
+
+    workers = workers or os.cpu_count() or 1
+    totals = {"files": 0, "articles": 0, "matched": 0, "deleted": 0}
+    print(f"📦 Ingesting {len(files)} dump files with {workers} workers...\n")
+    start = time.perf_counter()
+
+    # Spawned workers, as in research_pipeline
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        # map() yields in submission (file) order while later files parse ahead
+        for result in pool.map(ingest_dump_file, [str(f) for f in files]):
+            rows = result["rows"]
+            revised = db.get_research_study_ids([row["pubmed_id"] for row in rows])
+            for i in range(0, len(rows), write_chunk):
+                db.upsert_research_studies(rows[i:i + write_chunk])
+            removed = 0
+            if result["deleted"]:
+                deleted_ids = db.get_research_study_ids(result["deleted"])
+                removed = db.delete_research_studies(result["deleted"])
+                on_studies_removed(db, deleted_ids.values())
+            on_studies_updated(db, revised.values())
+            on_studies_added(db)
+            db.record_ingested_dump_file(result["file_name"], result["articles"], len(rows), removed)
+
+            totals["files"] += 1
+            totals["articles"] += result["articles"]
+            totals["matched"] += len(rows)
+            totals["deleted"] += removed
+            elapsed = time.perf_counter() - start
+            print(f"  ✓ {result['file_name']}: {result['articles']:,} citations, "
+                  f"{len(rows):,} matched, {removed} deleted  "
+                  f"({result['seconds']:.1f}s; {totals['articles'] / elapsed:,.0f} citations/s overall)")
+
+    totals["elapsed_seconds"] = round(time.perf_counter() - start, 1)
+    print(f"\n✅ Bulk ingest complete in {totals['elapsed_seconds']}s")
+    print(f"   {totals['articles']:,} citations scanned, {totals['matched']:,} loaded, "
+          f"{totals['deleted']} deleted")
+    return totals
+
+
+def _write_synthetic_dump(path: Path, first_pmid: int, count: int, delete: List[int] = ()):
+    """A gzip dump of synthetic citations (mock_eutils articles), for the demo"""
+    from mock_eutils import synthetic_article
+
+    with gzip.open(path, "wt", encoding="utf-8") as out:
+        out.write('<?xml version="1.0" ?>\n<PubmedArticleSet>')
+        for pmid in range(first_pmid, first_pmid + count):
+            out.write(synthetic_article(str(pmid)))
+        if delete:
+            out.write("<DeleteCitation>" + "".join(f"<PMID>{p}</PMID>" for p in delete)
+                      + "</DeleteCitation>")
+        out.write("</PubmedArticleSet>")
+
+
+if __name__ == "__main__":
+    # Demo: four synthetic baseline files plus an update file, ingested twice
+    import tempfile
+
+    workdir = Path(tempfile.mkdtemp(prefix="pubmed-dumps-"))
+    for n in range(4):
+        _write_synthetic_dump(workdir / f"pubmed25n{n + 1:04d}.xml.gz", 1 + n * 25000, 25000)
+    _write_synthetic_dump(workdir / "pubmed25n0005.xml.gz", 200000, 1000, delete=[1, 2, 3])
+
+    demo_db = Database(str(workdir / "ingest.db"))
+    bulk_ingest([str(workdir)], db=demo_db)
+    print()
+    bulk_ingest([str(workdir)], db=demo_db)
@@ -0,0 +1,129 @@
+"""
+Derived research indexes for No Colon, Still Rollin'
+One place for write paths to report library changes, so every index
+built over research_studies stays current without rescanning the library
+
+Each index module provides:
+    index_new_studies(db)            studies added since it last ran
+    remove_studies(db, study_ids)    studies deleted (or about to be re-indexed)
+    reindex_studies(db, study_ids)   studies whose text or tags changed
+
+and, if it has library-wide statistics that drift as studies come and go:
+    needs_refresh(db)                a full recomputation is due
+    refresh(db)                      do it (slow; never run inside a request)
+
+The hooks above stay incremental. Full refreshes are left pending and run
+by refresh_stale_indexes, from the CLI or a background thread
+(schedule_refresh); the current index is served until a refresh commits.
+"""
+import logging
+import threading
+from types import ModuleType
+from typing import Dict, Iterable, List, Set
+
+import food_evidence
+import near_duplicates
+import related_studies
+import research_ranking
+
+logger = logging.getLogger(__name__)
+
+# Run in order; later indexes may read what earlier ones wrote (duplicate_of)
+INDEXES = [near_duplicates, research_ranking, related_studies, food_evidence]
+
+
+def _name(index) -> str:
+    return index.__name__.rsplit(".", 1)[-1]
+
+
+def on_studies_added(db) -> Dict[str, int]:
+    """Bring every index up to date after studies were inserted"""
+    results = {}
+    for index in INDEXES:
+        try:
+            results[_name(index)] = index.index_new_studies(db)
+        except Exception as e:
+            # Indexes are derived data; a failure must not fail the insert
+            logger.error(f"Updating {_name(index)} index failed: {e}")
+    return results
+
+
+def on_studies_removed(db, study_ids: Iterable[int]):
+    """Drop deleted studies from every index"""
+    study_ids = list(study_ids)
+    if not study_ids:
+        return
+    for index in INDEXES:
+        try:
+            index.remove_studies(db, study_ids)
+        except Exception as e:
+            logger.error(f"Removing studies from {_name(index)} index failed: {e}")
+
+
+def on_studies_updated(db, study_ids: Iterable[int]):
+    """Re-index studies that were overwritten in place (upserts)"""
+    study_ids = list(study_ids)
+    if not study_ids:
+        return
+    for index in INDEXES:
+        try:
+            index.reindex_studies(db, study_ids)
+        except Exception as e:
+            logger.error(f"Re-indexing {_name(index)} failed: {e}")
+
+
+def stale_indexes(db) -> List[ModuleType]:
+    """Indexes whose full refresh is due"""
+    return [index for index in INDEXES if hasattr(index, "needs_refresh") and index.needs_refresh(db)]
+
+
+def refresh_stale_indexes(db) -> Dict[str, Dict]:
+    """
+    Run every pending full refresh, then index studies saved meanwhile
+
+    Returns:
+        Each refreshed index's result, by index name
+    """
+    results = {}
+    for index in stale_indexes(db):
+        results[_name(index)] = index.refresh(db)
+    if results:
+        on_studies_added(db)
+    return results
+
+
+# Databases with a background refresh in flight
+_refreshing: Set[str] = set()
+_refreshing_lock = threading.Lock()
+
+
+def schedule_refresh(db):
+    """Start refresh_stale_indexes in a background thread if any index is stale (one per database)"""
+    try:
+        if not stale_indexes(db):
+            return
+    except Exception as e:
+        logger.error(f"Checking research indexes failed: {e}")
+        return
+    with _refreshing_lock:
+        if db.db_path in _refreshing:
+            return
+        _refreshing.add(db.db_path)
+
+    def run(db_path: str):
+        from database import Database
+
+        try:
+            refresh_db = Database(db_path, create_tables=False)
+            try:
+                results = refresh_stale_indexes(refresh_db)
+                logger.info(f"Refreshed research indexes: {results}")
+            finally:
+                refresh_db.close()
+        except Exception as e:
+            logger.error(f"Refreshing research indexes failed: {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(db_path)
+
+    threading.Thread(target=run, args=(db.db_path,), name="research-index-refresh", daemon=True).start()
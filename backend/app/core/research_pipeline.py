@@ -0,0 +1,377 @@
+"""
+Staged research ingest pipeline for No Colon, Still Rollin'
+fetch (asyncio) -> parse + extract (process pool) -> write (single batching writer)
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import multiprocessing
+import queue
+import threading
+import time
+
+from config import CANCER_SEARCH_TERMS, EFETCH_BATCH_SIZE, RESEARCH_PIPELINE_CONFIG
+from database import Database
+from pubmed_async import AsyncPubMedClient
+from pubmed_fetcher import INSERT_CHUNK_SIZE, PubMedFetcher, build_study_record
+from pubmed_xml import iter_pubmed_articles
+from research_indexing import on_studies_added
+
+# End-of-stream marker passed between stages
+_DONE = object()
+
+
+def parse_and_extract(xml: bytes) -> List[Dict]:
+    """Parse one efetch response and build research_studies rows (runs in a worker process)"""
+    return [
+        build_study_record(article)
+        for article in iter_pubmed_articles(xml)
+        if article["pubmed_id"]
+    ]
+
+
+class StageMetrics:
+    """Throughput counters for one pipeline stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.batches = 0
+        self.articles = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, articles: int, seconds: float, batches: int = 1):
+        with self._lock:
+            self.batches += batches
+            self.articles += articles
+            self.busy_seconds += seconds
+
+    def error(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self, elapsed: float) -> Dict:
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "articles": self.articles,
+                "errors": self.errors,
+                "busy_seconds": round(self.busy_seconds, 3),
+                "articles_per_second": round(self.articles / elapsed, 1) if elapsed else 0.0,
+            }
+
+
+class _StageQueue:
+    """Bounded queue that records its depth and gives up when the pipeline is cancelled"""
+
+    def __init__(self, name: str, maxsize: int, cancelled: threading.Event):
+        self.name = name
+        self._queue: "queue.Queue" = queue.Queue(maxsize=maxsize)
+        self._cancelled = cancelled
+        self.max_depth = 0
+
+    def put(self, item) -> bool:
+        """Block while full (backpressure); returns False if cancelled first"""
+        while not self._cancelled.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                self.max_depth = max(self.max_depth, self._queue.qsize())
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self):
+        """Next item, or _DONE once cancelled"""
+        while not self._cancelled.is_set():
+            try:
+                return self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+
+class ResearchIngestPipeline:
+    """
+    Fetch, parse/extract and write research studies concurrently
+
+    - Fetch: an asyncio loop issues efetch requests for PMID batches
+      concurrently, under the shared NCBI rate limiter and cache
+    - Parse + extract: XML parsing and keyword/dose extraction run in a
+      process pool, so CPU work never stalls the network stage. Syncs
+      smaller than pool_min_articles parse in-thread instead, since
+      spawning the pool costs more than it saves on them (see config)
+    - Write: one thread owns its own database connection and bulk-inserts
+      rows in chunks
+
+    Stages are joined by bounded queues, so a slow stage throttles the
+    ones before it instead of buffering without limit. cancel() stops
+    every stage promptly; failed batches are reported so a later sync can
+    retry them.
+    """
+
+    def __init__(self, fetcher: Optional[PubMedFetcher] = None,
+                 parse_workers: int = RESEARCH_PIPELINE_CONFIG["parse_workers"],
+                 queue_size: int = RESEARCH_PIPELINE_CONFIG["queue_size"],
+                 batch_size: int = EFETCH_BATCH_SIZE,
+                 write_chunk: int = INSERT_CHUNK_SIZE,
+                 pool_min_articles: int = RESEARCH_PIPELINE_CONFIG["pool_min_articles"]):
+        """
+        Args:
+            fetcher: Provides the PubMed client and database (default: PubMedFetcher())
+            parse_workers: Worker processes for parsing (0 parses in a thread)
+            queue_size: Capacity of each inter-stage queue
+            batch_size: PMIDs per efetch request
+            write_chunk: Rows per bulk insert
+            pool_min_articles: Fewest PMIDs worth starting the process pool for
+        """
+        self.fetcher = fetcher or PubMedFetcher()
+        self.parse_workers = parse_workers
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.write_chunk = write_chunk
+        self.pool_min_articles = pool_min_articles
+
+        self._cancelled = threading.Event()
+        self._reset()
+
+    def _reset(self):
+        self._cancelled.clear()
+        self.stages = {name: StageMetrics(name) for name in ("fetch", "parse", "write")}
+        self.raw_queue = _StageQueue("raw_xml", self.queue_size, self._cancelled)
+        self.row_queue = _StageQueue("rows", self.queue_size, self._cancelled)
+        self.failed: set = set()
+        self.added = 0
+        self.pool_workers = 0
+        self._started = None
+        self._finished = None
+
+    def cancel(self):
+        """Stop all stages; run() returns with whatever was written so far"""
+        self._cancelled.set()
+
+    def run(self, pmids: List[str]) -> Dict:
+        """
+        Ingest the given PMIDs through all stages
+
+        Args:
+            pmids: PubMed IDs to fetch and store (already deduplicated)
+
+        Returns:
+            Result counts and metrics (see metrics())
+        """
+        self._reset()
+        self._started = time.perf_counter()
+        batches = [pmids[i:i + self.batch_size] for i in range(0, len(pmids), self.batch_size)]
+
+        executor = self._parse_executor(len(pmids))
+
+        threads = [
+            threading.Thread(target=self._fetch_stage, args=(batches,), name="ingest-fetch", daemon=True),
+            threading.Thread(target=self._parse_stage, args=(executor,), name="ingest-parse", daemon=True),
+            threading.Thread(target=self._write_stage, name="ingest-write", daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.2)
+        except KeyboardInterrupt:
+            self.cancel()
+            for thread in threads:
+                thread.join()
+            raise
+        finally:
+            self._finished = time.perf_counter()
+
+        return self.metrics()
+
+    def _parse_executor(self, articles: int) -> Optional[ProcessPoolExecutor]:
+        """Process pool for the parse stage, or None to parse in-thread"""
+        if self.parse_workers <= 0 or articles < self.pool_min_articles:
+            return None
+        self.pool_workers = self.parse_workers
+        # Spawned (not forked) workers: forking while stage threads hold locks can deadlock
+        return ProcessPoolExecutor(
+            self.parse_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    # Stage 1: fetch
+
+    def _fetch_stage(self, batches: List[List[str]]):
+        try:
+            asyncio.run(self._fetch_all(batches))
+        finally:
+            self.raw_queue.put(_DONE)
+
+    async def _fetch_all(self, batches: List[List[str]]):
+        client = AsyncPubMedClient(self.fetcher.client)
+
+        async def fetch(batch: List[str]):
+            if self._cancelled.is_set():
+                self.failed.update(batch)
+                return
+            start = time.perf_counter()
+            try:
+                xml = await client.get_raw(
+                    "efetch.fcgi",
+                    {'id': ','.join(batch), 'rettype': 'medline', 'retmode': 'xml'},
+                    timeout=60, binary=True
+                )
+            except asyncio.CancelledError:
+                self.failed.update(batch)
+                raise
+            except Exception as e:
+                print(f"  ❌ Error fetching {len(batch)} articles: {e}")
+                self.stages["fetch"].error()
+                self.failed.update(batch)
+                return
+
+            self.stages["fetch"].record(len(batch), time.perf_counter() - start)
+            # Blocking put (backpressure) runs off the event loop
+            if not await asyncio.to_thread(self.raw_queue.put, (batch, xml)):
+                self.failed.update(batch)
+
+        tasks = [asyncio.create_task(fetch(batch)) for batch in batches]
+        pending = set(tasks)
+        while pending:
+            # Wake periodically so cancel() also stops batches still waiting for a slot
+            _, pending = await asyncio.wait(pending, timeout=0.2)
+            if self._cancelled.is_set():
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                break
+
+    # Stage 2: parse + extract
+
+    def _parse_stage(self, executor: Optional[ProcessPoolExecutor]):
+        in_flight: "deque[Tuple[List[str], object, float]]" = deque()
+        max_in_flight = max(1, self.pool_workers)
+
+        def finish_oldest():
+            batch, future, start = in_flight.popleft()
+            try:
+                rows = future.result() if executor else future()
+            except Exception as e:
+                print(f"  ❌ Error parsing {len(batch)} articles: {e}")
+                self.stages["parse"].error()
+                self.failed.update(batch)
+                return
+            self.stages["parse"].record(len(rows), time.perf_counter() - start)
+            if not self.row_queue.put((batch, rows)):
+                self.failed.update(batch)
+
+        try:
+            while True:
+                item = self.raw_queue.get()
+                if item is _DONE:
+                    break
+                batch, xml = item
+                if executor:
+                    future = executor.submit(parse_and_extract, xml)
+                else:
+                    future = (lambda body=xml: parse_and_extract(body))
+                in_flight.append((batch, future, time.perf_counter()))
+                if len(in_flight) >= max_in_flight:
+                    finish_oldest()
+
+            while in_flight and not self._cancelled.is_set():
+                finish_oldest()
+        finally:
+            for batch, _, _ in in_flight:
+                self.failed.update(batch)
+            if executor:
+                executor.shutdown(wait=True, cancel_futures=True)
+            self.row_queue.put(_DONE)
+
+    # Stage 3: write
+
+    def _write_stage(self):
+        db = Database(self.fetcher.db.db_path, create_tables=False)
+        chunk: List[Dict] = []
+        chunk_batches: List[List[str]] = []
+
+        def flush():
+            start = time.perf_counter()
+            try:
+                self.added += db.add_research_studies(chunk)
+                self.stages["write"].record(len(chunk), time.perf_counter() - start, len(chunk_batches))
+            except Exception as e:
+                print(f"  ❌ Error writing {len(chunk)} studies: {e}")
+                self.stages["write"].error()
+                for batch in chunk_batches:
+                    self.failed.update(batch)
+            chunk.clear()
+            chunk_batches.clear()
+
+        try:
+            while True:
+                item = self.row_queue.get()
+                if item is _DONE:
+                    break
+                batch, rows = item
+                chunk.extend(rows)
+                chunk_batches.append(batch)
+                if len(chunk) >= self.write_chunk:
+                    flush()
+            if chunk:
+                flush()
+        finally:
+            db.close()
+
+    def metrics(self) -> Dict:
+        """Result counts, per-stage throughput and queue depths"""
+        end = self._finished or time.perf_counter()
+        elapsed = end - self._started if self._started else 0.0
+        return {
+            "added": self.added,
+            "failed": len(self.failed),
+            "cancelled": self._cancelled.is_set(),
+            "elapsed_seconds": round(elapsed, 3),
+            "parse_workers": self.pool_workers,
+            "stages": {name: stage.snapshot(elapsed) for name, stage in self.stages.items()},
+            "queues": {
+                q.name: {"depth": q.depth(), "max_depth": q.max_depth, "capacity": self.queue_size}
+                for q in (self.raw_queue, self.row_queue)
+            },
+        }
+
+
+def run_research_sync(search_terms: List[str] = None, max_per_search: int = 20,
+                      full: bool = False, fetcher: Optional[PubMedFetcher] = None) -> Dict:
+    """
+    PubMedFetcher.update_research_database, with fetching and storing done by the pipeline
+
+    Uses the same watermarks and checkpoints, so the two are interchangeable.
+    """
+    fetcher = fetcher or PubMedFetcher()
+    search_terms = search_terms or CANCER_SEARCH_TERMS
+
+    print("🔬 Updating research database from PubMed (pipeline)...\n")
+    term_pmids = fetcher.collect_pmids(search_terms, max_per_search, full)
+    new_pmids = fetcher.new_pmids(term_pmids)
+    print(f"\n📚 {len(new_pmids)} new articles")
+
+    pipeline = ResearchIngestPipeline(fetcher)
+    result = pipeline.run(new_pmids)
+    if not result["cancelled"]:
+        fetcher.complete_sync(term_pmids, pipeline.failed)
+    if result["added"]:
+        on_studies_added(fetcher.db)
+
+    print(f"\n✅ Research update complete in {result['elapsed_seconds']:.1f}s!")
+    print(f"   Added: {result['added']} new studies")
+    for name, stage in result["stages"].items():
+        print(f"   {name:6s} {stage['articles']:6d} articles  {stage['articles_per_second']:8.1f}/s  "
+              f"busy {stage['busy_seconds']:.1f}s")
+    if result["failed"]:
+        print(f"   ⚠️  {result['failed']} articles could not be ingested; run again to resume")
+
+    return result
@@ -0,0 +1,400 @@
+"""
+Research relevance ranking for No Colon, Still Rollin'
+BM25 scores for every study against every food and cancer type, weighted
+by study type and kept in study_rankings, so "best evidence for ginger in
+colon cancer" is an index range scan
+
+The query for a food is the food and its compounds; for a cancer type,
+its terms (research_keywords), or the generic cancer terms for "general".
+Term counts are kept per study and term statistics are updated as
+studies come and go.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+import math
+import time
+
+from config import INDEX_BACKLOG_STUDIES, RESEARCH_RANKING_CONFIG
+from research_keywords import (
+    CANCER_TERMS, CANCER_TYPE_TERMS, DEFAULT_CANCER_TYPE, FOOD_COMPOUNDS, KeywordMatcher,
+)
+
+K1 = RESEARCH_RANKING_CONFIG["k1"]
+B = RESEARCH_RANKING_CONFIG["b"]
+RESCORE_GROWTH = RESEARCH_RANKING_CONFIG["rescore_growth"]
+
+# Multiplier on a study's score by strength of evidence (models.EvidenceLevel)
+STUDY_TYPE_WEIGHTS: Dict[str, float] = {
+    "meta_analysis": 1.6,
+    "human_clinical": 1.5,
+    "human_observational": 1.25,
+    "animal": 1.0,
+    "in_vitro": 0.75,
+}
+DEFAULT_STUDY_TYPE_WEIGHT = 1.0
+
+# Query terms per food and per cancer type
+FOOD_QUERY_TERMS: Dict[str, List[str]] = {
+    food: [food] + compounds for food, compounds in FOOD_COMPOUNDS.items()
+}
+CANCER_QUERY_TERMS: Dict[str, List[str]] = {
+    **CANCER_TYPE_TERMS, DEFAULT_CANCER_TYPE: CANCER_TERMS,
+}
+
+_VOCABULARY = sorted({term for terms in FOOD_QUERY_TERMS.values() for term in terms}
+                     | {term for terms in CANCER_QUERY_TERMS.values() for term in terms})
+_MATCHER = KeywordMatcher({"term": {term: [term] for term in _VOCABULARY}})
+
+
+def ranking_cancer_type(cancer_type: Optional[str]) -> str:
+    """Ranking label for a user's cancer type ("colorectal" -> "colon")"""
+    value = (cancer_type or "").strip().lower()
+    for label, terms in CANCER_TYPE_TERMS.items():
+        if value == label or value in terms:
+            return label
+    return DEFAULT_CANCER_TYPE
+
+
+def term_counts(title: Optional[str], abstract: Optional[str]) -> Tuple[Dict[str, int], int]:
+    """Query-vocabulary term frequencies and the word count of a study"""
+    text = f"{title or ''} {abstract or ''}"
+    return dict(_MATCHER.scan(text)["term"]), len(text.split())
+
+
+def _corpus(db) -> Tuple[int, int, int]:
+    row = db.conn.execute(
+        "SELECT documents, total_length, scored_documents FROM bm25_corpus WHERE id = 1"
+    ).fetchone()
+    return tuple(row) if row else (0, 0, 0)
+
+
+def _idf(documents: int, doc_freq: int) -> float:
+    return math.log(1 + (documents - doc_freq + 0.5) / (doc_freq + 0.5))
+
+
+def score_study(terms: Dict[str, int], length: int, study_type: Optional[str],
+                idf: Dict[str, float], avg_length: float) -> List[Tuple[str, str, float]]:
+    """
+    (food, cancer_type, score) for every food the study mentions
+
+    A study is ranked for a specific cancer type only if it mentions it;
+    every study about a food is ranked for "general".
+    """
+    norm = K1 * (1 - B + B * length / avg_length) if avg_length else K1
+    contribution = {
+        term: idf.get(term, 0.0) * tf * (K1 + 1) / (tf + norm) for term, tf in terms.items()
+    }
+    weight = STUDY_TYPE_WEIGHTS.get(study_type, DEFAULT_STUDY_TYPE_WEIGHT)
+
+    scores = []
+    for food, food_terms in FOOD_QUERY_TERMS.items():
+        food_score = sum(contribution.get(term, 0.0) for term in food_terms)
+        if not food_score:
+            continue
+        for cancer_type, cancer_terms in CANCER_QUERY_TERMS.items():
+            cancer_score = sum(contribution.get(term, 0.0) for term in cancer_terms)
+            if cancer_score or cancer_type == DEFAULT_CANCER_TYPE:
+                scores.append((food, cancer_type, weight * (food_score + cancer_score)))
+    return scores
+
+
+def _rankings(db, study_ids: Optional[List[int]] = None) -> List[Tuple[str, str, int, float]]:
+    """(food, cancer_type, study_id, score) rows for some studies (or all of them) from stored term counts"""
+    documents, total_length, _ = _corpus(db)
+    if not documents:
+        return []
+    idf = {term: _idf(documents, doc_freq)
+           for term, doc_freq in db.conn.execute("SELECT term, doc_freq FROM bm25_term_stats")}
+    avg_length = total_length / documents
+
+    query = """
+        SELECT d.study_id, d.length, r.study_type, t.term, t.tf
+        FROM bm25_documents d
+        JOIN research_studies r ON r.id = d.study_id
+        LEFT JOIN bm25_study_terms t ON t.study_id = d.study_id
+    """
+    if study_ids is None:
+        chunks = [None]
+    else:
+        chunks = [study_ids[i:i + 500] for i in range(0, len(study_ids), 500)]
+
+    batch = []
+    for chunk in chunks:
+        if chunk is None:
+            rows = db.conn.execute(query + " ORDER BY d.study_id")
+        else:
+            marks = ','.join('?' for _ in chunk)
+            rows = db.conn.execute(query + f" WHERE d.study_id IN ({marks}) ORDER BY d.study_id", chunk)
+
+        current, terms, length, study_type = None, {}, 0, None
+        for study_id, doc_length, doc_type, term, tf in rows:
+            if study_id != current:
+                if current is not None:
+                    batch.extend((food, cancer, current, score) for food, cancer, score
+                                 in score_study(terms, length, study_type, idf, avg_length))
+                current, terms, length, study_type = study_id, {}, doc_length, doc_type
+            if term is not None:
+                terms[term] = tf
+        if current is not None:
+            batch.extend((food, cancer, current, score) for food, cancer, score
+                         in score_study(terms, length, study_type, idf, avg_length))
+    return batch
+
+
+def _score(db, study_ids: List[int]):
+    """
+    Write study_rankings for some studies from stored term counts
+
+    The caller holds the transaction.
+    """
+    batch = _rankings(db, study_ids)
+    for start in range(0, len(study_ids), 500):
+        chunk = study_ids[start:start + 500]
+        db.conn.execute(f"DELETE FROM study_rankings WHERE study_id IN ({','.join('?' for _ in chunk)})", chunk)
+    db.conn.executemany(
+        "INSERT OR REPLACE INTO study_rankings (food, cancer_type, study_id, score) VALUES (?, ?, ?, ?)",
+        batch
+    )
+
+
+def _add_documents(db, rows: List[Tuple[int, str, str]]):
+    """Count terms for new studies and fold them into the corpus statistics"""
+    term_rows, doc_rows = [], []
+    doc_freq: Dict[str, int] = {}
+    total_length = 0
+    for study_id, title, abstract in rows:
+        terms, length = term_counts(title, abstract)
+        doc_rows.append((study_id, length))
+        term_rows.extend((study_id, term, tf) for term, tf in terms.items())
+        for term in terms:
+            doc_freq[term] = doc_freq.get(term, 0) + 1
+        total_length += length
+
+    db.conn.executemany("INSERT OR REPLACE INTO bm25_documents (study_id, length) VALUES (?, ?)", doc_rows)
+    db.conn.executemany("INSERT OR REPLACE INTO bm25_study_terms (study_id, term, tf) VALUES (?, ?, ?)",
+                        term_rows)
+    db.conn.executemany("""
+        INSERT INTO bm25_term_stats (term, doc_freq) VALUES (?, ?)
+        ON CONFLICT(term) DO UPDATE SET doc_freq = doc_freq + excluded.doc_freq
+    """, list(doc_freq.items()))
+    db.conn.execute("""
+        INSERT INTO bm25_corpus (id, documents, total_length) VALUES (1, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET documents = documents + excluded.documents,
+                                      total_length = total_length + excluded.total_length
+    """, (len(doc_rows), total_length))
+
+
+def _backlog(db) -> int:
+    """How far the highest counted id trails the highest study id"""
+    return db.conn.execute("""
+        SELECT (SELECT COALESCE(MAX(id), 0) FROM research_studies)
+             - (SELECT COALESCE(MAX(study_id), 0) FROM bm25_documents)
+    """).fetchone()[0]
+
+
+def needs_refresh(db) -> bool:
+    """
+    More than INDEX_BACKLOG_STUDIES studies are waiting to be counted, or
+    the library has grown or shrunk by more than RESCORE_GROWTH since
+    every score was refreshed
+    """
+    if _backlog(db) > INDEX_BACKLOG_STUDIES:
+        return True
+    documents, _, scored = _corpus(db)
+    return bool(documents) and abs(documents - scored) > scored * RESCORE_GROWTH
+
+
+def refresh(db) -> Dict:
+    """
+    Recompute every score with the current statistics (research_indexing.refresh_stale_indexes)
+
+    Studies waiting to be counted are counted first. Scores are computed
+    before the write transaction, so readers keep the current rankings
+    meanwhile. Only studies counted by then are replaced: ones added since
+    keep the scores they were given, and rows of studies removed since are
+    dropped.
+    """
+    start = time.perf_counter()
+    with db.conn:
+        _add_pending(db)
+    documents = _corpus(db)[0]
+    last_id = db.conn.execute("SELECT COALESCE(MAX(study_id), 0) FROM bm25_documents").fetchone()[0]
+    batch = [row for row in _rankings(db) if row[2] <= last_id]
+    with db.conn:
+        db.conn.execute("DELETE FROM study_rankings WHERE study_id <= ?", (last_id,))
+        db.conn.executemany(
+            "INSERT OR REPLACE INTO study_rankings (food, cancer_type, study_id, score) VALUES (?, ?, ?, ?)",
+            batch
+        )
+        db.conn.execute(
+            "DELETE FROM study_rankings WHERE study_id NOT IN (SELECT study_id FROM bm25_documents)"
+        )
+        db.conn.execute("UPDATE bm25_corpus SET scored_documents = ? WHERE id = 1", (documents,))
+    return {"studies": documents, "rankings": len(batch), "elapsed_seconds": round(time.perf_counter() - start, 2)}
+
+
+def index_new_studies(db, batch_size: int = 2000) -> int:
+    """
+    Count terms for studies added since the last call and rank them
+
+    New studies are scored with the current statistics, which costs only
+    their own rows; once the library has grown by more than RESCORE_GROWTH
+    since the last refresh, needs_refresh reports that all scores are due.
+    A backlog over INDEX_BACKLOG_STUDIES is left to refresh() as well, so
+    an insert never counts the whole library.
+
+    Returns:
+        Number of studies added to the ranking
+    """
+    if _backlog(db) > INDEX_BACKLOG_STUDIES:
+        return 0
+    with db.conn:
+        new_ids = _add_pending(db, batch_size)
+        if new_ids:
+            _score(db, new_ids)
+            if not _corpus(db)[2]:
+                # First run: every study was just scored
+                db.conn.execute("UPDATE bm25_corpus SET scored_documents = documents WHERE id = 1")
+    return len(new_ids)
+
+
+def _add_pending(db, batch_size: int = 2000) -> List[int]:
+    """Count terms for every study above the watermark (caller holds the transaction)"""
+    new_ids: List[int] = []
+    last_id = db.conn.execute("SELECT COALESCE(MAX(study_id), 0) FROM bm25_documents").fetchone()[0]
+    while True:
+        rows = db.conn.execute(
+            "SELECT id, title, abstract FROM research_studies WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, batch_size)
+        ).fetchall()
+        if not rows:
+            return new_ids
+        _add_documents(db, [tuple(row) for row in rows])
+        new_ids.extend(row[0] for row in rows)
+        last_id = rows[-1][0]
+
+
+def remove_studies(db, study_ids: Iterable[int]):
+    """Take studies out of the term statistics and the rankings"""
+    study_ids = list(study_ids)
+    with db.conn:
+        for start in range(0, len(study_ids), 500):
+            chunk = study_ids[start:start + 500]
+            marks = ','.join('?' for _ in chunk)
+            doc_freq = db.conn.execute(
+                f"SELECT term, COUNT(*) FROM bm25_study_terms WHERE study_id IN ({marks}) GROUP BY term",
+                chunk
+            ).fetchall()
+            documents, total_length = db.conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM bm25_documents WHERE study_id IN ({marks})",
+                chunk
+            ).fetchone()
+
+            db.conn.executemany("UPDATE bm25_term_stats SET doc_freq = doc_freq - ? WHERE term = ?",
+                                [(count, term) for term, count in doc_freq])
+            db.conn.execute("""
+                UPDATE bm25_corpus SET documents = documents - ?, total_length = total_length - ?
+                WHERE id = 1
+            """, (documents, total_length))
+            for table in ("bm25_study_terms", "bm25_documents", "study_rankings"):
+                db.conn.execute(f"DELETE FROM {table} WHERE study_id IN ({marks})", chunk)
+
+
+def reindex_studies(db, study_ids: Iterable[int]) -> int:
+    """Recount and re-rank studies whose text or study type changed"""
+    watermark = db.conn.execute("SELECT COALESCE(MAX(study_id), 0) FROM bm25_documents").fetchone()[0]
+    study_ids = [study_id for study_id in study_ids if study_id <= watermark]
+    if not study_ids:
+        return 0
+    remove_studies(db, study_ids)
+
+    with db.conn:
+        for start in range(0, len(study_ids), 500):
+            chunk = study_ids[start:start + 500]
+            rows = db.conn.execute(
+                f"SELECT id, title, abstract FROM research_studies WHERE id IN ({','.join('?' for _ in chunk)})",
+                chunk
+            ).fetchall()
+            _add_documents(db, [tuple(row) for row in rows])
+        _score(db, study_ids)
+    return len(study_ids)
+
+
+def rebuild_rankings(db=None) -> Dict:
+    """Recount every study and recompute all rankings from scratch"""
+    from database import Database
+
+    db = db or Database()
+    start = time.perf_counter()
+    with db.conn:
+        for table in ("bm25_study_terms", "bm25_documents", "bm25_term_stats", "bm25_corpus",
+                      "study_rankings"):
+            db.conn.execute(f"DELETE FROM {table}")
+    studies = index_new_studies(db)
+    rows = db.conn.execute("SELECT COUNT(*) FROM study_rankings").fetchone()[0]
+    return {"studies": studies, "rankings": rows, "elapsed_seconds": round(time.perf_counter() - start, 2)}
+
+
+def _rank_by_scan(db, food: str, cancer_type: str, limit: int) -> List[Tuple[int, float]]:
+    """The same ranking computed per request from the text (benchmark baseline)"""
+    rows = db.conn.execute(
+        "SELECT id, title, abstract, study_type FROM research_studies WHERE duplicate_of IS NULL"
+    ).fetchall()
+    counted = [(row[0], row[3], *term_counts(row[1], row[2])) for row in rows]
+    documents = len(counted)
+    avg_length = sum(length for *_, length in counted) / documents
+    doc_freq: Dict[str, int] = {}
+    for *_, terms, _ in counted:
+        for term in terms:
+            doc_freq[term] = doc_freq.get(term, 0) + 1
+    idf = {term: _idf(documents, df) for term, df in doc_freq.items()}
+
+    scored = []
+    for study_id, study_type, terms, length in counted:
+        for f, c, score in score_study(terms, length, study_type, idf, avg_length):
+            if f == food and c == cancer_type:
+                scored.append((study_id, score))
+    return sorted(scored, key=lambda item: -item[1])[:limit]
+
+
+if __name__ == "__main__":
+    # Benchmark: rank a synthetic library, add to it, and compare lookups with rescoring
+    import io
+    import sys
+    import tempfile
+    from pathlib import Path
+
+    from database import Database
+    from mock_eutils import synthetic_article
+    from pubmed_fetcher import build_study_record
+    from pubmed_xml import iter_pubmed_articles
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    workdir = Path(tempfile.mkdtemp(prefix="research-ranking-"))
+    bench_db = Database(str(workdir / "library.db"))
+
+    xml = "<PubmedArticleSet>" + "".join(synthetic_article(str(p)) for p in range(1, count + 1001)) \
+          + "</PubmedArticleSet>"
+    studies = [build_study_record(a) for a in iter_pubmed_articles(io.BytesIO(xml.encode()))]
+    bench_db.add_research_studies(studies[:count])
+
+    result = rebuild_rankings(bench_db)
+    print(f"rebuild_rankings: {count:,} studies -> {result['rankings']:,} rankings "
+          f"in {result['elapsed_seconds']}s")
+
+    t = time.perf_counter()
+    bench_db.add_research_studies(studies[count:])
+    index_new_studies(bench_db)
+    print(f"index_new_studies: 1,000 new studies in {time.perf_counter() - t:.2f}s")
+
+    t = time.perf_counter()
+    for _ in range(200):
+        top = bench_db.get_top_research_for_food("Ginger", "colon", limit=20)
+    lookup_ms = (time.perf_counter() - t) / 200 * 1000
+
+    t = time.perf_counter()
+    scanned = _rank_by_scan(bench_db, "ginger", "colon", 20)
+    scan_ms = (time.perf_counter() - t) * 1000
+
+    overlap = len({row["id"] for row in top} & {study_id for study_id, _ in scanned})
+    print(f"top-20 ginger/colon: indexed lookup {lookup_ms:.2f} ms, rescoring pass {scan_ms:.0f} ms "
+          f"({overlap}/20 studies in common; new studies are scored with pre-insert statistics)")
@@ -0,0 +1,113 @@
+"""
+Request coalescing for expensive operations in No Colon, Still Rollin'
+Concurrent callers with the same key share one in-flight computation
+"""
+from typing import Any, Callable, Dict, Hashable, Optional
+import threading
+
+
+class _Call:
+    """One in-flight computation and its outcome"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesce duplicate concurrent calls
+
+    The first caller for a key runs the function; callers that arrive
+    while it is running wait and receive the same result (or exception).
+    Once the call finishes the key is forgotten, so later calls run again.
+    Results are shared, so callers must treat them as read-only.
+    """
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.executions = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) once per key across concurrent callers
+
+        Args:
+            key: Identifies duplicate work (e.g. ("protocol", user_id, date))
+            fn: Function to run
+
+        Returns:
+            fn's result, from this call or from the in-flight one
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.shared += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict:
+        """Execution and sharing counters for monitoring"""
+        with self._lock:
+            return {
+                "executions": self.executions,
+                "shared": self.shared,
+                "in_flight": len(self._calls),
+            }
+
+
+def demo_single_flight():
+    """Show that overlapping callers trigger a single computation"""
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    flight = SingleFlight("demo")
+    computations = []
+
+    def expensive(user_id):
+        computations.append(user_id)
+        time.sleep(0.2)
+        return {"user_id": user_id}
+
+    barrier = threading.Barrier(8)
+
+    def caller(_):
+        barrier.wait()
+        return flight.do(("protocol", 1, "2025-01-01"), expensive, 1)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(caller, range(8)))
+
+    print(f"Callers: {len(results)}")
+    print(f"Computations: {len(computations)}")
+    print(f"All callers got the same result: {all(r is results[0] for r in results)}")
+    print(f"Stats: {flight.stats()}")
+
+
+if __name__ == "__main__":
+    demo_single_flight()
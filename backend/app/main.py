@@ -7,6 +7,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 import os
+import sys
 import logging
 
 # Configure logging
@@ -61,6 +62,16 @@ async def startup_event():
         # Don't fail startup - allow the app to run even if seeding fails
         # The database tables will still be created
 
+@app.on_event("startup")
+def start_services():
+    """Start process-scoped services shared across requests"""
+    start_protocol_service(pregenerate=PREGENERATION_CONFIG["enabled"])
+
+@app.on_event("shutdown")
+def stop_services():
+    """Release pooled connections held by shared services"""
+    stop_protocol_service()
+
 # CORS middleware - allow development and Replit domains
 origins_env = os.getenv("CORS_ORIGINS", "")
 if origins_env:
@@ -84,6 +95,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Core modules use flat imports, same as the API routers
+sys.path.insert(0, str(Path(__file__).parent / "core"))
+
+from config import PREGENERATION_CONFIG
+from protocol_service import start_protocol_service, stop_protocol_service
+
 # Include API routers
 from app.api import protocol, weight, compliance, foods, status, library, exports, health_photos, medications, hydration
 
@@ -38,6 +38,43 @@ class FoodResponse(BaseModel):
     evidence_level: str
     pubmed_ids: List[str]
 
+class FoodCreateRequest(BaseModel):
+    """New food for the database"""
+    name: str
+    common_names: List[str] = []
+    active_compounds: List[ActiveCompound] = []
+    net_carbs_per_100g: float = 0
+    protein_per_100g: float = 0
+    fat_per_100g: float = 0
+    fiber_per_100g: float = 0
+    cancer_types: List[str] = []
+    mechanisms: List[str] = []
+    best_preparation: str = "raw"
+    preparation_notes: str = ""
+    max_daily_amount_grams: float = 1000
+    side_effects: List[str] = []
+    contraindications: List[str] = []
+    evidence_level: str = "in_vitro"
+    pubmed_ids: List[str] = []
+
+class FoodUpdateRequest(BaseModel):
+    """Changed fields of an existing food (omitted fields are left as they are)"""
+    common_names: Optional[List[str]] = None
+    active_compounds: Optional[List[ActiveCompound]] = None
+    net_carbs_per_100g: Optional[float] = None
+    protein_per_100g: Optional[float] = None
+    fat_per_100g: Optional[float] = None
+    fiber_per_100g: Optional[float] = None
+    cancer_types: Optional[List[str]] = None
+    mechanisms: Optional[List[str]] = None
+    best_preparation: Optional[str] = None
+    preparation_notes: Optional[str] = None
+    max_daily_amount_grams: Optional[float] = None
+    side_effects: Optional[List[str]] = None
+    contraindications: Optional[List[str]] = None
+    evidence_level: Optional[str] = None
+    pubmed_ids: Optional[List[str]] = None
+
 class FoodListResponse(BaseModel):
     """List of foods"""
     foods: List[FoodResponse]
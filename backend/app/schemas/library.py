@@ -1,6 +1,6 @@
 """Schemas for research library API"""
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 
 class SearchRequest(BaseModel):
@@ -33,6 +33,38 @@ class ResearchStudyResponse(BaseModel):
     doi: Optional[str] = ""
     url: Optional[str] = ""
     saved: Optional[bool] = False
+    relevance_score: Optional[float] = None
 
     class Config:
         from_attributes = True
+
+
+class BatchDoseCalculatorRequest(BaseModel):
+    """Columns of studies to convert; each list has one entry per study or a single shared value"""
+    study_dose_mg_kg: List[float]
+    study_type: List[str]  # "mouse", "rat", "rabbit", "dog", "monkey", "human", "petri_dish"
+    compound_per_100g_food: List[float]
+    human_weight_kg: List[float] = [70]
+
+
+class BatchDoseCalculatorResponse(BaseModel):
+    """Columnar conversions, one entry per study (null where the study could not be converted)"""
+    conversion_factor: List[Optional[float]]
+    hed_mg_kg: List[Optional[float]]
+    total_mg: List[Optional[float]]
+    conservative_hed_mg_kg: List[Optional[float]]
+    conservative_total_mg: List[Optional[float]]
+    grams: List[Optional[float]]
+    conservative_grams: List[Optional[float]]
+    error: List[Optional[str]]
+
+
+class LibraryDosesResponse(BatchDoseCalculatorResponse):
+    """Every dosed study in the library converted for one body weight"""
+    human_weight_kg: float
+    pubmed_id: List[str]
+    food: List[str]
+    compound: List[Optional[str]]
+    study_dose_mg_kg: List[float]
+    study_type: List[str]
+    compound_per_100g: List[float]
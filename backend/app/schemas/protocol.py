@@ -48,3 +48,36 @@ class GenerateProtocolRequest(BaseModel):
     user_id: int = Field(default=1, description="User ID (default: Jesse Mills)")
     weight_lbs: Optional[float] = Field(None, description="Current weight in pounds")
     target_date: Optional[str] = Field(None, description="Date for protocol (YYYY-MM-DD)")
+
+class SimulateProtocolRequest(BaseModel):
+    """Request to simulate protocols across a weight range"""
+    user_id: int = Field(default=1, description="User ID (default: Jesse Mills)")
+    min_weight_lbs: float = Field(..., gt=0, description="Lowest weight to simulate")
+    max_weight_lbs: float = Field(..., gt=0, description="Highest weight to simulate")
+    step_lbs: float = Field(default=1.0, gt=0, description="Weight increment")
+
+class SimulatedFoodColumns(BaseModel):
+    """One food's values across the simulated weights"""
+    name: str
+    amount_grams: List[float]
+    servings_per_day: List[int]
+    grams_per_serving: List[float]
+    timing: List[str]
+
+class SimulateProtocolResponse(BaseModel):
+    """Columnar simulation results, one entry per weight"""
+    user_id: int
+    weights_lbs: List[float]
+
+    # Foods
+    foods: List[SimulatedFoodColumns]
+
+    # Totals
+    total_net_carbs: List[float]
+    total_protein: List[float]
+    total_fat: List[float]
+    total_calories: List[float]
+
+    # Keto compatibility
+    keto_compatible: List[bool]
+    keto_score: List[float]
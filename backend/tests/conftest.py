@@ -0,0 +1,23 @@
+"""Test setup: core modules use flat imports, same as the API and CLI"""
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND))
+sys.path.insert(0, str(BACKEND / "app" / "core"))
+
+
+@pytest.fixture
+def seeded_db_path(tmp_path):
+    """A fresh database with the seed foods and the default user"""
+    from app.core.init_database import create_jesse_user, seed_foods
+    from database import Database
+
+    path = str(tmp_path / "test.db")
+    db = Database(path)
+    seed_foods(db)
+    create_jesse_user(db)
+    db.close()
+    return path
@@ -0,0 +1,87 @@
+"""Eviction and stale fallback in eutils_cache.EUtilsCache"""
+import pytest
+import requests
+
+from circuit_breaker import CircuitBreaker
+from eutils_cache import EUtilsCache
+from pubmed_client import PubMedClient
+from rate_limiter import TokenBucket
+
+
+def _cache(path, max_bytes=1 << 20, ttl=3600):
+    return EUtilsCache({
+        "path": str(path), "max_bytes": max_bytes,
+        "ttl_seconds": {}, "default_ttl_seconds": ttl,
+    })
+
+
+def _cached(cache, *ids):
+    return [i for i in ids if cache.get("efetch.fcgi", {"id": i}) is not None]
+
+
+def test_evicts_least_recently_used_first(tmp_path):
+    cache = _cache(tmp_path / "cache.db", max_bytes=30)
+    for i in ("1", "2", "3"):
+        cache.put("efetch.fcgi", {"id": i}, "x" * 10)
+    cache.get("efetch.fcgi", {"id": "1"})  # now more recent than 2 and 3
+
+    cache.put("efetch.fcgi", {"id": "4"}, "x" * 10)
+
+    assert _cached(cache, "1", "2", "3", "4") == ["1", "3", "4"]
+    assert cache.stats()["evictions"] == 1
+    cache.close()
+
+
+def test_size_is_shared_between_processes(tmp_path):
+    # Two connections stand in for the API and a CLI sync on the same file
+    api = _cache(tmp_path / "cache.db", max_bytes=50)
+    cli = _cache(tmp_path / "cache.db", max_bytes=50)
+
+    for i in range(3):
+        api.put("efetch.fcgi", {"id": f"api{i}"}, "x" * 10)
+        cli.put("efetch.fcgi", {"id": f"cli{i}"}, "x" * 10)
+
+    assert api.stats()["size_bytes"] == cli.stats()["size_bytes"] == 50
+    assert _cached(api, "api0") == []
+    api.close()
+    cli.close()
+
+
+def test_replacing_an_entry_counts_its_new_size_only(tmp_path):
+    cache = _cache(tmp_path / "cache.db", max_bytes=25)
+    cache.put("efetch.fcgi", {"id": "1"}, "x" * 10)
+    cache.put("efetch.fcgi", {"id": "2"}, "x" * 10)
+
+    cache.put("efetch.fcgi", {"id": "1"}, "x" * 12)
+
+    assert cache.stats()["size_bytes"] == 22
+    assert cache.stats()["evictions"] == 0
+    cache.close()
+
+
+class FailingSession:
+    def get(self, url, params=None, timeout=None):
+        raise requests.ConnectionError("NCBI unreachable")
+
+
+@pytest.fixture
+def offline_client(tmp_path):
+    cache = _cache(tmp_path / "cache.db", ttl=0)  # every entry is already expired
+    client = PubMedClient(
+        email="test@example.com", rate_limiter=TokenBucket(1000), cache=cache,
+        session=FailingSession(), circuit_breaker=CircuitBreaker("test", 5, 30), max_retries=0,
+    )
+    yield client
+    cache.close()
+
+
+def test_expired_entry_is_served_when_ncbi_is_unreachable(offline_client):
+    offline_client.cache.put("esearch.fcgi", {"term": "ginger"}, '{"esearchresult": {}}')
+
+    assert offline_client.get_raw("esearch.fcgi", {"term": "ginger"}) == '{"esearchresult": {}}'
+    assert offline_client.cache.stats()["stale_hits"] == 1
+
+
+def test_failure_without_a_cached_entry_raises(offline_client):
+    with pytest.raises(requests.RequestException):
+        offline_client.get_raw("esearch.fcgi", {"term": "garlic"})
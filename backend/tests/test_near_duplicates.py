@@ -0,0 +1,22 @@
+"""Thread safety of the token hash cache in near_duplicates"""
+from concurrent.futures import ThreadPoolExecutor
+import zlib
+
+import numpy as np
+
+import near_duplicates
+
+
+def test_hash_tokens_survives_concurrent_clears(monkeypatch):
+    # A tiny bound makes every thread clear the shared cache constantly
+    monkeypatch.setattr(near_duplicates, "_TOKEN_HASH_CACHE_SIZE", 8)
+    monkeypatch.setattr(near_duplicates, "_token_hashes", {})
+
+    def hash_batch(seed):
+        tokens = [f"token{seed}_{i}" for i in range(200)]
+        for _ in range(50):
+            hashed = near_duplicates._hash_tokens(tokens)
+        return np.array_equal(hashed, [zlib.crc32(token.encode()) for token in tokens])
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        assert all(pool.map(hash_batch, range(32)))
@@ -0,0 +1,17 @@
+"""Weight ranges for POST /api/protocol/simulate"""
+import pytest
+
+from app.api.protocol import _weight_count
+
+
+@pytest.mark.parametrize("min_lbs, max_lbs, step, expected", [
+    (150, 160, 3, 4),      # 150, 153, 156, 159 - never past the maximum
+    (150, 160, 1, 11),     # maximum included when it is on the grid
+    (140, 200, 1, 61),
+    (150.0, 150.3, 0.1, 4),  # 0.3 / 0.1 is 2.9999999999999996 in floating point
+    (150, 150, 5, 1),
+])
+def test_weight_count_stays_within_range(min_lbs, max_lbs, step, expected):
+    count = _weight_count(min_lbs, max_lbs, step)
+    assert count == expected
+    assert min_lbs + (count - 1) * step <= max_lbs + 1e-6
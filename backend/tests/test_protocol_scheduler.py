@@ -0,0 +1,122 @@
+"""Weigh-in driven regeneration and shutdown of protocol_scheduler.ProtocolPregenerator"""
+from datetime import date, datetime, timedelta
+import threading
+import time
+
+import pytest
+
+from database import Database
+from protocol_service import ProtocolService
+
+TOMORROW = date.today() + timedelta(days=1)
+
+
+@pytest.fixture
+def service(seeded_db_path):
+    service = ProtocolService(pool_size=1, db_path=seeded_db_path)
+    generated = []
+    generate = service.generate_for_user
+
+    def counting(user_id, weight_lbs=None, target_date=None):
+        generated.append((user_id, target_date))
+        return generate(user_id, weight_lbs=weight_lbs, target_date=target_date)
+
+    service.generate_for_user = counting
+    service.generated = generated
+    yield service
+    service.close()
+
+
+def _record_weight(path, weight_lbs):
+    # As the CLI does, from its own connection and without notifying the API
+    db = Database(path)
+    db.add_weight_record(1, weight_lbs)
+    db.close()
+
+
+def test_weigh_in_after_last_run_regenerates_tomorrow(service, seeded_db_path):
+    scheduler = service.pregenerator
+    scheduler._started_at = datetime.now() - timedelta(minutes=1)
+    _record_weight(seeded_db_path, 172.0)
+
+    scheduler._regenerate_after_new_weights()
+
+    assert service.generated == [(1, TOMORROW.isoformat())]
+    with service.pool.connection() as db:
+        assert db.get_protocol_for_date(1, TOMORROW.isoformat())['weight_lbs'] == 172.0
+    assert (1, TOMORROW) in scheduler.last_run
+
+
+def test_no_regeneration_without_a_newer_weigh_in(service, seeded_db_path):
+    scheduler = service.pregenerator
+    scheduler._started_at = datetime.now() - timedelta(minutes=1)
+    _record_weight(seeded_db_path, 172.0)
+    scheduler._regenerate_after_new_weights()
+
+    scheduler._regenerate_after_new_weights()
+
+    assert len(service.generated) == 1
+
+
+def test_weigh_ins_before_start_are_left_alone(service, seeded_db_path):
+    _record_weight(seeded_db_path, 172.0)
+    service.pregenerator._started_at = datetime.now() + timedelta(minutes=1)
+
+    service.pregenerator._regenerate_after_new_weights()
+
+    assert service.generated == []
+
+
+def _idle_scheduler(service):
+    """Started with nothing to catch up on, so it sits in its (300s) poll wait"""
+    scheduler = service.pregenerator
+    scheduler.config = dict(scheduler.config, poll_seconds=300, active_days=-1)
+    scheduler.start()
+    return scheduler
+
+
+def test_stop_wakes_the_poll_wait(service):
+    scheduler = _idle_scheduler(service)
+    time.sleep(0.1)
+
+    start = time.perf_counter()
+    assert scheduler.stop()
+
+    assert time.perf_counter() - start < 1
+    assert not scheduler.running
+
+
+def test_stop_during_generation_keeps_one_thread(service):
+    scheduler = _idle_scheduler(service)
+    release = threading.Event()
+    service.generate_for_user = lambda user_id, target_date=None: release.wait(5)
+    scheduler.request_generation(1, TOMORROW)
+    time.sleep(0.1)
+
+    assert not scheduler.stop(timeout=0.1)
+    old_thread = scheduler._thread
+    assert old_thread.is_alive()
+
+    # start() waits for the stopping thread instead of running a second one
+    threading.Timer(0.2, release.set).start()
+    scheduler.start()
+    assert not old_thread.is_alive()
+    assert [thread.name for thread in threading.enumerate()].count("protocol-pregenerator") == 1
+
+
+def test_close_waits_for_generation_before_closing_the_pool(service):
+    scheduler = _idle_scheduler(service)
+    finished = []
+
+    def slow_generate(user_id, target_date=None):
+        time.sleep(0.3)
+        finished.append(user_id)
+
+    service.generate_for_user = slow_generate
+    scheduler.request_generation(1, TOMORROW)
+    time.sleep(0.1)
+
+    service.close()
+
+    assert finished == [1]
+    assert not scheduler.running
@@ -0,0 +1,61 @@
+"""Incremental protocol updates in protocol_service.ProtocolService"""
+from datetime import date
+
+import pytest
+
+from database import Database
+from protocol_service import ProtocolService
+
+TODAY = date.today().isoformat()
+
+
+@pytest.fixture
+def service(seeded_db_path):
+    service = ProtocolService(pool_size=1, db_path=seeded_db_path)
+    service.generate_for_user(1, target_date=TODAY)
+    yield service
+    service.close()
+
+
+def _saved(service):
+    with service.pool.connection() as db:
+        return db.get_protocol_for_date(1, TODAY)
+
+
+def test_added_food_joins_saved_protocol(service, seeded_db_path):
+    before = _saved(service)
+    version = service.catalog.version
+
+    db = Database(seeded_db_path)
+    db.add_food({"name": "Test Sprouts", "active_compounds": [], "mechanisms": [],
+                 "net_carbs_per_100g": 2.0, "cancer_types": ["colon"], "max_daily_amount_grams": 100})
+    db.close()
+
+    assert service.apply_food_change("Test Sprouts") == 1
+    after = _saved(service)
+    added = next(f for f in after['foods'] if f['name'] == "Test Sprouts")
+    assert len(after['foods']) == len(before['foods']) + 1
+    assert after['total_net_carbs'] == pytest.approx(
+        before['total_net_carbs'] + added['amount_grams'] * 2.0 / 100, abs=0.1
+    )
+    assert service.catalog.version == version + 1
+
+
+def test_food_that_no_longer_applies_leaves_saved_protocol(service, seeded_db_path):
+    before = _saved(service)
+    food = before['foods'][0]['name']
+
+    db = Database(seeded_db_path)
+    assert db.update_food(food, {"cancer_types": ["lung"]})
+    db.close()
+
+    assert service.apply_food_change(food) == 1
+    after = _saved(service)
+    assert food not in [f['name'] for f in after['foods']]
+    assert len(after['foods']) == len(before['foods']) - 1
+
+
+def test_update_food_reports_missing_food(seeded_db_path):
+    db = Database(seeded_db_path)
+    assert not db.update_food("No Such Food", {"fat_per_100g": 1.0})
+    db.close()
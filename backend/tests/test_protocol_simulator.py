@@ -0,0 +1,58 @@
+"""protocol_simulator.ProtocolSimulator against ProtocolGenerator, one weight at a time"""
+import numpy as np
+import pytest
+
+from database import Database
+from protocol_generator import ProtocolGenerator
+from protocol_simulator import ProtocolSimulator
+
+# Research-derived doses (food, compound, conservative HED mg/kg), so those foods scale with weight
+EVIDENCE = [("turmeric", "curcumin", 1.7), ("ginger", "gingerol", 0.9), ("broccoli", "sulforaphane", 0.35)]
+WEIGHTS = np.round(np.arange(100.0, 260.0, 0.7), 1).tolist()
+
+
+@pytest.fixture
+def generator(seeded_db_path):
+    db = Database(seeded_db_path)
+    db.conn.executemany("""
+        INSERT INTO food_evidence_summary
+            (food, studies, study_type_counts, dose_studies, dose_compound, conservative_hed_median_mg_kg)
+        VALUES (?, 10, '{}', 5, ?, ?)
+    """, EVIDENCE)
+    db.conn.commit()
+    yield ProtocolGenerator(db)
+    db.close()
+
+
+def test_simulation_matches_generated_protocols(generator, capsys):
+    result = ProtocolSimulator(generator).simulate(1, WEIGHTS)
+    foods = {food["name"]: food for food in result["foods"]}
+    assert {name.lower() for name in foods} >= {food for food, _, _ in EVIDENCE}
+
+    mismatches = []
+    for i, weight in enumerate(WEIGHTS):
+        protocol = generator.generate_daily_protocol(weight_lbs=weight)
+        expected = {
+            "amounts": {food["name"]: food["amount_grams"] for food in protocol["foods"]},
+            "totals": [protocol[key] for key in ("total_net_carbs", "total_protein", "total_fat",
+                                                 "total_calories", "keto_compatible", "keto_score")],
+        }
+        actual = {
+            "amounts": {name: food["amount_grams"][i] for name, food in foods.items()},
+            "totals": [result[key][i] for key in ("total_net_carbs", "total_protein", "total_fat",
+                                                  "total_calories", "keto_compatible", "keto_score")],
+        }
+        if actual != expected:
+            mismatches.append((weight, expected, actual))
+
+    assert mismatches == []
+
+
+def test_evidence_is_read_once_per_food(generator):
+    statements = []
+    generator.db.conn.set_trace_callback(statements.append)
+
+    result = ProtocolSimulator(generator).simulate(1, WEIGHTS)
+
+    evidence_reads = [s for s in statements if "FROM food_evidence_summary" in s]
+    assert len(evidence_reads) == len(result["foods"])
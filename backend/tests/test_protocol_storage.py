@@ -0,0 +1,91 @@
+"""Content-addressed protocol storage in database.Database"""
+import json
+
+import pytest
+
+from database import Database
+
+DATE = "2026-01-15"
+FOODS = [{"name": "Ginger", "amount_grams": 4.0}]
+OTHER_FOODS = [{"name": "Garlic", "amount_grams": 10.0}]
+
+
+@pytest.fixture
+def db(seeded_db_path):
+    db = Database(seeded_db_path)
+    db.create_user({"name": "Second User", "cancer_type": "colon", "current_weight_lbs": 150})
+    yield db
+    db.close()
+
+
+def _save(db, user_id, foods, weight_lbs=170.0):
+    return db.save_daily_protocol({
+        "user_id": user_id, "date": DATE, "weight_lbs": weight_lbs, "foods": foods,
+        "keto_compatible": True, "keto_score": 90.0,
+    })
+
+
+def _bodies(db):
+    return db.conn.execute("SELECT COUNT(*) FROM protocol_bodies").fetchone()[0]
+
+
+def test_identical_food_lists_share_one_body_across_users(db):
+    _save(db, 1, FOODS)
+    _save(db, 2, FOODS, weight_lbs=150.0)
+
+    assert _bodies(db) == 1
+    assert db.get_protocol_for_date(1, DATE)["foods"] == db.get_protocol_for_date(2, DATE)["foods"] == FOODS
+
+
+def test_replacing_a_protocol_deletes_its_unreferenced_body(db):
+    _save(db, 1, FOODS)
+
+    _save(db, 1, OTHER_FOODS)
+
+    assert _bodies(db) == 1
+    assert db.get_protocol_for_date(1, DATE)["foods"] == OTHER_FOODS
+
+
+def test_replacing_a_protocol_keeps_a_body_another_user_references(db):
+    _save(db, 1, FOODS)
+    _save(db, 2, FOODS)
+
+    _save(db, 1, OTHER_FOODS)
+
+    assert _bodies(db) == 2
+    assert db.get_protocol_for_date(2, DATE)["foods"] == FOODS
+
+
+def test_prune_removes_bodies_left_unreferenced(db):
+    _save(db, 1, FOODS)
+    db.conn.execute("INSERT INTO protocol_bodies (hash, foods) VALUES ('orphan', '[]')")
+    db.conn.commit()
+
+    assert db.prune_protocol_bodies() == 1
+    assert _bodies(db) == 1
+
+
+def test_legacy_rows_are_read_from_their_inline_foods(db):
+    # Saved before protocol_bodies and stored keto results
+    db.conn.execute("""
+        INSERT INTO daily_protocols (user_id, date, weight_lbs, foods, total_net_carbs)
+        VALUES (1, ?, 170.0, ?, 12.5)
+    """, (DATE, json.dumps(FOODS)))
+    db.conn.commit()
+
+    protocol = db.get_protocol_for_date(1, DATE)
+
+    assert protocol["foods"] == FOODS
+    assert protocol["total_net_carbs"] == 12.5
+    assert "keto_compatible" not in protocol and "keto_score" not in protocol
+
+
+def test_replacing_a_legacy_row_moves_it_to_a_body(db):
+    db.conn.execute("INSERT INTO daily_protocols (user_id, date, weight_lbs, foods) VALUES (1, ?, 170.0, ?)",
+                    (DATE, json.dumps(FOODS)))
+    db.conn.commit()
+
+    _save(db, 1, OTHER_FOODS)
+
+    assert db.get_protocol_for_date(1, DATE)["foods"] == OTHER_FOODS
+    assert _bodies(db) == 1
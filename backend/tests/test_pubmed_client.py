@@ -0,0 +1,62 @@
+"""Binary bodies through pubmed_client.PubMedClient.get_raw and its cache"""
+import pytest
+
+from circuit_breaker import CircuitBreaker
+from eutils_cache import EUtilsCache
+from pubmed_client import PubMedClient
+from rate_limiter import TokenBucket
+
+XML = '<?xml version="1.0"?><PubmedArticleSet><Title>Curcumin – café</Title></PubmedArticleSet>'
+
+
+class FakeResponse:
+    def __init__(self, body: str):
+        self.content = body.encode("utf-8")
+        self.text_reads = 0
+
+    @property
+    def text(self):
+        self.text_reads += 1
+        return self.content.decode("utf-8")
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self):
+        self.responses = []
+
+    def get(self, url, params=None, timeout=None):
+        self.responses.append(FakeResponse(XML))
+        return self.responses[-1]
+
+
+@pytest.fixture
+def client(tmp_path):
+    cache = EUtilsCache({
+        "path": str(tmp_path / "cache.db"), "max_bytes": 1 << 20,
+        "ttl_seconds": {}, "default_ttl_seconds": 3600,
+    })
+    client = PubMedClient(
+        email="test@example.com", rate_limiter=TokenBucket(1000), cache=cache,
+        session=FakeSession(), circuit_breaker=CircuitBreaker("test", 5, 30),
+    )
+    yield client
+    cache.close()
+
+
+def test_binary_get_raw_skips_the_decoded_copy(client):
+    body = client.get_raw("efetch.fcgi", {"id": "1"}, binary=True)
+
+    assert body == XML.encode("utf-8")
+    assert client.session.responses[0].text_reads == 0
+
+
+def test_cached_bytes_serve_text_and_binary_callers(client):
+    client.get_raw("efetch.fcgi", {"id": "1"}, binary=True)
+
+    assert client.get_raw("efetch.fcgi", {"id": "1"}, binary=True) == XML.encode("utf-8")
+    assert client.get_raw("efetch.fcgi", {"id": "1"}) == XML
+    assert len(client.session.responses) == 1
+    assert client.cache.stats()["size_bytes"] == len(XML.encode("utf-8"))
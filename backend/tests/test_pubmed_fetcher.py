@@ -0,0 +1,93 @@
+"""Incremental search and bulk storage in pubmed_fetcher.PubMedFetcher"""
+from datetime import datetime, timedelta
+import json
+
+import pytest
+
+import pubmed_fetcher
+from database import Database
+from mock_eutils import synthetic_article
+from pubmed_client import PubMedClient
+from pubmed_xml import iter_pubmed_articles
+
+
+class FakeSearchClient:
+    """esearch over `per_day` PMIDs added on each day, honouring retstart/retmax and edat"""
+
+    search_params = staticmethod(PubMedClient.search_params)
+
+    def __init__(self, first_day: str, days: int, per_day: int):
+        start = datetime.strptime(first_day, "%Y/%m/%d")
+        self.added = [
+            ((start + timedelta(days=i // per_day)).strftime("%Y/%m/%d"), str(1000000 + i))
+            for i in range(days * per_day)
+        ]
+        self.requests = 0
+
+    def get_raw(self, endpoint, params, timeout=None):
+        self.requests += 1
+        matches = [pmid for day, pmid in self.added
+                   if params.get('mindate', '') <= day <= params.get('maxdate', '9999')]
+        retstart = int(params.get('retstart', 0))
+        # esearch serves at most 10,000 records per query
+        end = min(retstart + int(params['retmax']), pubmed_fetcher.ESEARCH_MAX_RECORDS)
+        return json.dumps({"esearchresult": {
+            "count": str(len(matches)), "idlist": matches[retstart:end],
+        }})
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "library.db")
+    monkeypatch.setattr(pubmed_fetcher, "Database", lambda: Database(path))
+    return path
+
+
+@pytest.fixture
+def fetcher(db_path):
+    return pubmed_fetcher.PubMedFetcher(client=object())
+
+
+def _incremental_fetcher(client, watermark):
+    fetcher = pubmed_fetcher.PubMedFetcher(client=client)
+    fetcher.db.save_research_sync_checkpoint("cancer", [], watermark)
+    fetcher.db.complete_research_sync("cancer")
+    return fetcher
+
+
+def test_incremental_search_pages_through_the_whole_window(db_path, capsys):
+    today = datetime.now().strftime("%Y/%m/%d")
+    client = FakeSearchClient(today, days=1, per_day=2500)
+    fetcher = _incremental_fetcher(client, today)
+
+    term_pmids = fetcher.collect_pmids(["cancer"], max_per_search=20)
+
+    # Far more than max_per_search, over three esearch pages
+    assert term_pmids["cancer"] == [pmid for _, pmid in client.added]
+    assert client.requests == 3
+
+
+def test_incremental_search_splits_windows_over_the_esearch_limit(db_path, capsys):
+    first_day = (datetime.now() - timedelta(days=4)).strftime("%Y/%m/%d")
+    client = FakeSearchClient(first_day, days=5, per_day=3000)
+    fetcher = _incremental_fetcher(client, first_day)
+
+    term_pmids = fetcher.collect_pmids(["cancer"], max_per_search=20)
+
+    assert sorted(term_pmids["cancer"]) == sorted(pmid for _, pmid in client.added)
+
+
+def _articles(pmids):
+    xml = "<PubmedArticleSet>" + "".join(synthetic_article(pmid) for pmid in pmids) + "</PubmedArticleSet>"
+    return list(iter_pubmed_articles(xml))
+
+
+def test_store_stream_reports_only_inserted_studies(fetcher, capsys):
+    fetcher._store_stream(iter(_articles(["1000001", "1000002"])))
+    capsys.readouterr()
+
+    # One stored already, one new, and the new one repeated within the chunk
+    added, processed = fetcher._store_stream(iter(_articles(["1000002", "1000003", "1000003"])))
+
+    assert (added, processed) == (1, 3)
+    assert capsys.readouterr().out.count("✅ Added:") == 1
@@ -0,0 +1,52 @@
+"""Backlog handling in research_indexing: inserts stay incremental, refreshes catch up"""
+import pytest
+
+import near_duplicates
+import research_indexing
+import research_ranking
+from database import Database
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    for index in (near_duplicates, research_ranking):
+        monkeypatch.setattr(index, "INDEX_BACKLOG_STUDIES", 5)
+    db = Database(str(tmp_path / "library.db"))
+    yield db
+    db.close()
+
+
+def _indexed(db, table):
+    return db.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_insert_leaves_a_backlog_to_the_refresh(db):
+    studies, _ = near_duplicates._synthetic_library(21)
+    # A library from before the indexes existed, then one save
+    db.add_research_studies(studies[:20])
+    db.add_research_studies(studies[20:])
+
+    research_indexing.on_studies_added(db)
+
+    assert _indexed(db, "study_minhash") == 0
+    assert _indexed(db, "bm25_documents") == 0
+    stale = research_indexing.stale_indexes(db)
+    assert near_duplicates in stale and research_ranking in stale
+
+    research_indexing.refresh_stale_indexes(db)
+
+    assert _indexed(db, "study_minhash") == 21
+    assert _indexed(db, "bm25_documents") == 21
+    assert research_indexing.stale_indexes(db) == []
+
+
+def test_small_inserts_are_indexed_inline(db):
+    studies, _ = near_duplicates._synthetic_library(23)
+    db.add_research_studies(studies[:20])
+    research_indexing.refresh_stale_indexes(db)
+
+    db.add_research_studies(studies[20:])
+    research_indexing.on_studies_added(db)
+
+    assert _indexed(db, "study_minhash") == 23
+    assert _indexed(db, "bm25_documents") == 23
@@ -0,0 +1,31 @@
+"""Parse-stage executor choice in research_pipeline.ResearchIngestPipeline"""
+import research_pipeline
+
+
+def _pipeline(**kwargs):
+    # The executor choice never touches the fetcher
+    return research_pipeline.ResearchIngestPipeline(fetcher=object(), **kwargs)
+
+
+def test_small_syncs_parse_in_thread():
+    pipeline = _pipeline(parse_workers=4, pool_min_articles=2000)
+
+    assert pipeline._parse_executor(1999) is None
+    assert pipeline.pool_workers == 0
+
+
+def test_zero_workers_never_start_a_pool():
+    pipeline = _pipeline(parse_workers=0, pool_min_articles=0)
+
+    assert pipeline._parse_executor(100000) is None
+
+
+def test_large_syncs_use_the_process_pool():
+    pipeline = _pipeline(parse_workers=2, pool_min_articles=2000)
+
+    executor = pipeline._parse_executor(2000)
+    try:
+        assert executor is not None
+        assert pipeline.pool_workers == 2
+    finally:
+        executor.shutdown()
@@ -0,0 +1,96 @@
+"""Concurrency checks for single_flight.SingleFlight"""
+import threading
+import time
+
+from single_flight import SingleFlight
+
+CALLERS = 8
+TIMEOUT = 5
+
+
+def _wait_until(condition):
+    deadline = time.monotonic() + TIMEOUT
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out waiting for concurrent callers")
+        time.sleep(0.001)
+
+
+def _run_callers(flight, key, fn):
+    """Start CALLERS threads on one key; return their results and errors"""
+    results, errors = [None] * CALLERS, [None] * CALLERS
+
+    def caller(i):
+        try:
+            results[i] = flight.do(key, fn)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(TIMEOUT)
+    return results, errors
+
+
+def test_concurrent_identical_calls_compute_once():
+    flight = SingleFlight("test")
+    computations = []
+
+    def expensive():
+        computations.append(1)
+        # Hold the computation open until every other caller has joined it
+        _wait_until(lambda: flight.stats()["shared"] == CALLERS - 1)
+        return {"protocol": "shared"}
+
+    results, errors = _run_callers(flight, ("protocol", 1, "2025-01-01"), expensive)
+
+    assert errors == [None] * CALLERS
+    assert len(computations) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats() == {"executions": 1, "shared": CALLERS - 1, "in_flight": 0}
+
+
+def test_error_reaches_every_waiting_caller():
+    flight = SingleFlight("test")
+
+    def failing():
+        _wait_until(lambda: flight.stats()["shared"] == CALLERS - 1)
+        raise ValueError("generation failed")
+
+    results, errors = _run_callers(flight, "key", failing)
+
+    assert results == [None] * CALLERS
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert flight.stats()["executions"] == 1
+
+
+def test_key_is_forgotten_after_the_call_finishes():
+    flight = SingleFlight("test")
+    calls = []
+
+    assert flight.do("key", lambda: calls.append(1) or len(calls)) == 1
+    assert flight.do("key", lambda: calls.append(1) or len(calls)) == 2
+    assert flight.stats() == {"executions": 2, "shared": 0, "in_flight": 0}
+
+
+def test_different_keys_do_not_coalesce():
+    flight = SingleFlight("test")
+    started = threading.Barrier(2, timeout=TIMEOUT)
+
+    def compute(value):
+        # Both computations must be running at once for the barrier to open
+        started.wait()
+        return value
+
+    results = {}
+    threads = [threading.Thread(target=lambda k=k: results.update({k: flight.do(k, compute, k)}))
+               for k in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(TIMEOUT)
+
+    assert results == {"a": "a", "b": "b"}
+    assert flight.stats()["executions"] == 2